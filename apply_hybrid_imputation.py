@@ -1,169 +1,317 @@
 import pandas as pd
 import numpy as np
 
+from checkpoint import to_csv_atomic
+from daydates import compact_dates, day_diff, day_month, day_year
+from lineage import RAW_ROW_ID, has_lineage, lineage_path_for, save_lineage
+from missingness import MissingnessTracker
+from prefetch import CHUNK_ROWS, CsvChunkWriter, csv_chunks, run_pipelined
+from projection import NA_TOKENS, read_projected, write_passthrough
+
 IN_CSV = 'Cleaned_Preprocessed_Dataset_Week1_final_fixed.csv'
 OUT_CSV = 'Cleaned_Preprocessed_Dataset_Week1_CLEAN.csv'
 AUDIT_OUT = 'full_imputation_audit.csv'
 
-print('Loading data...')
-df = pd.read_csv(IN_CSV)
-orig_len = len(df)
-
-audit_rows = []
-def record_audit(idx, column, old, new, desc):
-    audit_rows.append({
-        'row_index': int(idx) if idx >= 0 else -1,
-        'column': column,
-        'old_value': str(old)[:100],
-        'new_value': str(new)[:100],
-        'action_description': desc
-    })
-
-print('Parsing dates...')
-dates_parsed = {
-    'learner_signup_datetime': pd.to_datetime(df['learner_signup_datetime'], errors='coerce'),
-    'opportunity_start_date': pd.to_datetime(df['opportunity_start_date'], errors='coerce'),
-    'opportunity_end_date': pd.to_datetime(df['opportunity_end_date'], errors='coerce'),
-    'apply_date': pd.to_datetime(df['apply_date'], errors='coerce'),
-    'date_of_birth': pd.to_datetime(df['date_of_birth'], errors='coerce'),
-}
-
-print('\nApplying HYBRID imputation...\n')
-
-# STEP 1: Fill opportunity dates by forward/backward fill within opportunity_id groups
-print('1. Forward/backward filling opportunity dates by opportunity_id group...')
-if 'opportunity_id' in df.columns:
-    for col in ['opportunity_start_date', 'opportunity_end_date']:
+# columns the stage parses / may change (see projection.py); all others pass through
+DATE_COLUMNS = ['learner_signup_datetime', 'opportunity_start_date', 'opportunity_end_date', 'apply_date', 'date_of_birth']
+DERIVED_COLUMNS = ['opportunity_duration_days', 'days_before_start', 'engagement_lag_days', 'signup_month', 'signup_year']
+TEXT_FILL_COLUMNS = ['institution_name', 'current_intended_major']
+READ_COLUMNS = [RAW_ROW_ID, 'opportunity_id'] + DATE_COLUMNS + DERIVED_COLUMNS + TEXT_FILL_COLUMNS
+WRITE_COLUMNS = ['opportunity_start_date', 'opportunity_end_date'] + DERIVED_COLUMNS + TEXT_FILL_COLUMNS
+
+
+def _with_untouched(df, untouched):
+    """df plus the null placeholders of the passed-through columns (for snapshots)."""
+    if untouched is None or untouched.empty:
+        return df
+    return pd.concat([df, untouched.set_axis(df.index)], axis=1)
+
+
+def _parse_dates(df, day_resolution=False):
+    parsed = {c: pd.to_datetime(df[c], errors='coerce') for c in DATE_COLUMNS}
+    if day_resolution:
+        parsed = {c: compact_dates(v) for c, v in parsed.items()}
+    return parsed
+
+
+def _fill_opportunity_dates(df, record_audit):
+    """STEP 1 on df in place; the filled start/end dates become strings ('' = still missing)."""
+    print('1. Forward/backward filling opportunity dates by opportunity_id group...')
+    if 'opportunity_id' in df.columns:
+        for col in ['opportunity_start_date', 'opportunity_end_date']:
+            if col in df.columns:
+                old_missing = df[col].isna().sum()
+                # Convert to datetime first
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+                # ffill/bfill per group using transform to preserve index
+                df[col] = df.groupby('opportunity_id')[col].transform(lambda x: x.ffill().bfill())
+                new_missing = df[col].isna().sum()
+                saved = old_missing - new_missing
+                print(f'   {col}: {old_missing} -> {new_missing} missing (saved {saved})')
+                if saved > 0:
+                    record_audit(-1, col, f'{old_missing} missing', f'{new_missing} missing', 
+                               f'Ffill/bfill by opportunity_id; saved {saved}')
+                # Convert back to string for consistency
+                df[col] = df[col].astype(str).str.replace('NaT', '')
+
+
+def _derived_fields(dates_parsed, index, day_resolution):
+    """STEP 2 values: {column: Series} for DERIVED_COLUMNS, from the parsed dates."""
+    if day_resolution:
+        def days_between(later, earlier):
+            return pd.Series(day_diff(dates_parsed[later], dates_parsed[earlier]), index=index)
+        signup_month = pd.Series(day_month(dates_parsed['learner_signup_datetime']), index=index)
+        signup_year = pd.Series(day_year(dates_parsed['learner_signup_datetime']), index=index)
+    else:
+        def days_between(later, earlier):
+            return (dates_parsed[later] - dates_parsed[earlier]).dt.days
+        signup_month = dates_parsed['learner_signup_datetime'].dt.month
+        signup_year = dates_parsed['learner_signup_datetime'].dt.year
+
+    engagement_lag = days_between('apply_date', 'learner_signup_datetime')
+    return {
+        'opportunity_duration_days': days_between('opportunity_end_date', 'opportunity_start_date'),
+        'days_before_start': days_between('opportunity_start_date', 'apply_date'),
+        # clear negative lags
+        'engagement_lag_days': engagement_lag.where(engagement_lag >= 0, np.nan),
+        'signup_month': signup_month,
+        'signup_year': signup_year,
+    }
+
+
+def _print_recomputed(col, old_missing, new_missing):
+    print(f'   {col}: {old_missing} -> {new_missing} missing (saved {old_missing - new_missing})')
+
+
+def _fill_text(df):
+    """STEP 3 on df in place: {column: (missing before, missing after)} of the text fields."""
+    counts = {}
+    for col in TEXT_FILL_COLUMNS:
+        if col in df.columns:
+            old_missing = df[col].isna().sum()
+            if old_missing > 0:
+                df[col] = df[col].fillna('Unknown')
+            counts[col] = (old_missing, df[col].isna().sum())
+    return counts
+
+
+def run_imputation(in_csv=IN_CSV, out_csv=OUT_CSV, audit_out=AUDIT_OUT, tracker=None, audit_store=None,
+                   day_resolution=False, metrics=None, projection=True, pipelined=False, chunk_rows=CHUNK_ROWS):
+    """
+    Hybrid imputation: group fill of opportunity dates, derived-field recompute, text fills.
+    Audit entries also go to audit_store (untruncated, stage 'impute') when given.
+    out_csv gets its lineage .npy when the input has a raw_row_id column (see lineage.py).
+    day_resolution=True holds whole-day dates as int32 day numbers (see daydates.py);
+    the derived fields are the same as without it.
+    metrics (metrics.RunMetrics) receives rows, throughput and cells recovered.
+    projection=True parses only READ_COLUMNS and copies the other columns' field text
+    to out_csv unchanged (a full read may re-round floats, see projection.py); the input
+    is read twice, parsed and then streamed while writing. The returned frame then holds
+    only READ_COLUMNS. False reads everything.
+    pipelined=True streams the file in chunks of chunk_rows with background read and
+    write (prefetch.py) and returns None; see _impute_pipelined (which also reads the
+    input twice). tracker is not filled then.
+    """
+    if metrics is not None:
+        metrics.start_stage('impute')
+
+    audit_rows = []
+    def record_audit(idx, column, old, new, desc):
+        audit_rows.append({
+            'row_index': int(idx) if idx >= 0 else -1,
+            'column': column,
+            'old_value': str(old)[:100],
+            'new_value': str(new)[:100],
+            'action_description': desc
+        })
+        if audit_store is not None:
+            audit_store.record('impute', idx, column, old, new, desc)
+
+    if pipelined:
+        n_rows, n_columns, before, after, rows_recovered = _impute_pipelined(in_csv, out_csv, record_audit,
+                                                                             day_resolution, chunk_rows)
+        _save_audit(audit_rows, audit_out, audit_store)
+        _print_summary(before, after, n_rows, n_columns, rows_recovered)
+        if metrics is not None:
+            metrics.end_stage('impute', n_rows)
+            metrics.set('cells_recovered', sum(before.values()) - sum(after.values()), stage='impute')
+        return None
+
+    print('Loading data...')
+    if projection:
+        df, raw = read_projected(in_csv, READ_COLUMNS)
+        # passed-through columns count in the missingness summary, read from the raw fields
+        untouched = raw.null_frame([c for c in raw.header if c not in df.columns])
+    else:
+        df, raw, untouched = pd.read_csv(in_csv), None, None
+    orig_len = len(df)
+    # null bitmaps of the input stand in for re-reading it for the summary
+    tracker = tracker if tracker is not None else MissingnessTracker()
+    tracker.snapshot('before_imputation', _with_untouched(df, untouched))
+
+    print('Parsing dates...')
+    dates_parsed = _parse_dates(df)
+
+    print('\nApplying HYBRID imputation...\n')
+
+    # STEP 1: Fill opportunity dates by forward/backward fill within opportunity_id groups
+    _fill_opportunity_dates(df, record_audit)
+
+    # Re-parse dates after ffill
+    print('\nRe-parsing dates after fill...')
+    dates_parsed = _parse_dates(df, day_resolution)
+
+    # STEP 2: Recalculate derived numeric fields
+    print('\n2. Recalculating derived numeric fields...')
+    for col, new_val in _derived_fields(dates_parsed, df.index, day_resolution).items():
         if col in df.columns:
             old_missing = df[col].isna().sum()
-            # Convert to datetime first
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-            # ffill/bfill per group using transform to preserve index
-            df[col] = df.groupby('opportunity_id')[col].transform(lambda x: x.ffill().bfill())
-            new_missing = df[col].isna().sum()
-            saved = old_missing - new_missing
-            print(f'   {col}: {old_missing} -> {new_missing} missing (saved {saved})')
-            if saved > 0:
-                record_audit(-1, col, f'{old_missing} missing', f'{new_missing} missing', 
-                           f'Ffill/bfill by opportunity_id; saved {saved}')
-            # Convert back to string for consistency
-            df[col] = df[col].astype(str).str.replace('NaT', '')
-
-# Re-parse dates after ffill
-print('\nRe-parsing dates after fill...')
-dates_parsed = {
-    'learner_signup_datetime': pd.to_datetime(df['learner_signup_datetime'], errors='coerce'),
-    'opportunity_start_date': pd.to_datetime(df['opportunity_start_date'], errors='coerce'),
-    'opportunity_end_date': pd.to_datetime(df['opportunity_end_date'], errors='coerce'),
-    'apply_date': pd.to_datetime(df['apply_date'], errors='coerce'),
-    'date_of_birth': pd.to_datetime(df['date_of_birth'], errors='coerce'),
-}
-
-# STEP 2: Recalculate derived numeric fields
-print('\n2. Recalculating derived numeric fields...')
-
-# opportunity_duration_days
-if 'opportunity_duration_days' in df.columns:
-    old_missing = df['opportunity_duration_days'].isna().sum()
-    new_val = (dates_parsed['opportunity_end_date'] - dates_parsed['opportunity_start_date']).dt.days
-    df['opportunity_duration_days'] = new_val
-    new_missing = df['opportunity_duration_days'].isna().sum()
-    saved = old_missing - new_missing
-    print(f'   opportunity_duration_days: {old_missing} -> {new_missing} missing (saved {saved})')
-
-# days_before_start
-if 'days_before_start' in df.columns:
-    old_missing = df['days_before_start'].isna().sum()
-    new_val = (dates_parsed['opportunity_start_date'] - dates_parsed['apply_date']).dt.days
-    df['days_before_start'] = new_val
-    new_missing = df['days_before_start'].isna().sum()
-    saved = old_missing - new_missing
-    print(f'   days_before_start: {old_missing} -> {new_missing} missing (saved {saved})')
-
-# engagement_lag_days
-if 'engagement_lag_days' in df.columns:
-    old_missing = df['engagement_lag_days'].isna().sum()
-    new_val = (dates_parsed['apply_date'] - dates_parsed['learner_signup_datetime']).dt.days
-    # clear negative lags
-    new_val = new_val.where(new_val >= 0, np.nan)
-    df['engagement_lag_days'] = new_val
-    new_missing = df['engagement_lag_days'].isna().sum()
-    saved = old_missing - new_missing
-    print(f'   engagement_lag_days: {old_missing} -> {new_missing} missing (saved {saved})')
-
-# signup_month, signup_year
-if 'signup_month' in df.columns:
-    old_missing = df['signup_month'].isna().sum()
-    new_val = dates_parsed['learner_signup_datetime'].dt.month
-    df['signup_month'] = new_val
-    new_missing = df['signup_month'].isna().sum()
-    saved = old_missing - new_missing
-    print(f'   signup_month: {old_missing} -> {new_missing} missing (saved {saved})')
-
-if 'signup_year' in df.columns:
-    old_missing = df['signup_year'].isna().sum()
-    new_val = dates_parsed['learner_signup_datetime'].dt.year
-    df['signup_year'] = new_val
-    new_missing = df['signup_year'].isna().sum()
-    saved = old_missing - new_missing
-    print(f'   signup_year: {old_missing} -> {new_missing} missing (saved {saved})')
-
-# STEP 3: Fill sparse text fields with "Unknown"
-print('\n3. Filling sparse text fields...')
-for col in ['institution_name', 'current_intended_major']:
-    if col in df.columns:
-        old_missing = df[col].isna().sum()
+            df[col] = new_val
+            _print_recomputed(col, old_missing, df[col].isna().sum())
+
+    # STEP 3: Fill sparse text fields with "Unknown"
+    print('\n3. Filling sparse text fields...')
+    for col, (old_missing, new_missing) in _fill_text(df).items():
+        if old_missing > 0:
+            print(f'   {col}: {old_missing} -> {new_missing} missing')
+
+    # Save audit
+    _save_audit(audit_rows, audit_out, audit_store)
+
+    # Save clean CSV
+    if raw is not None:
+        write_passthrough(df, raw, out_csv, WRITE_COLUMNS)
+    else:
+        to_csv_atomic(df, out_csv, index=False)
+    print(f'Saved clean dataset to {out_csv}')
+    if has_lineage(df):
+        save_lineage(df, lineage_path_for(out_csv))
+
+    tracker.snapshot('after_imputation', _with_untouched(df, untouched))
+    snap_before = tracker['before_imputation']
+    snap_after = tracker['after_imputation']
+    _print_summary(snap_before.null_counts, snap_after.null_counts, snap_before.n_rows, len(snap_before.columns),
+                   int((tracker.rows_recovered('before_imputation', 'after_imputation') > 0).sum()))
+
+    if metrics is not None:
+        metrics.end_stage('impute', len(df))
+        metrics.set('cells_recovered', snap_before.total_nulls - snap_after.total_nulls, stage='impute')
+
+    return df
+
+
+def _impute_pipelined(in_csv, out_csv, record_audit, day_resolution, chunk_rows):
+    """
+    run_imputation over chunks. Opportunity groups span chunks, so steps 1-2 run first
+    on a narrow whole-file read of opportunity_id and the date columns (exactly as in
+    the whole-file run); the chunks then only take their rows of the filled dates and
+    derived fields, fill the text fields and count missing cells, while the next chunk
+    is parsed and the previous one written (prefetch.run_pipelined). The input is thus
+    read twice: the narrow id/date read, then the chunks.
+    Returns (rows, columns, nulls before, nulls after, rows with recovered cells).
+    """
+    header = pd.read_csv(in_csv, nrows=0).columns
+    print('Loading opportunity ids and dates...')
+    dates = pd.read_csv(in_csv, usecols=[c for c in header if c in [RAW_ROW_ID, 'opportunity_id'] + DATE_COLUMNS])
+
+    print('\nApplying HYBRID imputation...\n')
+    _fill_opportunity_dates(dates, record_audit)
+    print('\nRe-parsing dates after fill...')
+    replaced = _derived_fields(_parse_dates(dates, day_resolution), dates.index, day_resolution)
+    replaced = {c: v for c, v in replaced.items() if c in header}
+    if 'opportunity_id' in dates.columns:
+        replaced.update({c: dates[c] for c in ['opportunity_start_date', 'opportunity_end_date'] if c in dates.columns})
+    parsed = set(TEXT_FILL_COLUMNS)
+
+    def null_mask(chunk, col, parsed):
+        # unparsed columns hold their field text: missing as read_csv would see it
+        return chunk[col].isna() if col in parsed else chunk[col].isin(NA_TOKENS)
+
+    before = dict.fromkeys(header, 0)
+    after = dict.fromkeys(header, 0)
+    text_counts = {}
+    rows_recovered = 0
+    def process(chunk):
+        nonlocal rows_recovered
+        was_null = {c: null_mask(chunk, c, parsed).to_numpy() for c in header}
+        for col, values in replaced.items():
+            chunk[col] = values.reindex(chunk.index)
+        for col, counts in _fill_text(chunk).items():
+            text_counts[col] = tuple(a + b for a, b in zip(text_counts.get(col, (0, 0)), counts))
+        recovered = np.zeros(len(chunk), dtype=bool)
+        for c in header:
+            is_null = null_mask(chunk, c, parsed | set(replaced)).to_numpy()
+            before[c] += int(was_null[c].sum())
+            after[c] += int(is_null.sum())
+            recovered |= was_null[c] & ~is_null
+        rows_recovered += int(recovered.sum())
+        return chunk
+
+    print(f'\n2-3. Applying to {in_csv} in chunks of {chunk_rows} rows (pipelined)...')
+    with CsvChunkWriter(out_csv) as out:
+        stats = run_pipelined(csv_chunks(in_csv, TEXT_FILL_COLUMNS, chunk_rows), process, out.write)
+    print(stats.summary())
+    if has_lineage(dates):
+        save_lineage(dates, lineage_path_for(out_csv))
+
+    print('\n2. Recalculating derived numeric fields...')
+    for col in DERIVED_COLUMNS:
+        if col in header:
+            _print_recomputed(col, before[col], after[col])
+    print('\n3. Filling sparse text fields...')
+    for col, (old_missing, new_missing) in text_counts.items():
         if old_missing > 0:
-            df[col] = df[col].fillna('Unknown')
-            new_missing = df[col].isna().sum()
             print(f'   {col}: {old_missing} -> {new_missing} missing')
+    print(f'Saved clean dataset to {out_csv}')
+    return stats.rows, len(header), before, after, rows_recovered
+
+
+def _save_audit(audit_rows, audit_out, audit_store):
+    if audit_store is not None:
+        audit_store.flush()
+    audit_df = pd.DataFrame(audit_rows)
+    if not audit_df.empty:
+        to_csv_atomic(audit_df, audit_out, index=False)
+        print(f'\nSaved full imputation audit ({len(audit_df)} records) to {audit_out}')
+    else:
+        to_csv_atomic(pd.DataFrame(columns=['row_index','column','old_value','new_value','action_description']), audit_out, index=False)
+
+
+def _print_summary(before, after, n_rows, n_columns, rows_recovered):
+    """before/after: null count per column of the same n_rows x n_columns table."""
+    print('\n' + '='*80)
+    print('FINAL IMPUTATION SUMMARY')
+    print('='*80)
+
+    print('\nMissing values before vs after:')
+    print(f'{"Column":<35} | {"Before":>20} | {"After":>20} | {"Saved":>6}')
+    print('-'*95)
+
+    cols_with_issue = [c for c in before if before[c] > 0 or after[c] > 0]
+
+    total_before = 0
+    total_after = 0
+    for col in sorted(cols_with_issue):
+        b = int(before[col])
+        a = int(after[col])
+        saved = b - a
+        pct_before = (b / n_rows) * 100 if b > 0 else 0
+        pct_after = (a / n_rows) * 100 if a > 0 else 0
+        total_before += b
+        total_after += a
+
+        print(f'{col:<35} | {b:>5} ({pct_before:>5.1f}%) | {a:>5} ({pct_after:>5.1f}%) | {saved:>6}')
+
+    total_cells = n_rows * n_columns
+    print('-'*95)
+    print(f'{"TOTAL":<35} | {total_before:>5} ({(total_before/total_cells*100):>5.1f}%) | {total_after:>5} ({(total_after/total_cells*100):>5.1f}%) | {total_before-total_after:>6}')
+
+    print(f'\nTotal missing cells before: {sum(before.values()):>5}')
+    print(f'Total missing cells after:  {sum(after.values()):>5}')
+    print(f'Cells recovered:            {sum(before.values()) - sum(after.values()):>5}')
+    print(f'Rows with recovered cells:  {rows_recovered:>5}')
+    print(f'\nRows: {n_rows} (unchanged)')
+
 
-# Save audit
-audit_df = pd.DataFrame(audit_rows)
-if not audit_df.empty:
-    audit_df.to_csv(AUDIT_OUT, index=False)
-    print(f'\nSaved full imputation audit ({len(audit_df)} records) to {AUDIT_OUT}')
-else:
-    pd.DataFrame(columns=['row_index','column','old_value','new_value','action_description']).to_csv(AUDIT_OUT, index=False)
-
-# Save clean CSV
-df.to_csv(OUT_CSV, index=False)
-print(f'Saved clean dataset to {OUT_CSV}')
-
-# Show summary
-print('\n' + '='*80)
-print('FINAL IMPUTATION SUMMARY')
-print('='*80)
-
-# Reload to show before/after properly
-df_before = pd.read_csv(IN_CSV)
-df_after = df
-
-print('\nMissing values before vs after:')
-print(f'{"Column":<35} | {"Before":>20} | {"After":>20} | {"Saved":>6}')
-print('-'*95)
-
-miss_before = df_before.isna().sum()
-miss_after = df_after.isna().sum()
-cols_with_issue = miss_before[miss_before > 0].index.union(miss_after[miss_after > 0].index)
-
-total_before = 0
-total_after = 0
-for col in sorted(cols_with_issue):
-    before = miss_before.get(col, 0)
-    after = miss_after.get(col, 0)
-    saved = before - after
-    pct_before = (before / len(df_before)) * 100 if before > 0 else 0
-    pct_after = (after / len(df_after)) * 100 if after > 0 else 0
-    total_before += before
-    total_after += after
-    
-    print(f'{col:<35} | {before:>5} ({pct_before:>5.1f}%) | {after:>5} ({pct_after:>5.1f}%) | {saved:>6}')
-
-print('-'*95)
-print(f'{"TOTAL":<35} | {total_before:>5} ({(total_before/(len(df_before)*len(df_before.columns))*100):>5.1f}%) | {total_after:>5} ({(total_after/(len(df_after)*len(df_after.columns))*100):>5.1f}%) | {total_before-total_after:>6}')
-
-print(f'\nTotal missing cells before: {df_before.isna().sum().sum():>5}')
-print(f'Total missing cells after:  {df_after.isna().sum().sum():>5}')
-print(f'Cells recovered:            {df_before.isna().sum().sum() - df_after.isna().sum().sum():>5}')
-print(f'\nRows: {len(df_before)} (unchanged)')
+if __name__ == "__main__":
+    run_imputation()
@@ -0,0 +1,213 @@
+# audit_store.py
+# Append-only audit store shared by every pipeline stage (local SQLite via sqlite3).
+#
+# One `audit` table holds all changes from all stages and runs:
+#   run_id, stage, row_index, raw_row_id, column, old/new value (+ type tag), description,
+#   recorded_at
+# row_index is the row in the stage's own input; raw_row_id (lineage.py) is the raw
+# export row behind it, the same across stages, so raw_row_history() follows one record
+# through the whole pipeline. It is NULL where the stage had no lineage column.
+# Values keep their type: numbers stay numbers, timestamps are ISO strings tagged
+# 'datetime', missing values are NULL tagged 'null'; the query helpers decode them back.
+# Writes are buffered and flushed with executemany inside one transaction per batch.
+# Indexes on (row_index, column), (raw_row_id, column) and (run_id, stage) keep "what
+# happened to row N" and per-stage summaries fast with millions of entries. Stores
+# created before raw_row_id existed get the column added on open. Rows are never updated or
+# deleted by this module.
+
+import sqlite3
+import sys
+import uuid
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+AUDIT_DB = "pipeline_audit.sqlite"
+BATCH_SIZE = 5000
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    started_at  TEXT NOT NULL,
+    command     TEXT
+);
+CREATE TABLE IF NOT EXISTS audit (
+    id          INTEGER PRIMARY KEY,
+    run_id      TEXT NOT NULL,
+    stage       TEXT NOT NULL,
+    row_index   INTEGER,
+    raw_row_id  INTEGER,
+    "column"    TEXT NOT NULL,
+    old_value,
+    old_type    TEXT NOT NULL,
+    new_value,
+    new_type    TEXT NOT NULL,
+    description TEXT,
+    recorded_at TEXT NOT NULL
+);
+"""
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_audit_row_column ON audit (row_index, "column");
+CREATE INDEX IF NOT EXISTS idx_audit_raw_row_column ON audit (raw_row_id, "column");
+CREATE INDEX IF NOT EXISTS idx_audit_run_stage ON audit (run_id, stage);
+"""
+
+# -----------------------
+# Typed value encoding
+# -----------------------
+def encode_value(v):
+    """Return (sqlite_value, type_tag) for a Python/numpy/pandas scalar."""
+    if v is None:
+        return None, 'null'
+    try:
+        if pd.isna(v):
+            return None, 'null'
+    except (TypeError, ValueError):
+        pass
+    if isinstance(v, (bool, np.bool_)):
+        return int(v), 'bool'
+    if isinstance(v, (int, np.integer)):
+        return int(v), 'int'
+    if isinstance(v, (float, np.floating)):
+        return float(v), 'float'
+    if isinstance(v, (pd.Timestamp, datetime, np.datetime64)):
+        return pd.Timestamp(v).isoformat(), 'datetime'
+    if isinstance(v, date):
+        return v.isoformat(), 'date'
+    return str(v), 'str'
+
+def decode_value(v, tag):
+    if tag == 'null' or v is None:
+        return None
+    if tag == 'bool':
+        return bool(v)
+    if tag == 'int':
+        return int(v)
+    if tag == 'float':
+        return float(v)
+    if tag == 'datetime':
+        return pd.Timestamp(v)
+    if tag == 'date':
+        return date.fromisoformat(v)
+    return v
+
+def _row_id(value):
+    """Row reference as stored: int, or NULL for missing / negative (aggregate) entries."""
+    if value is None or pd.isna(value) or value < 0:
+        return None
+    return int(value)
+
+def new_run_id():
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+# -----------------------
+# Store
+# -----------------------
+class AuditStore:
+    def __init__(self, path=AUDIT_DB, run_id=None, batch_size=BATCH_SIZE):
+        self.path = path
+        self.run_id = run_id or new_run_id()
+        self.batch_size = batch_size
+        self._buffer = []
+        self._started_at = datetime.now().isoformat(timespec='seconds')
+        self._run_registered = False
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_TABLES)
+        columns = [r[1] for r in self.conn.execute("PRAGMA table_info(audit)")]
+        if 'raw_row_id' not in columns:
+            self.conn.execute("ALTER TABLE audit ADD COLUMN raw_row_id INTEGER")
+        self.conn.executescript(_INDEXES)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, stage, row_index, column, old_value, new_value, description=None, raw_row_id=None):
+        old, old_type = encode_value(old_value)
+        new, new_type = encode_value(new_value)
+        self._buffer.append((
+            self.run_id, stage, _row_id(row_index), _row_id(raw_row_id), column,
+            old, old_type, new, new_type, description, datetime.now().isoformat(timespec='seconds'),
+        ))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with self.conn:
+            if not self._run_registered:
+                # a run is registered with its first write, so read-only opens leave no trace
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO runs (run_id, started_at, command) VALUES (?, ?, ?)",
+                    (self.run_id, self._started_at, " ".join(sys.argv)),
+                )
+                self._run_registered = True
+            self.conn.executemany(
+                'INSERT INTO audit (run_id, stage, row_index, raw_row_id, "column", old_value, old_type, '
+                'new_value, new_type, description, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                self._buffer,
+            )
+        self._buffer = []
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    def import_frame(self, audit_df, stage):
+        """
+        Append an existing audit frame/CSV (row_index, column, old_value, new_value
+        [, action_description][, raw_row_id]).
+        """
+        missing = [None] * len(audit_df)
+        desc = audit_df['action_description'] if 'action_description' in audit_df.columns else missing
+        raw = audit_df['raw_row_id'] if 'raw_row_id' in audit_df.columns else missing
+        for row_index, column, old, new, d, r in zip(audit_df['row_index'], audit_df['column'],
+                                                     audit_df['old_value'], audit_df['new_value'], desc, raw):
+            self.record(stage, row_index, column, old, new, d, raw_row_id=r)
+        self.flush()
+
+    # -------- queries --------
+    def _query(self, sql, params=()):
+        self.flush()
+        out = pd.read_sql_query(sql, self.conn, params=params)
+        if 'old_value' in out.columns:
+            out['old_value'] = [decode_value(v, t) for v, t in zip(out['old_value'], out['old_type'])]
+            out['new_value'] = [decode_value(v, t) for v, t in zip(out['new_value'], out['new_type'])]
+        return out
+
+    def _history(self, key, value, column):
+        sql = ('SELECT run_id, stage, row_index, raw_row_id, "column", old_value, old_type, new_value, new_type, '
+               f'description, recorded_at FROM audit WHERE {key} = ?')
+        params = [int(value)]
+        if column is not None:
+            sql += ' AND "column" = ?'
+            params.append(column)
+        return self._query(sql + ' ORDER BY id', params)
+
+    def row_history(self, row_index, column=None):
+        """Every recorded change to one stage row_index (optionally one column), oldest first."""
+        return self._history('row_index', row_index, column)
+
+    def raw_row_history(self, raw_row_id, column=None):
+        """Every recorded change to the rows of one raw export record, across stages, oldest first."""
+        return self._history('raw_row_id', raw_row_id, column)
+
+    def stage_summary(self, run_id=None):
+        """Change counts per (run, stage, column); run_id=None means all runs."""
+        sql = 'SELECT run_id, stage, "column", COUNT(*) AS changes FROM audit'
+        params = []
+        if run_id is not None:
+            sql += ' WHERE run_id = ?'
+            params.append(run_id)
+        return self._query(sql + ' GROUP BY run_id, stage, "column" ORDER BY run_id, stage, "column"', params)
+
+    def runs(self):
+        return self._query('SELECT run_id, started_at, command FROM runs ORDER BY started_at')
@@ -0,0 +1,195 @@
+# backends.py
+# Execution backends for the data2 cleaning functions.
+#
+# A backend provides clean_text, map_gender, map_status, robust_parse_dates and
+# compute_features with the signatures (and pandas inputs / outputs) of data2, so
+# callers switch engines without any change downstream:
+#   pandas - the data2 functions themselves (default)
+#   polars - string clean-up and date arithmetic run as multi-threaded Polars
+#            expressions (POLARS_MAX_THREADS caps the threads). Polars is optional and
+#            only imported when this backend is selected.
+# Steps whose exact pandas semantics Polars cannot reproduce (str.title(), the
+# dayfirst format inference of robust_parse_dates, the gender / status rules) run
+# once per distinct value with the pandas code and are mapped back onto the rows, so
+# results match the pandas path exactly. compare_backends() checks that on real data;
+# `python backends.py [csv ...]` runs it on the sample CSVs.
+#
+# Selection: get_backend(name), the `--backend` option of the pipeline, or the
+# WEEK1_BACKEND environment variable (default 'pandas').
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import data2
+
+pl = None   # the polars module once the polars backend has been selected (_load_polars)
+
+BACKEND_ENV = 'WEEK1_BACKEND'
+BACKENDS = ('pandas', 'polars')
+FEATURE_DATE_COLUMNS = ['date_of_birth', 'learner_signup_datetime', 'apply_date',
+                        'opportunity_start_date', 'opportunity_end_date']
+TEXT_CHECK_COLUMNS = ['first_name', 'country', 'institution_name', 'current_intended_major',
+                      'opportunity_name', 'opportunity_category']
+
+class PandasBackend:
+    name = 'pandas'
+    clean_text = staticmethod(data2.clean_text)
+    map_gender = staticmethod(data2.map_gender)
+    map_status = staticmethod(data2.map_status)
+    robust_parse_dates = staticmethod(data2.robust_parse_dates)
+    compute_features = staticmethod(data2.compute_features)
+
+def _per_distinct(func, series, *args, **kwargs):
+    """func applied to each distinct value of series once, mapped back onto the rows."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = func(pd.Series(uniques, dtype=series.dtype), *args, **kwargs)
+    return pd.Series(mapped.to_numpy()[codes], index=series.index, name=series.name, dtype=mapped.dtype)
+
+def _datetime_frame(df, columns):
+    """Polars frame of int64 timestamps (null for NaT) plus the number of ticks per day."""
+    unit = 'ns' if any(np.datetime_data(df[c].dtype)[0] == 'ns' for c in columns) else 'us'
+    data = {}
+    for c in columns:
+        values = df[c].to_numpy().astype(f'datetime64[{unit}]')
+        data[c] = pl.Series(c, values.view('int64'), dtype=pl.Int64)
+        data[c + '__nat'] = pl.Series(c + '__nat', np.isnat(values))
+    frame = pl.DataFrame(data).select(
+        [pl.when(pl.col(c + '__nat')).then(None).otherwise(pl.col(c)).alias(c) for c in columns])
+    return frame, unit, 86_400 * (10 ** 9 if unit == 'ns' else 10 ** 6)
+
+def _to_numpy(series, dtype=None):
+    """Polars result as numpy, the way pandas holds it: float64 with NaN once there are nulls."""
+    if series.null_count():
+        return series.cast(pl.Float64).fill_null(float('nan')).to_numpy()
+    values = series.to_numpy()
+    return values.astype(dtype) if dtype is not None else values
+
+def _load_polars():
+    """Import polars on first use of the backend; None when it is not installed."""
+    global pl
+    if pl is None:
+        try:
+            import polars
+        except ImportError:
+            return None
+        pl = polars
+    return pl
+
+class PolarsBackend:
+    name = 'polars'
+
+    def __init__(self):
+        if _load_polars() is None:
+            raise ImportError("The polars backend needs the 'polars' package (pip install polars)")
+
+    def clean_text(self, series, to_title=True):
+        text = series.astype(str).fillna("")
+        col = pl.col('v')
+        col = pl.when(col == 'nan').then(pl.lit('')).otherwise(col)
+        col = col.str.strip_chars().str.replace_all(r'\s+', ' ').str.replace_all(r'^[^\w]+|[^\w]+$', '')
+        out = pl.DataFrame({'v': pl.Series('v', text.tolist(), dtype=pl.Utf8)}).select(col.alias('v'))['v']
+        if to_title:
+            # Python's title() rules (e.g. "o'neil" -> "O'Neil"), once per distinct value
+            out = out.replace({v: v.title() for v in out.unique().to_list()})
+        result = pd.Series(out.to_list(), index=series.index, name=series.name, dtype=text.dtype)
+        return result.replace("", np.nan)
+
+    def map_gender(self, series):
+        return _per_distinct(data2.map_gender, series)
+
+    def map_status(self, series):
+        return _per_distinct(data2.map_status, series)
+
+    def robust_parse_dates(self, series, extra_formats=None, dayfirst_try=True):
+        # format inference looks at the first value, which is the same in the distinct values
+        return _per_distinct(data2.robust_parse_dates, series.astype(str), extra_formats, dayfirst_try)
+
+    def compute_features(self, df, day_resolution=False, inplace=False):
+        columns = [c for c in FEATURE_DATE_COLUMNS if c in df.columns]
+        if day_resolution or not all(pd.api.types.is_datetime64_dtype(df[c]) for c in columns):
+            # int32 day numbers are already vectorized numpy; object dates need pandas arithmetic
+            return data2.compute_features(df, day_resolution=day_resolution, inplace=inplace)
+        frame, unit, per_day = _datetime_frame(df, columns)
+        def days(later, earlier):
+            return (pl.col(later) - pl.col(earlier)) // per_day
+        exprs = []
+        if 'date_of_birth' in columns and 'learner_signup_datetime' in columns:
+            exprs.append((days('learner_signup_datetime', 'date_of_birth') / 365.25).floor().alias('age_years'))
+        if 'learner_signup_datetime' in columns:
+            signup = pl.col('learner_signup_datetime').cast(pl.Datetime(unit))
+            exprs += [signup.dt.month().cast(pl.Int32).alias('signup_month'),
+                      signup.dt.year().cast(pl.Int32).alias('signup_year')]
+        if 'apply_date' in columns and 'learner_signup_datetime' in columns:
+            exprs.append(days('apply_date', 'learner_signup_datetime').alias('engagement_lag_days'))
+        if 'opportunity_end_date' in columns and 'opportunity_start_date' in columns:
+            exprs.append(days('opportunity_end_date', 'opportunity_start_date').alias('opportunity_duration_days'))
+        if 'opportunity_start_date' in columns and 'apply_date' in columns:
+            exprs.append(days('opportunity_start_date', 'apply_date').alias('days_before_start'))
+        out = frame.select(exprs) if exprs else None
+        df = data2._stage_frame(df, inplace)
+        # same column order as data2.compute_features
+        for name in ['age_years', 'signup_month', 'signup_year', 'engagement_lag_days',
+                     'opportunity_duration_days', 'days_before_start']:
+            if out is not None and name in out.columns:
+                df[name] = _to_numpy(out[name], 'float64' if name == 'age_years' else None)
+            elif name == 'age_years':
+                df[name] = np.nan
+        return df
+
+def get_backend(name=None):
+    """Backend by name; None means $WEEK1_BACKEND or pandas."""
+    name = name or os.environ.get(BACKEND_ENV) or 'pandas'
+    if name == 'pandas':
+        return PandasBackend()
+    if name == 'polars':
+        return PolarsBackend()
+    raise ValueError(f"Unknown backend '{name}' (choose from {', '.join(BACKENDS)})")
+
+def compare_backends(df, backend, reference=None):
+    """
+    Run every backend function on df's columns with both backends; returns a list of
+    mismatch descriptions (empty when the outputs are identical, dtypes included).
+    """
+    reference = reference or PandasBackend()
+    mismatches = []
+    def check(label, expected, actual):
+        try:
+            if isinstance(expected, pd.DataFrame):
+                pd.testing.assert_frame_equal(expected, actual)
+            else:
+                pd.testing.assert_series_equal(expected, actual)
+        except AssertionError as e:
+            mismatches.append(f"{label}: {str(e).splitlines()[0]}")
+    for c in [c for c in TEXT_CHECK_COLUMNS if c in df.columns]:
+        for to_title in (True, False):
+            check(f'clean_text({c}, to_title={to_title})', reference.clean_text(df[c], to_title=to_title),
+                  backend.clean_text(df[c], to_title=to_title))
+    if 'gender' in df.columns:
+        check('map_gender', reference.map_gender(df['gender']), backend.map_gender(df['gender']))
+    if 'status_description' in df.columns:
+        check('map_status', reference.map_status(df['status_description']), backend.map_status(df['status_description']))
+    parsed = df.copy(deep=False)
+    for c in [c for c in data2.DATE_COLUMNS if c in df.columns]:
+        expected = reference.robust_parse_dates(df[c], extra_formats=data2.DATE_FORMATS)
+        check(f'robust_parse_dates({c})', expected, backend.robust_parse_dates(df[c], extra_formats=data2.DATE_FORMATS))
+        parsed[c] = expected
+    for day_resolution in (False, True):
+        check(f'compute_features(day_resolution={day_resolution})',
+              reference.compute_features(parsed, day_resolution=day_resolution),
+              backend.compute_features(parsed, day_resolution=day_resolution))
+    return mismatches
+
+if __name__ == "__main__":
+    backend = get_backend(os.environ.get(BACKEND_ENV) or 'polars')
+    paths = sys.argv[1:] or ['Cleaned_Preprocessed_Dataset_Week1_CORRECTED.csv', 'production_ready_dataset_v2.csv']
+    failed = False
+    for path in paths:
+        mismatches = compare_backends(pd.read_csv(path, dtype=object), backend)
+        print(f"{path}: {backend.name} backend " + ('identical to pandas' if not mismatches else 'DIFFERS'))
+        for m in mismatches:
+            print('  ' + m)
+        failed = failed or bool(mismatches)
+    sys.exit(1 if failed else 0)
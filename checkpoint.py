@@ -0,0 +1,131 @@
+# checkpoint.py
+# Atomic stage outputs and resumable pipeline chains.
+#
+# - atomic_output(path) hands out a temporary sibling path ("x.partial.csv", same
+#   extension so writers such as to_excel still pick their engine) and renames it over
+#   path only when the write finished; a crash leaves the old file (or nothing), never
+#   a truncated one under the final name.
+# - CheckpointStore keeps one JSON manifest per stage in CHECKPOINT_DIR, written
+#   (atomically) after all of the stage's data and audit outputs are in place. It
+#   records the sha1 of every input and output plus the stage parameters. A stage is
+#   complete only if its manifest exists and inputs, outputs and parameters still match,
+#   so a chain restarted after a crash skips finished stages and reruns from the first
+#   incomplete one.
+
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import datetime
+
+CHECKPOINT_DIR = '.pipeline_checkpoints'
+PARTIAL_TAG = '.partial'
+
+@contextmanager
+def atomic_output(path):
+    """Yield a temp path to write to; it replaces path on success and is removed on error."""
+    root, ext = os.path.splitext(path)
+    tmp = f'{root}{PARTIAL_TAG}{ext}'
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def to_csv_atomic(df, path, **kwargs):
+    """df.to_csv(path, **kwargs), written atomically through writers.write_csv (chunked, .gz/.zst aware)."""
+    from writers import write_csv  # writers builds on atomic_output
+    write_csv(df, path, **kwargs)
+
+def write_json_atomic(path, obj):
+    with atomic_output(path) as tmp:
+        with open(tmp, 'w') as f:
+            json.dump(obj, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+
+def file_digest(path, chunk_size=1 << 20):
+    """sha1 of a file's contents, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def _fingerprints(paths):
+    return {p: file_digest(p) for p in paths}
+
+class CheckpointStore:
+    def __init__(self, directory=CHECKPOINT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def manifest_path(self, stage):
+        return os.path.join(self.directory, f'{stage}.json')
+
+    def load(self, stage):
+        path = self.manifest_path(stage)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, stage, inputs, outputs, params=None):
+        """Record a completed stage (call only after every output has been written)."""
+        missing = [p for p in outputs if not os.path.exists(p)]
+        if missing:
+            raise FileNotFoundError(f"Stage '{stage}' outputs missing, not checkpointing: {', '.join(missing)}")
+        meta = {
+            'stage': stage,
+            'completed_at': datetime.now().isoformat(timespec='seconds'),
+            'params': params or {},
+            'inputs': _fingerprints(inputs),
+            'outputs': _fingerprints(outputs),
+        }
+        write_json_atomic(self.manifest_path(stage), meta)
+        return meta
+
+    def is_complete(self, stage, inputs, outputs, params=None):
+        """True if the stage finished before with these inputs/params and its outputs are intact."""
+        meta = self.load(stage)
+        if meta is None or meta.get('params', {}) != json.loads(json.dumps(params or {}, default=str)):
+            return False
+        if sorted(meta['inputs']) != sorted(inputs) or sorted(meta['outputs']) != sorted(outputs):
+            return False
+        return meta['inputs'] == _fingerprints(inputs) and meta['outputs'] == _fingerprints(outputs)
+
+    def invalidate(self, stage):
+        path = self.manifest_path(stage)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+
+def run_chain(stages, store=None, extra_kwargs=None):
+    """
+    Run (name, inputs, outputs, fn, params) stages in order, skipping those whose
+    checkpoint is complete. Everything after the first rerun stage is rerun as well.
+    extra_kwargs go to every fn but are not part of the checkpoint (e.g. metrics).
+    """
+    store = store or CheckpointStore()
+    rerun = False
+    for name, inputs, outputs, fn, params in stages:
+        if not rerun and store.is_complete(name, inputs, outputs, params):
+            print(f"[{name}] checkpoint complete ({store.manifest_path(name)}), skipping")
+            continue
+        rerun = True
+        store.invalidate(name)
+        print(f"[{name}] running")
+        fn(**params, **(extra_kwargs or {}))
+        store.save(name, inputs, outputs, params)
+        print(f"[{name}] checkpoint written")
@@ -1,246 +1,318 @@
+import argparse
+import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+
+from plots import bar_spec, hist_spec, render_plots
+from sketches import sketch_csv, sketch_series
+from outliers import OUTLIER_METRICS, write_outlier_candidates
+from sampling import ExactCounts, format_estimate, stratified_sample_csv
+from validation_rules import BITMASK_COLUMN, compile_rules, decode_bitmask
+from writers import write_csv
 
 INPUT = "Cleaned_Preprocessed_Dataset_Week1_CORRECTED.csv"   # Uses the dataset with flags
 OUT_FINAL = "Cleaned_Preprocessed_Dataset_Week1_final_checked.csv"
 OUT_REPORT = "validation_report_week1.csv"
-
-df = pd.read_csv(INPUT, parse_dates=[
-    'learner_signup_datetime','opportunity_end_date','date_of_birth',
-    'entry_created_at','apply_date','opportunity_start_date'
-], dayfirst=False)
-
-pd.set_option('display.max_rows', 20)
-
-print("=" * 80)
-print("COMPREHENSIVE DATASET DIAGNOSTICS & CORRECTIONS - WEEK 1")
-print("=" * 80)
-
-# ----- 1) Basic diagnostics -----
-print("\n" + "=" * 80)
-print("1) BASIC DIAGNOSTICS")
-print("=" * 80)
-print(f"\nRows: {len(df)}")
-print(f"Columns: {len(df.columns)}")
-print(f"\nMissing engagement_lag_days (NaN): {df['engagement_lag_days'].isna().sum()}")
-print(f"Negative opportunity_duration_days (should be 0): {(df['opportunity_duration_days'] < 0).sum()}")
-print(f"Flags - engagement inversion: {df['flag_engagement_inversion'].sum()}")
-print(f"Flags - days_before_start extreme: {df['flag_days_before_start_extreme'].sum()}")
-
-# ----- 2) Chronology checks (critical) -----
-print("\n" + "=" * 80)
-print("2) CHRONOLOGY VALIDATION")
-print("=" * 80)
-
-# a) apply before signup (should match flag)
-chron_inv = df[df['apply_date'].notna() & df['learner_signup_datetime'].notna() & (df['apply_date'] < df['learner_signup_datetime'])]
-print(f"\nType A - apply_date < signup_date (chronology inversions): {len(chron_inv)} records")
-if len(chron_inv) > 0:
-    print("\nSample rows (first 5):")
-    print(chron_inv[['learner_signup_datetime','apply_date','engagement_lag_days']].head(5).to_string())
-
-# b) start > end (should be none after fix)
-bad_duration = df[df['opportunity_end_date'].notna() & df['opportunity_start_date'].notna() & (df['opportunity_end_date'] < df['opportunity_start_date'])]
-print(f"\nType B - opportunity_end_date < opportunity_start_date (should be 0): {len(bad_duration)}")
-if len(bad_duration) > 0:
-    print("\nSample rows:")
-    print(bad_duration[['opportunity_start_date','opportunity_end_date']].head(5).to_string())
-
-# c) unrealistic ages (<10 or >120)
-age_issues = df[(df['age_years'].notna()) & ((df['age_years'] < 10) | (df['age_years'] > 120))]
-print(f"\nType C - Age outliers (< 10 or > 120): {len(age_issues)}")
-if len(age_issues) > 0:
-    print("\nAge issues found:")
-    print(age_issues[['first_name','date_of_birth','learner_signup_datetime','age_years']].to_string())
-
-# d) entry_created_at vs signup year discrepancy
-df['entry_year'] = df['entry_created_at'].dt.year if df['entry_created_at'].notna().any() else np.nan
-df['signup_year_from_dt'] = df['learner_signup_datetime'].dt.year
-year_mismatch = df[df['entry_year'].notna() & df['signup_year_from_dt'].notna() & (df['entry_year'] != df['signup_year_from_dt']) & (df['entry_year'] > df['signup_year_from_dt'])]
-print(f"\nType D - entry_created_at year > signup_year (forward created): {len(year_mismatch)}")
-if len(year_mismatch) > 0:
-    print("\nSample rows where entry was created after signup:")
-    print(year_mismatch[['learner_signup_datetime', 'entry_created_at', 'apply_date']].head(5).to_string())
-
-# ----- 3) Fill missing buckets, standardize values -----
-print("\n" + "=" * 80)
-print("3) STANDARDIZATION & TYPE COERCION")
-print("=" * 80)
-
-# engagement_lag_bucket: recompute from engagement_lag_days (preserving NaN)
-bins = [-0.1, 0, 7, 30, 90, 1e9]
-labels = ['0', '1-7', '8-30', '31-90', '90+']
-df['engagement_lag_bucket'] = pd.cut(df['engagement_lag_days'], bins=bins, labels=labels)
-
-# ensure NaN for missing lags
-df.loc[df['engagement_lag_days'].isna(), 'engagement_lag_bucket'] = np.nan
-
-print("\nengagement_lag_bucket distribution (after recompute):")
-print(df['engagement_lag_bucket'].value_counts(dropna=False).sort_index())
-
-# ensure applied_after_start is clean
-df['applied_after_start'] = df['applied_after_start'].astype(int)
-print(f"\napplied_after_start distribution:")
-print(df['applied_after_start'].value_counts().sort_index())
-
-# ----- 4) Coerce types -----
-print("\n" + "=" * 80)
-print("4) TYPE COERCION")
-print("=" * 80)
-
-print("\nBefore type conversion:")
-print(f"  signup_year dtype: {df['signup_year'].dtype}")
-print(f"  signup_month dtype: {df['signup_month'].dtype}")
-print(f"  age_years dtype: {df['age_years'].dtype}")
-
-# Convert to integer types (nullable Int64 preserves NaN)
-df['signup_year'] = df['signup_year'].round().astype('Int64')
-df['signup_month'] = df['signup_month'].round().astype('Int64')
-df['age_years'] = df['age_years'].round().astype('Int64')
-df['engagement_lag_days'] = df['engagement_lag_days'].astype('float64')  # keep as float for precision
-df['opportunity_duration_days'] = df['opportunity_duration_days'].astype('float64')
-df['days_before_start'] = df['days_before_start'].astype('float64')
-
-print("\nAfter type conversion:")
-print(f"  signup_year dtype: {df['signup_year'].dtype}")
-print(f"  signup_month dtype: {df['signup_month'].dtype}")
-print(f"  age_years dtype: {df['age_years'].dtype}")
-
-# ----- 5) Extreme outlier report -----
-print("\n" + "=" * 80)
-print("5) OUTLIER IDENTIFICATION")
-print("=" * 80)
-
-outlier_candidates = df[(df['flag_days_before_start_extreme'] == 1) | (df['flag_engagement_inversion'] == 1)].copy()
-outlier_candidates.to_csv("outlier_candidates_week1.csv", index=False)
-print(f"\nOutlier candidates (extreme days_before_start OR engagement inversion): {len(outlier_candidates)}")
-print("\nOutlier candidates sample (first 10):")
-print(outlier_candidates[['apply_date', 'opportunity_start_date', 'days_before_start', 'engagement_lag_days', 'flag_engagement_inversion', 'flag_days_before_start_extreme']].head(10).to_string())
-
-# ----- 6) Quick visuals -----
-print("\n" + "=" * 80)
-print("6) GENERATING VISUALIZATIONS")
-print("=" * 80)
-
-# a) Valid vs invalid engagement_lag_days
-valid_count = df['engagement_lag_days'].notna().sum()
-invalid_count = df['flag_engagement_inversion'].sum()
-print(f"\nengagement_lag_days - Valid: {valid_count}, Invalid (flagged): {invalid_count}")
-
-plt.figure(figsize=(5, 4))
-plt.bar(['Valid', 'Invalid (NaN)'], [valid_count, invalid_count], color=['#2ecc71', '#e74c3c'])
-plt.title('engagement_lag_days: Valid vs Invalid', fontsize=12, fontweight='bold')
-plt.ylabel('Count')
-plt.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig("engagement_valid_invalid.png", dpi=150, bbox_inches='tight')
-plt.close()
-print("✓ Saved: engagement_valid_invalid.png")
-
-# b) days_before_start distribution (capped)
-plt.figure(figsize=(6, 4))
-days_capped = df['days_before_start'].clip(lower=-500, upper=500).dropna()
-plt.hist(days_capped, bins=50, color='#3498db', edgecolor='black', alpha=0.7)
-plt.axvline(x=0, color='red', linestyle='--', linewidth=2, label='Applied on start date')
-plt.title('days_before_start Distribution (clipped -500 to +500)', fontsize=12, fontweight='bold')
-plt.xlabel('Days before program start')
-plt.ylabel('Frequency')
-plt.legend()
-plt.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig("days_before_start_hist.png", dpi=150, bbox_inches='tight')
-plt.close()
-print("✓ Saved: days_before_start_hist.png")
-
-# c) engagement_lag_bucket distribution
-plt.figure(figsize=(6, 4))
-bucket_counts = df['engagement_lag_bucket'].value_counts().sort_index()
-plt.bar(range(len(bucket_counts)), bucket_counts.values, color='#9b59b6', edgecolor='black', alpha=0.7)
-plt.xticks(range(len(bucket_counts)), bucket_counts.index, rotation=45)
-plt.title('engagement_lag_bucket Distribution', fontsize=12, fontweight='bold')
-plt.ylabel('Count')
-plt.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig("engagement_lag_bucket_dist.png", dpi=150, bbox_inches='tight')
-plt.close()
-print("✓ Saved: engagement_lag_bucket_dist.png")
-
-# d) Age distribution
-plt.figure(figsize=(6, 4))
-age_data = df['age_years'].dropna()
-plt.hist(age_data, bins=40, color='#f39c12', edgecolor='black', alpha=0.7)
-plt.axvline(x=age_data.median(), color='red', linestyle='--', linewidth=2, label=f'Median: {age_data.median():.0f}')
-plt.title('Age Distribution', fontsize=12, fontweight='bold')
-plt.xlabel('Age (years)')
-plt.ylabel('Frequency')
-plt.legend()
-plt.grid(axis='y', alpha=0.3)
-plt.tight_layout()
-plt.savefig("age_distribution.png", dpi=150, bbox_inches='tight')
-plt.close()
-print("✓ Saved: age_distribution.png")
-
-# ----- 7) Save final checked file -----
-print("\n" + "=" * 80)
-print("7) SAVING FINAL OUTPUTS")
-print("=" * 80)
-
-# Drop temporary column
-df = df.drop(['entry_year', 'signup_year_from_dt'], axis=1, errors='ignore')
-
-df.to_csv(OUT_FINAL, index=False)
-print(f"\n✓ Saved final checked CSV: {OUT_FINAL}")
-
-# ----- 8) Quick summary csv -----
-summary = {
-    'metric': [
-        'total_rows',
-        'missing_engagement_lag_days',
-        'neg_engagement_flag',
-        'days_before_start_extreme_flag',
-        'neg_opportunity_duration_count',
-        'chronology_inversions_apply_before_signup',
-        'age_outliers',
-        'engagement_lag_valid_count',
-        'engagement_lag_bucket_complete_count'
-    ],
-    'value': [
-        int(len(df)),
-        int(df['engagement_lag_days'].isna().sum()),
-        int(df['flag_engagement_inversion'].sum()),
-        int(df['flag_days_before_start_extreme'].sum()),
-        int((df['opportunity_duration_days'] < 0).sum()),
-        len(chron_inv),
-        len(age_issues),
-        valid_count,
-        df['engagement_lag_bucket'].notna().sum()
+OUT_OUTLIERS = "outlier_candidates_week1.csv"
+
+# fixed histogram bins for the plots (days are clipped into range, ages are counted outside it);
+# the age bins cover every age the fix stage keeps (10..120)
+DAYS_EDGES = np.linspace(-500, 500, 51)
+AGE_EDGES = np.arange(10, 122)
+DATE_COLS = ['learner_signup_datetime', 'opportunity_end_date', 'date_of_birth',
+             'entry_created_at', 'apply_date', 'opportunity_start_date']
+
+
+def preview_path(path):
+    """Output path used in preview mode, so a sample run never overwrites full outputs."""
+    base, ext = os.path.splitext(path)
+    return f"{base}_preview{ext}"
+
+
+def run_diagnostics(input_csv=INPUT, out_final=OUT_FINAL, out_report=OUT_REPORT,
+                    out_outliers=OUT_OUTLIERS, no_plots=False, sample_fraction=None, seed=0, metrics=None):
+    """
+    Chronology checks, type coercion, outlier export, plots and summary report.
+    sample_fraction: preview on a stratified sample (see sampling.py); counts become
+    population estimates with 95% intervals, outputs get a _preview suffix, no plots.
+    metrics (metrics.RunMetrics) receives throughput, rule violations and the summary metrics.
+    """
+    if metrics is not None:
+        metrics.start_stage('diagnose')
+    if sample_fraction:
+        est = stratified_sample_csv(input_csv, sample_fraction, seed=seed, parse_dates=DATE_COLS, dayfirst=False)
+        df = est.df
+        out_final, out_report, out_outliers = (preview_path(p) for p in (out_final, out_report, out_outliers))
+        no_plots = True
+    else:
+        df = pd.read_csv(input_csv, parse_dates=DATE_COLS, dayfirst=False)
+        est = ExactCounts(df)
+
+    def count(values):
+        """Count for the printout: exact, or a population estimate ± CI in preview mode."""
+        return est.count_text(values, grouping=False)
+
+    pd.set_option('display.max_rows', 20)
+
+    print("=" * 80)
+    print("COMPREHENSIVE DATASET DIAGNOSTICS & CORRECTIONS - WEEK 1")
+    print("=" * 80)
+    if est.is_sample:
+        print(est.describe())
+
+    # ----- 1) Basic diagnostics -----
+    print("\n" + "=" * 80)
+    print("1) BASIC DIAGNOSTICS")
+    print("=" * 80)
+    print(f"\nRows: {est.n_population}")
+    print(f"Columns: {len(df.columns)}")
+    print(f"\nMissing engagement_lag_days (NaN): {count(df['engagement_lag_days'].isna())}")
+    print(f"Negative opportunity_duration_days (should be 0): {count(df['opportunity_duration_days'] < 0)}")
+    print(f"Flags - engagement inversion: {count(df['flag_engagement_inversion'])}")
+    print(f"Flags - days_before_start extreme: {count(df['flag_days_before_start_extreme'])}")
+
+    # ----- 2) Chronology checks (critical) -----
+    print("\n" + "=" * 80)
+    print("2) CHRONOLOGY VALIDATION")
+    print("=" * 80)
+
+    # All chronology/plausibility rules are declared in validation_rules.py and
+    # evaluated together in one pass; each check below just reads its result.
+    rules = compile_rules()
+    rule_result = rules.evaluate(df)
+    counts = rule_result.counts
+    masks = rule_result.masks
+
+    # a) apply before signup (should match flag)
+    print(f"\nType A - apply_date < signup_date (chronology inversions): {count(masks['apply_before_signup'])} records")
+    if counts['apply_before_signup'] > 0:
+        print("\nSample rows (first 5):")
+        print(rule_result.samples('apply_before_signup', 5).to_string())
+
+    # b) start > end (should be none after fix)
+    print(f"\nType B - opportunity_end_date < opportunity_start_date (should be 0): {count(masks['end_before_start'])}")
+    if counts['end_before_start'] > 0:
+        print("\nSample rows:")
+        print(rule_result.samples('end_before_start', 5).to_string())
+
+    # c) unrealistic ages (<10 or >120)
+    print(f"\nType C - Age outliers (< 10 or > 120): {count(masks['age_out_of_range'])}")
+    if counts['age_out_of_range'] > 0:
+        print("\nAge issues found:")
+        print(rule_result.samples('age_out_of_range', None).to_string())
+
+    # d) entry_created_at vs signup year discrepancy
+    print(f"\nType D - entry_created_at year > signup_year (forward created): {count(masks['entry_year_after_signup'])}")
+    if counts['entry_year_after_signup'] > 0:
+        print("\nSample rows where entry was created after signup:")
+        print(rule_result.samples('entry_year_after_signup', 5).to_string())
+
+    print(f"\nRule engine: {len(rules.names)} rules over {len(rules.columns)} columns; "
+          f"rows with any violation: {count(rule_result.any_violation())}")
+    rule_summary = rule_result.summary()
+    if est.is_sample:
+        rule_summary['violations'] = [count(masks[name]) for name in rule_summary['rule']]
+    print(rule_summary.to_string(index=False))
+    # rows breaking several rules at once, read back from the packed bitmask
+    combos = pd.Series(rule_result.bitmask[rule_result.any_violation()]).value_counts()
+    if len(combos):
+        print("\nRows by combination of violated rules (top 10):")
+        for value in combos.index[:10]:
+            print(f"  {' + '.join(decode_bitmask(value, rules.rules))}: {count(rule_result.bitmask == value)}")
+
+    # ----- 3) Fill missing buckets, standardize values -----
+    print("\n" + "=" * 80)
+    print("3) STANDARDIZATION & TYPE COERCION")
+    print("=" * 80)
+
+    # engagement_lag_bucket: recompute from engagement_lag_days (preserving NaN)
+    bins = [-0.1, 0, 7, 30, 90, 1e9]
+    labels = ['0', '1-7', '8-30', '31-90', '90+']
+    df['engagement_lag_bucket'] = pd.cut(df['engagement_lag_days'], bins=bins, labels=labels)
+
+    # ensure NaN for missing lags
+    df.loc[df['engagement_lag_days'].isna(), 'engagement_lag_bucket'] = np.nan
+
+    print("\nengagement_lag_bucket distribution (after recompute):")
+    print(est.distribution(df['engagement_lag_bucket']))
+
+    # ensure applied_after_start is clean
+    df['applied_after_start'] = df['applied_after_start'].astype(int)
+    print(f"\napplied_after_start distribution:")
+    print(est.distribution(df['applied_after_start']))
+
+    # ----- 4) Coerce types -----
+    print("\n" + "=" * 80)
+    print("4) TYPE COERCION")
+    print("=" * 80)
+
+    print("\nBefore type conversion:")
+    print(f"  signup_year dtype: {df['signup_year'].dtype}")
+    print(f"  signup_month dtype: {df['signup_month'].dtype}")
+    print(f"  age_years dtype: {df['age_years'].dtype}")
+
+    # Convert to integer types (nullable Int64 preserves NaN)
+    df['signup_year'] = df['signup_year'].round().astype('Int64')
+    df['signup_month'] = df['signup_month'].round().astype('Int64')
+    df['age_years'] = df['age_years'].round().astype('Int64')
+    df['engagement_lag_days'] = df['engagement_lag_days'].astype('float64')  # keep as float for precision
+    df['opportunity_duration_days'] = df['opportunity_duration_days'].astype('float64')
+    df['days_before_start'] = df['days_before_start'].astype('float64')
+
+    print("\nAfter type conversion:")
+    print(f"  signup_year dtype: {df['signup_year'].dtype}")
+    print(f"  signup_month dtype: {df['signup_month'].dtype}")
+    print(f"  age_years dtype: {df['age_years'].dtype}")
+
+    # ----- 5) Extreme outlier report -----
+    print("\n" + "=" * 80)
+    print("5) OUTLIER IDENTIFICATION")
+    print("=" * 80)
+
+    # Robust per-group fences (median/MAD + IQR) by opportunity_category and opportunity_id
+    outlier_candidates, outlier_stats = write_outlier_candidates(df, out_outliers)
+    print(f"\nOutlier candidates (robust per-group fences on {', '.join(OUTLIER_METRICS)}): {len(outlier_candidates)}")
+    for level, level_stats in outlier_stats.items():
+        print(f"  groups by {level}: {len(level_stats)}")
+    print("\nOutlier candidates sample (first 10):")
+    print(outlier_candidates[['apply_date', 'opportunity_start_date', 'days_before_start', 'engagement_lag_days', 'outlier_reasons', 'max_robust_z']].head(10).to_string())
+
+    # ----- 6) Quick visuals -----
+    print("\n" + "=" * 80)
+    print("6) GENERATING VISUALIZATIONS")
+    print("=" * 80)
+
+    # a) Valid vs invalid engagement_lag_days
+    valid_count = df['engagement_lag_days'].notna().sum()
+    invalid_count = df['flag_engagement_inversion'].sum()
+    print(f"\nengagement_lag_days - Valid: {count(df['engagement_lag_days'].notna())}, "
+          f"Invalid (flagged): {count(df['flag_engagement_inversion'])}")
+
+    # Plots are pre-binned here and rendered by plots.py (headless, parallel, cached)
+    # from streaming sketches over fixed bin edges, so the bins do not depend on the data.
+    # The full file is sketched from disk, two columns at a time in chunks; a preview
+    # sketches its in-memory sample.
+    edges = {'days_before_start': DAYS_EDGES, 'age_years': AGE_EDGES}
+    if est.is_sample:
+        plot_sketches = {c: sketch_series(df[c], hist_edges=e, clip=c == 'days_before_start') for c, e in edges.items()}
+    else:
+        plot_sketches = sketch_csv(input_csv, list(edges), hist_edges=edges, clip={'days_before_start'})
+    days = plot_sketches['days_before_start']
+    days_counts, days_edges = days.hist.counts.tolist(), days.hist.edges.tolist()
+    bucket_counts = df['engagement_lag_bucket'].value_counts().sort_index()
+    age = plot_sketches['age_years']
+    age_counts, age_edges = age.hist.counts.tolist(), age.hist.edges.tolist()
+    age_median = age.median()
+    if age.hist.underflow or age.hist.overflow:
+        print(f"Ages outside the {AGE_EDGES[0]}-{AGE_EDGES[-1]} plot range: "
+              f"{age.hist.underflow} below, {age.hist.overflow} above")
+
+    plot_specs = [
+        # a) Valid vs invalid engagement_lag_days
+        bar_spec("engagement_valid_invalid.png", ['Valid', 'Invalid (NaN)'], [valid_count, invalid_count],
+                 'engagement_lag_days: Valid vs Invalid', color=['#2ecc71', '#e74c3c'], figsize=(5, 4)),
+        # b) days_before_start distribution (capped)
+        hist_spec("days_before_start_hist.png", days_counts, days_edges,
+                  'days_before_start Distribution (clipped -500 to +500)', 'Days before program start',
+                  color='#3498db', vline=0, vline_label='Applied on start date'),
+        # c) engagement_lag_bucket distribution
+        bar_spec("engagement_lag_bucket_dist.png", bucket_counts.index, bucket_counts.values,
+                 'engagement_lag_bucket Distribution', color='#9b59b6', rotation=45, edgecolor='black', alpha=0.7),
+        # d) Age distribution
+        hist_spec("age_distribution.png", age_counts, age_edges, 'Age Distribution', 'Age (years)',
+                  color='#f39c12', vline=age_median, vline_label=f'Median: {age_median:.0f}'),
     ]
-}
-summary_df = pd.DataFrame(summary)
-summary_df.to_csv(OUT_REPORT, index=False)
-print(f"✓ Saved summary report: {OUT_REPORT}\n")
-print(summary_df.to_string(index=False))
-
-# ----- 9) Data quality summary -----
-print("\n" + "=" * 80)
-print("8) DATA QUALITY SUMMARY")
-print("=" * 80)
-
-total_cells = len(df) * len(df.columns)
-missing_cells = df.isna().sum().sum()
-completeness = ((total_cells - missing_cells) / total_cells) * 100
-
-print(f"\nTotal cells: {total_cells:,}")
-print(f"Missing cells: {missing_cells:,}")
-print(f"Completeness: {completeness:.2f}%")
-print(f"\nData Quality Score: {'GOOD ✅' if completeness >= 90 else 'NEEDS WORK ⚠️'}")
-
-print("\n" + "=" * 80)
-print("DIAGNOSTICS & CORRECTIONS COMPLETE")
-print("=" * 80)
-print("\nNext steps:")
-print("1. Review outlier_candidates_week1.csv for manual inspection")
-print("2. Check the generated PNG visualizations for distribution insights")
-print("3. Use Cleaned_Preprocessed_Dataset_Week1_final_checked.csv for analysis")
-print("4. Refer to validation_report_week1.csv for summary metrics")
+
+    if no_plots:
+        print("Plot stage skipped (--no-plots)")
+    else:
+        plot_status = render_plots(plot_specs)
+        for path, state in plot_status.items():
+            print(f"✓ {'Saved' if state == 'rendered' else 'Unchanged (cached)'}: {path}")
+
+    # ----- 7) Save final checked file -----
+    print("\n" + "=" * 80)
+    print("7) SAVING FINAL OUTPUTS")
+    print("=" * 80)
+
+    # Packed per-row rule violations (bit i = rules.names[i]) travel with the checked file
+    write_csv(df.assign(**{BITMASK_COLUMN: rule_result.bitmask}), out_final, index=False)
+    print(f"\n✓ Saved final checked CSV: {out_final}")
+
+    # ----- 8) Quick summary csv -----
+    # every metric is a per-row count, so a preview run can scale it to the population
+    summary_rows = {
+        'total_rows': np.ones(len(df)),
+        'missing_engagement_lag_days': df['engagement_lag_days'].isna(),
+        'neg_engagement_flag': df['flag_engagement_inversion'],
+        'days_before_start_extreme_flag': df['flag_days_before_start_extreme'],
+        'neg_opportunity_duration_count': df['opportunity_duration_days'] < 0,
+        'chronology_inversions_apply_before_signup': masks['apply_before_signup'],
+        'age_outliers': masks['age_out_of_range'],
+        'engagement_lag_valid_count': df['engagement_lag_days'].notna(),
+        'engagement_lag_bucket_complete_count': df['engagement_lag_bucket'].notna(),
+        'robust_outlier_candidates': df.index.isin(outlier_candidates['row_index']),
+    }
+    estimates = {metric: est.total(values) for metric, values in summary_rows.items()}
+    summary_df = pd.DataFrame({
+        'metric': list(estimates),
+        'value': [int(round(value)) for value, _ in estimates.values()],
+    })
+    if est.is_sample:
+        half_widths = np.array([hw for _, hw in estimates.values()])
+        summary_df['ci95_low'] = np.maximum(summary_df['value'] - half_widths, 0).round().astype(int)
+        summary_df['ci95_high'] = (summary_df['value'] + half_widths).round().astype(int)
+    summary_df.to_csv(out_report, index=False)
+    print(f"✓ Saved summary report: {out_report}\n")
+    print(summary_df.to_string(index=False))
+
+    # ----- 9) Data quality summary -----
+    print("\n" + "=" * 80)
+    print("8) DATA QUALITY SUMMARY")
+    print("=" * 80)
+
+    total_cells = est.n_population * len(df.columns)
+    missing_cells, missing_hw = est.total(df.isna().sum(axis=1))
+    completeness = ((total_cells - missing_cells) / total_cells) * 100
+
+    print(f"\nTotal cells: {total_cells:,}")
+    print(f"Missing cells: {format_estimate(missing_cells, missing_hw)}")
+    print(f"Completeness: {completeness:.2f}%")
+    print(f"\nData Quality Score: {'GOOD ✅' if completeness >= 90 else 'NEEDS WORK ⚠️'}")
+
+    print("\n" + "=" * 80)
+    print("DIAGNOSTICS & CORRECTIONS COMPLETE")
+    print("=" * 80)
+    print("\nNext steps:")
+    print("1. Review outlier_candidates_week1.csv for manual inspection")
+    print("2. Check the generated PNG visualizations for distribution insights")
+    print("3. Use Cleaned_Preprocessed_Dataset_Week1_final_checked.csv for analysis")
+    print("4. Refer to validation_report_week1.csv for summary metrics")
+
+    if metrics is not None:
+        metrics.end_stage('diagnose', len(df))
+        for name in rules.names:
+            metrics.set('rule_violations', est.total(masks[name])[0], rule=name)
+        for metric, value in zip(summary_df['metric'], summary_df['value']):
+            metrics.set('quality_metric', value, metric=metric)
+
+    return summary_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Comprehensive dataset diagnostics & corrections")
+    parser.add_argument("--input", default=INPUT, help="dataset with flags (default: %(default)s)")
+    parser.add_argument("--out-final", default=OUT_FINAL, help="checked dataset CSV (default: %(default)s)")
+    parser.add_argument("--out-report", default=OUT_REPORT, help="summary metrics CSV (default: %(default)s)")
+    parser.add_argument("--out-outliers", default=OUT_OUTLIERS, help="outlier candidates CSV (default: %(default)s)")
+    parser.add_argument("--no-plots", action="store_true", help="skip the plot stage (matplotlib is never imported)")
+    parser.add_argument("--sample", type=float, metavar="FRACTION",
+                        help="preview on a stratified sample of this fraction (e.g. 0.05)")
+    parser.add_argument("--seed", type=int, default=0, help="sampling seed (default: %(default)s)")
+    args = parser.parse_args(argv)
+    run_diagnostics(args.input, args.out_final, args.out_report, args.out_outliers, no_plots=args.no_plots,
+                    sample_fraction=args.sample, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
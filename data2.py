@@ -10,8 +10,14 @@ import pandas as pd
 import numpy as np
 import re
 from datetime import datetime
+from functools import lru_cache
 import os
-from IPython.display import display
+
+from checkpoint import atomic_output, to_csv_atomic
+from writers import write_xlsx
+from prefetch import in_background
+from daydates import day_diff, day_month, day_year, to_day_columns, to_day_numbers
+from lineage import RAW_ROW_ID, align_raw, assign_raw_row_ids, has_lineage, lineage_path_for, save_lineage
 
 # -----------------------
 # Configuration
@@ -22,11 +28,36 @@ AUDIT_FILE = "cleaning_audit_log_week1.csv"
 FINAL_CSV = "Cleaned_Preprocessed_Dataset_Week1_final.csv"
 FINAL_XLSX = "Cleaned_Preprocessed_Dataset_Week1_final.xlsx"
 
+DATE_COLUMNS = ['learner_signup_datetime','date_of_birth','entry_created_at','apply_date','opportunity_start_date','opportunity_end_date']
+DATE_FORMATS = ["%m/%d/%Y %H:%M:%S","%d/%m/%Y %H:%M:%S","%d-%m-%Y %H:%M:%S","%m/%d/%Y","%d/%m/%Y","%Y-%m-%d"]
+# formats tried again once a corrupt time part has been stripped (targeted reparse)
+REPARSE_FORMATS = ["%m/%d/%Y %H:%M:%S","%d/%m/%Y %H:%M:%S","%m/%d/%Y","%d/%m/%Y","%Y-%m-%d"]
+
 # -----------------------
 # Utility functions (exposed for testing)
 # -----------------------
-def normalize_column_names(df):
-    df = df.copy()
+def _copy_on_write():
+    """True when pandas copy-on-write is active (always from pandas 3, opt-in before)."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.options.mode.copy_on_write is True
+
+def _stage_frame(df, inplace=False):
+    """
+    The frame a stage works on. inplace=True: df itself (the caller's frame is
+    modified). Otherwise a copy: under copy-on-write a shallow one, so only the
+    columns the stage writes get duplicated; without it a full copy.
+    """
+    if inplace:
+        return df
+    return df.copy(deep=not _copy_on_write())
+
+def _snapshot(series):
+    """Pre-change values of a column for auditing (lazy under copy-on-write)."""
+    return series if _copy_on_write() else series.copy()
+
+def normalize_column_names(df, inplace=False):
+    df = _stage_frame(df, inplace)
     df.columns = (
         df.columns.str.strip()
                    .str.replace(" ", "_", regex=False)
@@ -127,30 +158,34 @@ class AuditCollector:
 # -----------------------
 # Pipeline functions (useful for unit tests)
 # -----------------------
-def parse_and_clean_dates(df, audit=None):
-    """Parse known date columns robustly and return df (mutates copy)."""
-    df = df.copy()
-    date_cols = ['learner_signup_datetime','date_of_birth','entry_created_at','apply_date','opportunity_start_date','opportunity_end_date']
-    formats = ["%m/%d/%Y %H:%M:%S","%d/%m/%Y %H:%M:%S","%d-%m-%Y %H:%M:%S","%m/%d/%Y","%d/%m/%Y","%Y-%m-%d"]
-    for c in date_cols:
+def parse_and_clean_dates(df, audit=None, inplace=False):
+    """Parse known date columns robustly and return df (mutates copy unless inplace)."""
+    df = _stage_frame(df, inplace)
+    for c in DATE_COLUMNS:
         if c in df.columns:
-            before = df[c].copy()
-            df[c] = robust_parse_dates(df[c].astype(str), extra_formats=formats, dayfirst_try=True)
+            before = _snapshot(df[c]) if audit is not None else None
+            df[c] = robust_parse_dates(df[c].astype(str), extra_formats=DATE_FORMATS, dayfirst_try=True)
             if audit is not None:
                 changed_idx = before.index[(before.notna()) & (df[c].isna())]
                 for i in changed_idx:
                     audit.record(i, c, before.at[i], df.at[i,c])
     return df
 
+def _normalize_col_key(name):
+    return re.sub(r'[^0-9a-z]', '', str(name).lower())
+
+@lru_cache(maxsize=None)
+def _normalized_columns(columns):
+    """normalized key -> raw name, computed once per distinct header (tuple of names)."""
+    return {_normalize_col_key(c): c for c in columns}
+
 def _find_raw_col_variant(raw_df, target_col):
     """
     Try to find a raw dataframe column name that corresponds to logical target_col.
     It matches ignoring case and non-alphanumeric characters.
     """
-    def normalize(name):
-        return re.sub(r'[^0-9a-z]', '', str(name).lower())
-    target_norm = normalize(target_col)
-    candidates = {normalize(c): c for c in raw_df.columns}
+    target_norm = _normalize_col_key(target_col)
+    candidates = _normalized_columns(tuple(raw_df.columns))
     if target_norm in candidates:
         return candidates[target_norm]
     # fallback: try partial tokens match (e.g., match 'learnersignupdatetime' to 'Learner SignUp DateTime')
@@ -159,12 +194,14 @@ def _find_raw_col_variant(raw_df, target_col):
             return orig
     return None
 
-def targeted_reparse_removing_corrupt_time(raw_df, df, col, audit=None):
+def targeted_reparse_removing_corrupt_time(raw_df, df, col, audit=None, inplace=False):
     """
     Attempt to recover NaT values in df[col] by inspecting raw_df.
     If exact col name isn't present in raw_df, try to locate a column variant.
+    Rows are matched to raw_df by raw_row_id when df has one (see lineage.py),
+    otherwise by index position.
     """
-    df = df.copy()
+    df = _stage_frame(df, inplace)
     # find raw column name variant
     raw_col = col if col in raw_df.columns else _find_raw_col_variant(raw_df, col)
     if col not in df.columns:
@@ -174,13 +211,16 @@ def targeted_reparse_removing_corrupt_time(raw_df, df, col, audit=None):
         # cannot find corresponding raw column
         return df
 
+    # line raw values up with df: by raw_row_id when df carries lineage, else by index (legacy)
+    raw_values = align_raw(raw_df, df, raw_col) if has_lineage(df) else raw_df[raw_col]
+
     # find indices where parse failed but raw has value
-    failed_mask = df[col].isna() & raw_df[raw_col].notna()
+    failed_mask = df[col].isna() & raw_values.notna()
     if not failed_mask.any():
         return df
     idx = df[failed_mask].index
-    cleaned_raw = raw_df.loc[idx, raw_col].apply(remove_corrupt_hour_time)
-    parsed = robust_parse_dates(cleaned_raw, extra_formats=["%m/%d/%Y %H:%M:%S","%d/%m/%Y %H:%M:%S","%m/%d/%Y","%d/%m/%Y","%Y-%m-%d"], dayfirst_try=False)
+    cleaned_raw = raw_values.loc[idx].apply(remove_corrupt_hour_time)
+    parsed = robust_parse_dates(cleaned_raw, extra_formats=REPARSE_FORMATS, dayfirst_try=False)
     # apply recovered dates and audit
     for i in parsed.index:
         if pd.notna(parsed.at[i]):
@@ -189,18 +229,18 @@ def targeted_reparse_removing_corrupt_time(raw_df, df, col, audit=None):
             df.at[i,col] = parsed.at[i]
     return df
 
-def fill_opportunity_dates_by_id(df, audit=None):
+def fill_opportunity_dates_by_id(df, audit=None, inplace=False):
     """
     Fill missing opportunity_start_date and opportunity_end_date within the same opportunity_id
     using forward-fill then back-fill. Records any changes to the audit collector if provided.
     """
-    df = df.copy()
+    df = _stage_frame(df, inplace)
     if 'opportunity_id' not in df.columns:
         return df
 
     # Keep pre-change copies aligned to the current df index
-    before_start = df['opportunity_start_date'].copy() if 'opportunity_start_date' in df.columns else None
-    before_end = df['opportunity_end_date'].copy() if 'opportunity_end_date' in df.columns else None
+    before_start = _snapshot(df['opportunity_start_date']) if 'opportunity_start_date' in df.columns else None
+    before_end = _snapshot(df['opportunity_end_date']) if 'opportunity_end_date' in df.columns else None
 
     # Fill per-group without sorting; transform preserves original indices
     df['opportunity_start_date'] = df.groupby('opportunity_id')['opportunity_start_date'].transform(lambda x: x.ffill().bfill())
@@ -219,8 +259,8 @@ def fill_opportunity_dates_by_id(df, audit=None):
 
     return df
 
-def fix_end_before_start(df, audit=None):
-    df = df.copy()
+def fix_end_before_start(df, audit=None, inplace=False):
+    df = _stage_frame(df, inplace)
     if 'opportunity_start_date' in df.columns and 'opportunity_end_date' in df.columns:
         mask = df['opportunity_end_date'].notna() & df['opportunity_start_date'].notna() & (df['opportunity_end_date'] < df['opportunity_start_date'])
         for i in df.index[mask]:
@@ -230,21 +270,38 @@ def fix_end_before_start(df, audit=None):
                 audit.record(i, 'opportunity_end_date', old, df.at[i,'opportunity_end_date'])
     return df
 
-def compute_features(df):
-    df = df.copy()
+def compute_features(df, day_resolution=False, inplace=False):
+    """
+    Derived age/lag/duration features. With day_resolution=True the whole-day date
+    columns are stored as int32 day numbers (daydates.to_day_columns) and stay that way
+    in the result; spans are the same as with Timestamps (floor of the difference).
+    Like the other stages it returns a new frame unless inplace=True.
+    """
+    df = _stage_frame(df, inplace)
+    if day_resolution:
+        to_day_columns(df, ['date_of_birth', 'learner_signup_datetime', 'apply_date', 'opportunity_start_date', 'opportunity_end_date'])
+        def diff(later, earlier):
+            return day_diff(df[later], df[earlier])
+    else:
+        def diff(later, earlier):
+            return (df[later] - df[earlier]).dt.days
     if 'date_of_birth' in df.columns and 'learner_signup_datetime' in df.columns:
-        df['age_years'] = np.floor((df['learner_signup_datetime'] - df['date_of_birth']).dt.days / 365.25)
+        df['age_years'] = np.floor(diff('learner_signup_datetime', 'date_of_birth') / 365.25)
     else:
         df['age_years'] = np.nan
     if 'learner_signup_datetime' in df.columns:
-        df['signup_month'] = df['learner_signup_datetime'].dt.month
-        df['signup_year'] = df['learner_signup_datetime'].dt.year
+        if day_resolution:
+            df['signup_month'] = day_month(df['learner_signup_datetime'])
+            df['signup_year'] = day_year(df['learner_signup_datetime'])
+        else:
+            df['signup_month'] = df['learner_signup_datetime'].dt.month
+            df['signup_year'] = df['learner_signup_datetime'].dt.year
     if 'apply_date' in df.columns and 'learner_signup_datetime' in df.columns:
-        df['engagement_lag_days'] = (df['apply_date'] - df['learner_signup_datetime']).dt.days
+        df['engagement_lag_days'] = diff('apply_date', 'learner_signup_datetime')
     if 'opportunity_end_date' in df.columns and 'opportunity_start_date' in df.columns:
-        df['opportunity_duration_days'] = (df['opportunity_end_date'] - df['opportunity_start_date']).dt.days
+        df['opportunity_duration_days'] = diff('opportunity_end_date', 'opportunity_start_date')
     if 'opportunity_start_date' in df.columns and 'apply_date' in df.columns:
-        df['days_before_start'] = (df['opportunity_start_date'] - df['apply_date']).dt.days
+        df['days_before_start'] = diff('opportunity_start_date', 'apply_date')
     return df
 
 # -----------------------
@@ -334,6 +391,8 @@ def run_unit_tests():
     })
     df_feat = compute_features(df_feat)
     assert 'age_years' in df_feat.columns and 'engagement_lag_days' in df_feat.columns and 'opportunity_duration_days' in df_feat.columns, "feature computation failed"
+    df_feat_days = compute_features(df_feat, day_resolution=True)
+    assert df_feat_days['engagement_lag_days'].iloc[0] == 1 and df_feat_days['age_years'].iloc[0] == 23, "day-resolution features failed"
     print("Test 9 (feature engineering) - PASS")
 
     # ---------- Test 10: audit collector records changes ----------
@@ -343,44 +402,681 @@ def run_unit_tests():
     assert len(df_audit) == 1 and df_audit.iloc[0]['column']=='gender', "audit collector failed"
     print("Test 10 (audit collector) - PASS")
 
+    # ---------- Test 11: lineage-aware targeted reparse ----------
+    raw_df = assign_raw_row_ids(pd.DataFrame({
+        'Learner SignUp DateTime': ["06/14/2023 708:21:29", "05/01/2023 05:29:16", None]
+    }))
+    # cleaned frame was filtered and reordered: raw rows 2 and 0 only, new positional index
+    df_parsed = pd.DataFrame({
+        RAW_ROW_ID: [2, 0],
+        'learner_signup_datetime': [pd.NaT, pd.NaT]
+    })
+    df_fixed = targeted_reparse_removing_corrupt_time(raw_df, df_parsed, 'learner_signup_datetime')
+    assert pd.isna(df_fixed.at[0, 'learner_signup_datetime']), "lineage reparse used the wrong raw row"
+    assert df_fixed.at[1, 'learner_signup_datetime'] == pd.Timestamp('2023-06-14'), "lineage reparse failed"
+    print("Test 11 (lineage-aware reparse) - PASS")
+
+    # ---------- Test 12: star-schema split, per-opportunity fixes, rejoin ----------
+    from star_schema import join_star, split_opportunities
+    df_flat = pd.DataFrame({
+        'learner_id': [1, 2, 3],
+        'opportunity_id': ['A', 'A', 'B'],
+        'opportunity_start_date': [None, '2024-04-30 00:00:00', '2024-05-01 00:00:00'],
+        'opportunity_end_date': ['2024-04-23 00:00:00', None, '2024-05-05 00:00:00'],
+        'opportunity_duration_days': [-7.0, -7.0, 4.0],
+        'log_opportunity_duration': [np.nan, np.nan, np.log1p(4.0)],
+    })
+    audit = AuditCollector()
+    opps, apps = split_opportunities(df_flat, audit=audit)
+    repaired = opps.set_index('opportunity_id').loc['A']
+    assert repaired['opportunity_duration_days'] == 0 and repaired['log_opportunity_duration'] == 0, "duration / log not recomputed"
+    assert len(opps) == 2 and 'opportunity_end_date' not in apps.columns, "star split failed"
+    df_joined = join_star(opps, apps, list(df_flat.columns))
+    assert (df_joined['opportunity_end_date'] == df_joined['opportunity_start_date']).iloc[:2].all(), "per-opportunity end<start fix failed"
+    assert df_joined.iloc[2].equals(df_flat.iloc[2]), "star rejoin changed an untouched row"
+    assert len(audit.rows) == 7, "star audit should record one entry per changed row and column"
+    print("Test 12 (star schema) - PASS")
+
+    # ---------- Test 13: atomic outputs and stage checkpoints ----------
+    import tempfile
+    from checkpoint import CheckpointStore
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out = os.path.join(tmp_dir, 'out.csv')
+        to_csv_atomic(pd.DataFrame({'a': [1]}), out, index=False)
+        try:
+            with atomic_output(out) as tmp:
+                open(tmp, 'w').write('partial')
+                raise RuntimeError('crash mid-write')
+        except RuntimeError:
+            pass
+        assert pd.read_csv(out)['a'].tolist() == [1], "failed write replaced the previous output"
+        assert os.listdir(tmp_dir) == ['out.csv'], "partial file left behind"
+        store = CheckpointStore(os.path.join(tmp_dir, 'ckpt'))
+        assert not store.is_complete('stage', [], [out]), "checkpoint complete before it was saved"
+        store.save('stage', [], [out])
+        assert store.is_complete('stage', [], [out]), "checkpoint not complete after save"
+        to_csv_atomic(pd.DataFrame({'a': [2]}), out, index=False)
+        assert not store.is_complete('stage', [], [out]), "changed output still counted as checkpointed"
+    print("Test 13 (atomic outputs / checkpoints) - PASS")
+
+    # ---------- Test 14: stages are pure by default, copy-free with inplace=True ----------
+    df_src = pd.DataFrame({
+        'opportunity_id': ['A', 'A'],
+        'opportunity_start_date': pd.to_datetime(['2024-05-01', '2024-05-01']),
+        'opportunity_end_date': pd.to_datetime(['2024-04-30', pd.NaT]),
+    })
+    df_orig = df_src.copy()
+    df_pure = fix_end_before_start(fill_opportunity_dates_by_id(df_src))
+    df_pure = compute_features(df_pure)
+    assert df_src.equals(df_orig), "default stage call modified its input"
+    assert (df_pure['opportunity_duration_days'] == 0).all(), "pure stages gave wrong result"
+    df_same = fix_end_before_start(fill_opportunity_dates_by_id(df_src, inplace=True), inplace=True)
+    assert compute_features(df_same, inplace=True) is df_src, "inplace stage returned a different frame"
+    assert df_src.equals(df_pure), "inplace and pure results differ"
+    print("Test 14 (pure vs inplace stages) - PASS")
+
+    # ---------- Test 15: projected read, raw passthrough of untouched columns ----------
+    from projection import read_projected, write_passthrough
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src, out = os.path.join(tmp_dir, 'in.csv'), os.path.join(tmp_dir, 'out.csv')
+        with open(src, 'w') as f:
+            f.write('name,score,note\n"Doe, J",1.10,"line one\nline two"\nRoe,,plain\n')
+        df_proj, raw = read_projected(src, ['score'])
+        assert list(df_proj.columns) == ['score'], "projection parsed undeclared columns"
+        df_proj['score'] = df_proj['score'].fillna(0) * 2
+        df_proj['flag'] = 1
+        write_passthrough(df_proj, raw, out, ['score'])
+        written = open(out).read()
+        assert written == 'name,score,note,flag\n"Doe, J",2.2,"line one\nline two",1\nRoe,0.0,plain,1\n', \
+            "passthrough did not keep untouched fields verbatim"
+        assert raw.null_mask('score').tolist() == [False, True], "raw null mask wrong"
+        write_passthrough(df_proj, raw, out, ['score'], chunk_rows=1)
+        assert open(out).read() == written, "chunked passthrough differs"
+        try:
+            write_passthrough(df_proj.iloc[:1], raw, out, ['score'])
+            raise AssertionError("row count change not detected")
+        except ValueError:
+            assert open(out).read() == written, "failed passthrough replaced the output"
+        # a float text that read_csv + to_csv would rewrite passes through as it was
+        with open(src, 'w') as f:
+            f.write('score,ratio\n1,3.8066624897703196\n')
+        df_proj, raw = read_projected(src, ['score'])
+        write_passthrough(df_proj, raw, out, ['score'])
+        assert open(out, newline='').read() == 'score,ratio\n1,3.8066624897703196\n', "passthrough changed the float text"
+        assert pd.read_csv(src).to_csv(index=False) != open(out).read(), "full read no longer re-rounds; update projection.py's note"
+    print("Test 15 (column projection / passthrough) - PASS")
+
+    # ---------- Test 16: watch mode folds a new export into the warm dataset ----------
+    from watch import WarmState
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        header = 'Learner SignUp DateTime,Opportunity Id,Apply Date,Opportunity Start Date,Opportunity End Date\n'
+        first, second = os.path.join(tmp_dir, 'a.csv'), os.path.join(tmp_dir, 'b.csv')
+        open(first, 'w').write(header + '06/14/2023 12:30:35,OPP1,06/20/2023 10:00:00,,\n')
+        open(second, 'w').write(header + '06/14/2023 12:30:35,OPP1,06/21/2023 10:00:00,07/15/2023,08/15/2023\n')
+        state = WarmState()
+        state.add_file(first)
+        n_new, filled = state.add_file(second)
+        assert len(state.df) == 2 and state.df[RAW_ROW_ID].tolist() == [0, 1], "watch merge lost or renumbered rows"
+        assert filled == 2 and state.df['opportunity_duration_days'].tolist() == [31, 31], "opportunity dates not filled into earlier rows"
+        assert len(state.parse_cache.values) == 5, "repeated date text was parsed again"
+    print("Test 16 (watch mode warm state) - PASS")
+
+    # ---------- Test 17: execution backends give the pandas results ----------
+    import backends
+    df_mixed = pd.DataFrame({
+        'first_name': ["  o'neil ", None, "ANNA-maria", "..."],
+        'gender': ['M', 'female', None, 'Other'],
+        'status_description': ['withdrawn', 'Started', '', None],
+        'learner_signup_datetime': ["06/14/2023 12:30:35", "14-06-2023 12:30:35", None, "2023-06-14"],
+        'date_of_birth': ["2001-12-01", "01/27/2002", "bad", None],
+        'apply_date': ["06/20/2023 10:00:00", None, "06/21/2023", "2023-06-10"],
+    })
+    assert backends.compare_backends(df_mixed, backends.get_backend('pandas')) == [], "pandas backend differs from data2"
+    assert backends.pl is None, "polars imported without the polars backend being selected"
+    if backends._load_polars() is not None:
+        mismatches = backends.compare_backends(df_mixed, backends.get_backend('polars'))
+        assert mismatches == [], f"polars backend differs from pandas: {mismatches}"
+        print("Test 17 (execution backends: pandas, polars) - PASS")
+    else:
+        print("Test 17 (execution backends: pandas; polars not installed) - PASS")
+
+    # ---------- Test 18: chunked / compressed CSV and streaming XLSX writers ----------
+    from writers import write_csv
+    df_out = pd.DataFrame({'id': range(7), 'name': ['a', None, 'c, d', 'e', 'f', 'g', 'h'],
+                           'when': pd.to_datetime(['2023-06-14'] * 6 + [None])})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        plain, gz, xlsx = (os.path.join(tmp_dir, n) for n in ('out.csv', 'out.csv.gz', 'out.xlsx'))
+        write_csv(df_out, plain, chunk_rows=3, max_workers=2, index=False)
+        assert open(plain, newline='').read() == df_out.to_csv(index=False), "chunked CSV differs from to_csv"
+        write_csv(df_out, plain, chunk_rows=3, max_workers=2, executor='process', index=False)
+        assert open(plain, newline='').read() == df_out.to_csv(index=False), "process-pool CSV differs from to_csv"
+        write_csv(df_out, gz, chunk_rows=3, max_workers=2, index=False)
+        pd.testing.assert_frame_equal(pd.read_csv(gz), pd.read_csv(plain))
+        write_xlsx(df_out, xlsx, chunk_rows=3)
+        pd.testing.assert_frame_equal(pd.read_excel(xlsx), df_out, check_dtype=False)
+    print("Test 18 (chunked CSV, gzip and streaming XLSX writers) - PASS")
+
+    # ---------- Test 19: feature matrix export loads back memory-mapped ----------
+    from features import export_features, load_features
+    df_feat = pd.DataFrame({'age_years': [20.0, None, 31.0], 'gender_encoded': [0, 1, 1],
+                            'country': ['India', None, 'Ghana'], 'engagement_lag_bucket': ['0-7', '8-30', '0-7']})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manifest = export_features(df_feat, tmp_dir)
+        dense, onehot, _ = load_features(tmp_dir)
+        data, indices, indptr = onehot if isinstance(onehot, tuple) else (onehot.data, onehot.indices, onehot.indptr)
+        assert isinstance(dense, np.memmap) and dense.dtype == np.float32 and dense.flags['C_CONTIGUOUS'], \
+            "dense block is not a float32 C-contiguous memory map"
+        assert np.array_equal(dense, np.array([[20, 0], [np.nan, 1], [31, 1]], dtype=np.float32), equal_nan=True)
+        assert manifest['onehot']['features'] == ['country=Ghana', 'country=India',
+                                                  'engagement_lag_bucket=0-7', 'engagement_lag_bucket=8-30']
+        assert indptr.tolist() == [0, 2, 3, 5] and indices.tolist() == [1, 2, 3, 0, 2], "CSR one-hot block wrong"
+        del dense, onehot, data, indices, indptr   # release the maps before the directory goes
+    print("Test 19 (feature matrix export) - PASS")
+
+    # ---------- Test 20: shared-memory dataset attached by name in worker processes ----------
+    from shared_dataset import SharedDataset, parallel_map, _missing_count
+    df_shared = pd.DataFrame({'age_years': [20.0, None, 31.0], 'status_code': [1, 2, 3],
+                              'country': ['India', None, 'India'],
+                              'apply_date': pd.to_datetime(['2023-06-14', None, '2023-07-01'])})
+    with SharedDataset.create(df_shared) as ds:
+        attached = SharedDataset.attach(ds.name)
+        view = attached.frame()
+        assert view['country'].isna().tolist() == [False, True, False] and view['country'][2] == 'India', \
+            "dictionary column decoded wrong"
+        assert view['apply_date'].equals(df_shared['apply_date']) and view['status_code'].equals(df_shared['status_code'])
+        assert not view['age_years'].to_numpy().flags.writeable, "shared view is writable"
+        counts = parallel_map(_missing_count, list(df_shared.columns), ds, max_workers=2)
+        assert counts == [('age_years', 1), ('status_code', 0), ('country', 1), ('apply_date', 1)], counts
+        del view
+        attached.close()
+    print("Test 20 (shared-memory dataset broadcast) - PASS")
+
+    # ---------- Test 21: report sections are cached on the columns they read ----------
+    import contextlib, io, json
+    from generate_final_report import generate_report
+    df_rep = pd.DataFrame({'country': ['India', 'Ghana', 'India'], 'status_description': ['Started', 'Rejected', 'Started'],
+                           'engagement_lag_days_fixed': [0.0, 5.0, None]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src, md, cache = (os.path.join(tmp_dir, n) for n in ('in.csv', 'report.md', 'cache.json'))
+        def section_hashes():
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_report(src, out_md=md, cache_file=cache, max_workers=1)
+            with open(cache) as f:
+                return {k: v['hash'] for k, v in json.load(f).items()}
+        df_rep.to_csv(src, index=False)
+        before = section_hashes()
+        df_rep.loc[1, 'country'] = 'India'
+        df_rep.to_csv(src, index=False)
+        after = section_hashes()
+        assert before['statuses'] == after['statuses'] and before['lag'] == after['lag'], "unrelated section invalidated"
+        assert before['countries'] != after['countries'], "changed column did not invalidate its section"
+        assert '| India | 3 | 100.0% |' in open(md, encoding='utf-8').read(), "report not rendered from new data"
+    print("Test 21 (section-cached Markdown report) - PASS")
+
+    # ---------- Test 22: pipelined chunks keep order, bound the queues and match the whole-file run ----------
+    import threading, time
+    from prefetch import run_pipelined
+    from fix_issues import run_fixes
+    in_flight, peak, lock = [0], [0], threading.Lock()
+    def numbered():
+        for i in range(20):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            yield i
+    written = []
+    def write_slowly(x):
+        time.sleep(0.002)
+        written.append(x)
+        with lock:
+            in_flight[0] -= 1
+    stats = run_pipelined(numbered(), lambda x: x * 10, write_slowly, queue_chunks=2)
+    assert written == [i * 10 for i in range(20)] and stats.chunks == 20, "chunks reordered or lost"
+    assert peak[0] <= 2 * 2 + 3, f"{peak[0]} chunks in flight with queues of 2"
+    try:
+        run_pipelined(range(5), lambda x: 1 / (x - 3), lambda x: None)
+        raise AssertionError("compute error not raised")
+    except ZeroDivisionError:
+        pass
+    df_pipe = pd.DataFrame({'learner_signup_datetime': ['2023-01-01', '2023-02-01', None, '2023-03-01', '2023-01-10'],
+                            'apply_date': ['2023-01-05', '2023-01-15', '2023-01-01', '2023-03-11', None],
+                            'date_of_birth': ['2000-01-01', None, '1990-05-05', '2001-01-01', '1999-09-09'],
+                            'engagement_lag_days': [4.0, 3.0, 7.0, None, 2.0], 'age_years': [23.0, 20.0, None, 22.0, 23.0],
+                            'note': ['a,b', 'NA', '', 'say "hi"', 'x']})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = os.path.join(tmp_dir, 'in.csv')
+        df_pipe.to_csv(src, index=False)
+        outputs = {}
+        for mode, kwargs in (('whole', {}), ('pipelined', {'pipelined': True, 'chunk_rows': 2})):
+            out, audit = os.path.join(tmp_dir, f'{mode}.csv'), os.path.join(tmp_dir, f'{mode}_audit.csv')
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_fixes(src, out, audit, **kwargs)
+            outputs[mode] = (open(out).read(), open(audit).read())
+        assert outputs['whole'] == outputs['pipelined'], "pipelined fix output differs from the whole-file run"
+    print("Test 22 (pipelined chunk execution) - PASS")
+
+    # ---------- Test 23: run metrics in Prometheus textfile and JSON-lines formats ----------
+    from metrics import RunMetrics
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run = RunMetrics(job='fix', run_id='test-run', metrics_dir=tmp_dir)
+        run.start_stage('fix')
+        run.end_stage('fix', 10)
+        run.set('fixes', 3, stage='fix', column='age_years')
+        with contextlib.redirect_stdout(io.StringIO()):
+            prom_path, jsonl_path = run.write()
+        assert os.path.basename(prom_path) == 'week1_fix.prom' and not [f for f in os.listdir(tmp_dir) if f.endswith('.tmp')]
+        prom = open(prom_path).read().splitlines()
+        assert '# TYPE week1_fixes gauge' in prom, "missing TYPE line"
+        assert 'week1_fixes{column="age_years",command="fix",stage="fix"} 3.0' in prom, "fixes sample not exposed"
+        assert 'week1_stage_rows{command="fix",stage="fix"} 10.0' in prom, "stage rows not exposed"
+        records = [json.loads(line) for line in open(jsonl_path)]
+        samples = [line for line in prom if not line.startswith('#')]
+        assert len(records) == len(samples), "JSON lines and Prometheus samples differ"
+        assert all(r['command'] == 'fix' and r['run_id'] == 'test-run' for r in records), "JSON lines not labelled like the .prom"
+        fixes = next(r for r in records if r['metric'] == 'week1_fixes')
+        assert fixes['labels'] == {'stage': 'fix', 'column': 'age_years'} and fixes['value'] == 3.0
+        assert {r['metric'] for r in records} >= {'week1_run_success', 'week1_stage_duration_seconds'}
+    print("Test 23 (run metrics .prom / .jsonl output) - PASS")
+
+    # ---------- Test 24: the report certifies only what the validation checks show ----------
+    df_dup = pd.DataFrame({'country': ['India', 'India', 'Ghana'], 'status_description': ['Started', 'Started', 'Rejected'],
+                           'engagement_lag_days_fixed': [3.0, 3.0, 1.0]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src, md = os.path.join(tmp_dir, 'dup.csv'), os.path.join(tmp_dir, 'dup.md')
+        df_dup.to_csv(src, index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_report(src, out_md=md, cache_file=None, max_workers=1)
+        report = open(md, encoding='utf-8').read()
+    certification = report.split('## 14.')[1]
+    assert '| No duplicate rows | ✗ FAIL | 1 |' in report, "duplicate check not failed"
+    assert '✗ NOT CERTIFIED' in certification and 'PRODUCTION-READY' not in report, "dataset with duplicates certified"
+    assert '- ✗ Duplicate records: 1' in certification and 'Zero duplicate' not in report, "duplicates reported as zero"
+    assert 'Approved for' not in certification and 'No data loss' not in certification
+    print("Test 24 (report certification follows the validation checks) - PASS")
+
+    # ---------- Test 25: ingest header mapping (exact first, guarded fallback, collisions) ----------
+    from ingest import header_mapping, unify_frames
+    assert header_mapping(('Country Code', 'Country')) == ('country_code', 'country'), "Country Code took the country column"
+    assert header_mapping(('Name', 'Date', 'Id')) == ('name', 'date', 'id'), "short generic headers mapped to canonical names"
+    assert header_mapping(('Learner SignUp DateTime', 'Opportunity-Id', 'Current/Intended Major')) == \
+        ('learner_signup_datetime', 'opportunity_id', 'current_intended_major'), "exact variants not matched"
+    assert header_mapping(('Signup DateTime', 'Apply Date (UTC)')) == ('learner_signup_datetime', 'apply_date'), "fallback failed"
+    try:
+        header_mapping(('Country', 'COUNTRY'))
+        raise AssertionError("colliding headers not rejected")
+    except ValueError:
+        pass
+    combined = unify_frames([pd.DataFrame({'Country Code': ['IN'], 'Country': ['India']}),
+                             pd.DataFrame({'country': ['Ghana'], 'Name': ['Ama']})], ['a.csv', 'b.csv'])
+    assert combined['country'].tolist() == ['India', 'Ghana'], "real Country column dropped"
+    assert combined['country_code'].iloc[0] == 'IN' and combined['name'].iloc[1] == 'Ama', "extra columns lost"
+    assert combined[RAW_ROW_ID].tolist() == [0, 1] and combined['source_file'].tolist() == ['a.csv', 'b.csv']
+    print("Test 25 (ingest header mapping) - PASS")
+
+    # ---------- Test 26: KLL rank error and sketch merge vs one sketch over all the data ----------
+    from sketches import ColumnSketch, KLLSketch
+    values = np.random.default_rng(1).lognormal(3, 1, 100_000)
+    ordered = np.sort(values)
+    qs = np.linspace(0.01, 0.99, 99)
+    def rank_error(sketch):
+        return np.abs(np.searchsorted(ordered, sketch.quantiles(qs), side='right') / len(values) - qs).max()
+    whole = KLLSketch().update(values)
+    assert rank_error(whole) < 0.02, f"KLL rank error {rank_error(whole):.4f} above 2% at k=200"
+    assert sum(len(level) for level in whole.levels) < 1000, "KLL sketch did not compact"
+    assert np.array_equal(whole.quantiles(qs), KLLSketch().update(values).quantiles(qs)), "seeded sketch not reproducible"
+    left, right = ColumnSketch(hist_edges=np.arange(0, 501, 50), seed=1), ColumnSketch(hist_edges=np.arange(0, 501, 50), seed=2)
+    for chunk in np.array_split(values[:60_000], 7):
+        left.update(chunk)
+    for chunk in np.array_split(values[60_000:], 5):
+        right.update(np.append(chunk, np.nan))
+    merged, single = left.merge(right), ColumnSketch(hist_edges=np.arange(0, 501, 50)).update(values)
+    assert merged.kll.n == single.kll.n == len(values) and merged.missing == 5
+    assert rank_error(merged.kll) < 0.02, f"merged KLL rank error {rank_error(merged.kll):.4f} above 2%"
+    assert np.isclose(merged.moments.mean, values.mean()) and np.isclose(merged.moments.std, values.std(ddof=1))
+    assert (merged.moments.min, merged.moments.max) == (values.min(), values.max())
+    assert merged.hist.counts.tolist() == single.hist.counts.tolist() and merged.hist.overflow == single.hist.overflow
+    small_a, small_b = KLLSketch().update(values[:50]), KLLSketch().update(values[50:120])
+    assert np.array_equal(small_a.merge(small_b).quantiles(qs), KLLSketch().update(values[:120]).quantiles(qs)), \
+        "uncompacted merge differs from one sketch"
+    from sketches import sketch_csv
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = os.path.join(tmp_dir, 'sketch.csv')
+        pd.DataFrame({'lag': np.append(values[:5_000], np.nan), 'other': 'x'}).to_csv(src, index=False)
+        streamed = sketch_csv(src, ['lag'], chunksize=700, hist_edges={'lag': np.arange(0, 101, 10)}, clip={'lag'})['lag']
+    in_memory = ColumnSketch(hist_edges=np.arange(0, 101, 10), clip=True).update(values[:5_000])
+    assert streamed.kll.n == 5_000 and streamed.missing == 1, "chunked CSV sketch lost rows"
+    assert streamed.hist.counts.tolist() == in_memory.hist.counts.tolist() and streamed.hist.counts.sum() == 5_000
+    assert np.isclose(streamed.moments.mean, values[:5_000].mean()) and np.isclose(streamed.moments.max, values[:5_000].max())
+    print("Test 26 (KLL rank error and sketch merge) - PASS")
+
+    # ---------- Test 27: raw_row_id lineage through the fix stage, the audit store and LineageIndex ----------
+    import sqlite3
+    from audit_store import AuditStore
+    from lineage import MISSING, LineageIndex
+    # rows out of raw order and raw row 1 dropped, as after filtering upstream
+    df_lin = pd.DataFrame({RAW_ROW_ID: [3, 0, 2], 'learner_signup_datetime': ['2023-01-01'] * 3,
+                           'date_of_birth': ['2000-01-01'] * 3, 'apply_date': ['2023-01-11', '2023-01-05', '2022-12-01'],
+                           'engagement_lag_days': [10.0, 1.0, 5.0], 'age_years': [23.0, 23.0, 23.0]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = os.path.join(tmp_dir, 'final.csv')
+        df_lin.to_csv(src, index=False)
+        db = os.path.join(tmp_dir, 'audit.sqlite')
+        for mode, kwargs in (('whole', {}), ('pipelined', {'pipelined': True, 'chunk_rows': 2})):
+            out, audit = os.path.join(tmp_dir, f'{mode}.csv'), os.path.join(tmp_dir, f'{mode}_audit.csv')
+            with AuditStore(db, run_id=mode) as store, contextlib.redirect_stdout(io.StringIO()):
+                run_fixes(src, out, audit, audit_store=store, **kwargs)
+            fixes = pd.read_csv(audit)
+            assert fixes['row_index'].tolist() == [1, 2] and fixes[RAW_ROW_ID].tolist() == [0, 2], f"{mode}: audit raw ids wrong"
+            index = LineageIndex(lineage_path_for(out))
+            assert len(index) == 3 and [index.raw_row(i) for i in range(3)] == [3, 0, 2], f"{mode}: lineage file wrong"
+            assert [index.final_row(r) for r in (0, 1, 2, 3, 99, -1)] == [1, MISSING, 2, 0, MISSING, MISSING]
+        with AuditStore(db) as store:
+            history = store.raw_row_history(index.raw_row(2))
+            assert history['run_id'].tolist() == ['whole', 'pipelined'] and set(history['row_index']) == {2}
+            assert history['new_value'].isna().all(), "negative lag fix not found under its raw row"
+            assert store.raw_row_history(3).empty and len(store.row_history(1, 'engagement_lag_days')) == 2
+        # stores created before raw_row_id existed get the column on open
+        old_db = os.path.join(tmp_dir, 'old.sqlite')
+        with contextlib.closing(sqlite3.connect(old_db)) as conn:
+            conn.execute('CREATE TABLE audit (id INTEGER PRIMARY KEY, run_id TEXT NOT NULL, stage TEXT NOT NULL, '
+                         'row_index INTEGER, "column" TEXT NOT NULL, old_value, old_type TEXT NOT NULL, new_value, '
+                         'new_type TEXT NOT NULL, description TEXT, recorded_at TEXT NOT NULL)')
+        with AuditStore(old_db) as store:
+            store.record('fix', 4, 'age_years', 30, None, raw_row_id=7)
+            assert store.raw_row_history(7)['row_index'].tolist() == [4], "old store not migrated"
+    print("Test 27 (raw_row_id lineage in audits and lineage files) - PASS")
+
+    # ---------- Test 28: validation rule masks and packed violation bitmask ----------
+    from validation_rules import compile_rules, decode_bitmask
+    rules_spec = [
+        {'name': 'neg_lag', 'expr': 'lag < 0', 'sample_cols': ['lag']},
+        {'name': 'late_year', 'expr': 'year(signup) > 2023', 'sample_cols': ['signup']},
+        {'name': 'extreme', 'expr': '(abs(lag) > 100) | (abs(days) > 365)'},
+    ]
+    df_rules = pd.DataFrame({'lag': [-5.0, 200.0, np.nan, 3.0, -150.0],
+                             'signup': pd.to_datetime(['2024-01-01', '2023-05-05', '2025-02-02', None, '2022-01-01']),
+                             'days': [0, 10, 400, 5, 0]})
+    rules = compile_rules(rules_spec)
+    assert rules.columns == ['lag', 'signup', 'days'] and rules.dtype == np.uint8, "rule columns / bitmask dtype wrong"
+    result = rules.evaluate(df_rules)
+    assert result.masks['neg_lag'].tolist() == [True, False, False, False, True], "missing value fired a rule"
+    assert result.masks['late_year'].tolist() == [True, False, True, False, False], "NaT year compared as a value"
+    assert result.masks['extreme'].tolist() == [False, True, True, False, True]
+    assert result.bitmask.tolist() == [0b011, 0b100, 0b110, 0, 0b101], "bitmask packing wrong"
+    assert result.counts == {'neg_lag': 2, 'late_year': 2, 'extreme': 3} and result.any_violation().sum() == 4
+    assert [decode_bitmask(v, rules_spec) for v in result.bitmask] == \
+        [['neg_lag', 'late_year'], ['extreme'], ['late_year', 'extreme'], [], ['neg_lag', 'extreme']], "decode wrong"
+    assert result.samples('neg_lag').index.tolist() == [0, 4] and list(result.samples('neg_lag').columns) == ['lag']
+    assert result.summary()['violations'].tolist() == [2, 2, 3]
+    wide = compile_rules([{'name': f'r{i}', 'expr': f'x > {i}'} for i in range(40)])
+    assert wide.dtype == np.uint64 and decode_bitmask(wide.evaluate(pd.DataFrame({'x': [39.5]})).bitmask[0],
+                                                      wide.rules) == [f'r{i}' for i in range(40)]
+    for bad in ([{'name': 'a', 'expr': 'x > 0'}] * 2, [{'name': f'r{i}', 'expr': 'x > 0'} for i in range(65)]):
+        try:
+            compile_rules(bad)
+            raise AssertionError("invalid rule set accepted")
+        except ValueError:
+            pass
+    print("Test 28 (validation rule masks and bitmask) - PASS")
+
+    # ---------- Test 29: group median / MAD / IQR fences and robust outlier flags ----------
+    from outliers import detect_outliers, group_robust_stats
+    groups = ['A'] * 7 + ['B'] * 3 + ['C'] * 5
+    df_out = pd.DataFrame({RAW_ROW_ID: range(100, 115), 'opportunity_category': groups, 'opportunity_id': groups,
+                           'lag': [10, 11, 12, 13, 14, 100, np.nan] + [1, 2, 1000] + [5] * 5},
+                          index=range(200, 215))
+    stats = group_robust_stats(df_out, 'opportunity_category', ['lag'])['lag']
+    assert stats.loc['A'].to_dict() == {'count': 6, 'median': 12.5, 'mad': 1.5, 'q1': 11.25, 'q3': 13.75,
+                                        'lower_fence': 7.5, 'upper_fence': 17.5}, "group A stats wrong"
+    assert stats.loc['C', 'mad'] == 0 and stats.loc['B', 'count'] == 3
+    candidates, level_stats = detect_outliers(df_out, ['lag'])
+    # B is too small to judge and C has no spread; only the 100 in A is an outlier, at both levels
+    assert candidates['row_index'].tolist() == [205] and candidates[RAW_ROW_ID].tolist() == [105], "wrong outliers flagged"
+    assert candidates['outlier_reasons'].iloc[0] == 'lag@opportunity_category:high;lag@opportunity_id:high'
+    assert np.isclose(candidates['max_robust_z'].iloc[0], 0.6745 * 87.5 / 1.5)
+    assert sorted(level_stats) == ['opportunity_category', 'opportunity_id']
+    print("Test 29 (group-aware robust outliers) - PASS")
+
+    # ---------- Test 30: packed missingness snapshots, diff and rows recovered ----------
+    from missingness import MissingnessTracker
+    tracker = MissingnessTracker()
+    # 11 rows, so the last packed byte is padded
+    x_before = [np.nan, np.nan, 1, 2, np.nan, 3, 4, 5, 6, 7, np.nan]
+    x_after = [0, np.nan, 1, 2, np.nan, 3, 4, np.nan, 6, 7, 0]
+    tracker.snapshot('before', pd.DataFrame({'x': x_before, 'gone': [np.nan] * 11, 'text': ['a', None] * 5 + [None]}))
+    after = tracker.snapshot('after', pd.DataFrame({'x': x_after, 'text': ['a'] * 11, 'new': [1.0] * 10 + [np.nan]}))
+    assert tracker.stages() == ['before', 'after'] and after.nbytes() == 3 * 2, "bitmaps not packed to 1 bit per cell"
+    assert after.null_mask('x').tolist() == list(np.isnan(x_after)) and after.total_nulls == 4
+    diff = tracker.diff('before', 'after')
+    assert diff.loc['x'].tolist() == [4, 3, 2, 1], "x before/after/recovered/lost wrong"
+    assert diff.loc['text'].tolist() == [6, 0, 6, 0] and diff.loc['gone', 'before'] == 11
+    assert np.isnan(diff.loc['gone', 'after']) and np.isnan(diff.loc['new', 'before']) and np.isnan(diff.loc['new', 'recovered'])
+    assert tracker.rows_recovered('before', 'after').tolist() == [1, 1, 0, 1, 0, 1, 0, 1, 0, 1, 2], "per-row recovery wrong"
+    tracker.snapshot('short', pd.DataFrame({'x': [1.0]}))
+    try:
+        tracker.diff('before', 'short')
+        raise AssertionError("row-misaligned stages diffed")
+    except ValueError:
+        pass
+    print("Test 30 (packed missingness snapshots) - PASS")
+
+    # ---------- Test 31: audit store typed round-trip, row history and summaries ----------
+    from datetime import date
+    typed = [(5, 6), (np.int64(7), 1.5), (np.float64(np.nan), True), (pd.Timestamp('2023-06-14 10:30'), date(2023, 6, 14)),
+             ('Male', None), (pd.NaT, np.bool_(False))]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = os.path.join(tmp_dir, 'audit.sqlite')
+        with AuditStore(db, run_id='r1', batch_size=2) as store:
+            for old, new in typed:
+                store.record('fix', 3, 'col', old, new, 'typed')
+            store.record('impute', -1, 'col', '5 missing', '2 missing')
+            store.import_frame(pd.DataFrame({'row_index': [3.0, np.nan], 'column': ['other', 'other'],
+                                             'old_value': ['a', 'b'], 'new_value': ['A', 'B']}), 'clean')
+        with AuditStore(db, run_id='r2') as store:
+            history = store.row_history(3)
+            summary = store.stage_summary()
+            assert store.runs()['run_id'].tolist() == ['r1'], "read-only open registered a run"
+        assert history['column'].tolist() == ['col'] * 6 + ['other'] and history['stage'].iloc[-1] == 'clean'
+        decoded = list(zip(history['old_value'][:6], history['new_value'][:6]))
+        assert decoded[0] == (5, 6) and decoded[1] == (7, 1.5) and decoded[2] == (None, True)
+        assert decoded[3] == (pd.Timestamp('2023-06-14 10:30'), date(2023, 6, 14)) and decoded[5] == (None, False)
+        assert [type(v).__name__ for v in history['old_value'][:6]] == ['int', 'int', 'NoneType', 'Timestamp', 'str', 'NoneType']
+        assert [type(v).__name__ for v in history['new_value'][:6]] == ['int', 'float', 'bool', 'date', 'NoneType', 'bool']
+        assert history['old_type'].tolist()[:6] == ['int', 'int', 'null', 'datetime', 'str', 'null'], "type tags wrong"
+        assert summary[['stage', 'column', 'changes']].values.tolist() == \
+            [['clean', 'other', 2], ['fix', 'col', 6], ['impute', 'col', 1]], "stage summary wrong"
+    print("Test 31 (audit store typed round-trip) - PASS")
+
+    # ---------- Test 32: warehouse tables, indexes and row counts ----------
+    from warehouse import APPLICATION_INDEXES, load_warehouse, query
+    df_wh = pd.DataFrame({'opportunity_id': ['o1', 'o1', 'o2', 'o1', 'o2'],
+                          'opportunity_name': [None, 'Data', 'Web', 'Data', 'Web'],
+                          'opportunity_start_date': pd.to_datetime(['2023-01-01'] * 3 + ['2023-01-01', None]),
+                          'opportunity_duration_days': [30.0, 30.0, np.nan, 30.0, np.nan],
+                          'country': ['India', 'Ghana', 'India', None, 'Peru'],
+                          'apply_date': pd.to_datetime(['2023-01-05', '2023-01-06', '2023-02-01', None, '2023-02-03']),
+                          'age_years': [20, 21, 22, 23, 24]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # URI metacharacters in the path must not break read-only queries
+        db = os.path.join(tmp_dir, 'wh?a#b%20.sqlite')
+        df_wh_before = df_wh.copy()
+        assert load_warehouse(df_wh, db, batch_size=2) == (2, 5), "warehouse row counts wrong"
+        assert df_wh.equals(df_wh_before), "batch conversion modified the caller's frame"
+        # a reload replaces the tables instead of appending
+        assert load_warehouse(df_wh, db, batch_size=2) == (2, 5)
+        opp = query('SELECT * FROM opportunities ORDER BY opportunity_id', db_path=db)
+        assert opp['opportunity_name'].tolist() == ['Data', 'Web'], "first non-null opportunity attribute not kept"
+        assert opp['opportunity_start_date'].iloc[0] == '2023-01-01 00:00:00' and pd.isna(opp['opportunity_duration_days'].iloc[1])
+        apps = query('SELECT * FROM applications', db_path=db)
+        assert list(apps.columns) == ['opportunity_id', 'country', 'apply_date', 'age_years'] and len(apps) == 5
+        assert query('SELECT COUNT(*) AS n FROM applications WHERE apply_date >= ?', ('2023-02-01',), db)['n'][0] == 2
+        indexes = set(query("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'applications'", db_path=db)['name'])
+        assert indexes == {f'idx_applications_{c}' for c in APPLICATION_INDEXES if c in apps.columns}, "indexes missing"
+        plan = ' '.join(query('EXPLAIN QUERY PLAN SELECT * FROM applications WHERE country = ?', ('India',), db)['detail'])
+        assert 'idx_applications_country' in plan, "country filter does not use its index"
+        with contextlib.closing(sqlite3.connect(db)) as conn:
+            types = {r[1]: r[2] for r in conn.execute('PRAGMA table_info(applications)')}
+        assert types == {'opportunity_id': 'TEXT', 'country': 'TEXT', 'apply_date': 'TEXT', 'age_years': 'INTEGER'}
+    print("Test 32 (SQLite warehouse export) - PASS")
+
+    # ---------- Test 33: int32 day numbers; day_resolution gives the same spans and audits ----------
+    from daydates import NA_DAY, from_day_columns
+    days = to_day_numbers(pd.Series(['2023-06-14', None, '1969-12-31', 'not a date']))
+    assert days.dtype == np.int32 and days.tolist() == [19522, NA_DAY, -1, NA_DAY], "day numbers wrong"
+    later = pd.to_datetime(pd.Series(['2023-06-15 01:00', '2024-03-01 00:00', None]))
+    earlier = pd.to_datetime(pd.Series(['2023-06-14 23:00', '2024-02-28 00:00', '2024-01-01 00:00']))
+    spans = day_diff(later, earlier)
+    assert spans[0] == 0 and spans[1] == 2 and np.isnan(spans[2]), "spans differ from Timestamp differences"
+    assert np.array_equal(spans, (later - earlier).dt.days.to_numpy(dtype=float), equal_nan=True)
+    assert day_year(later)[:2].tolist() == [2023, 2024] and day_month(later)[:2].tolist() == [6, 3] and np.isnan(day_month(later)[2])
+    assert to_day_numbers(days) is days, "day arrays converted twice"
+    df_days = pd.DataFrame({'date_of_birth': pd.to_datetime(['2000-02-29', None]), 'apply_date': later[:2]})
+    stored = compute_features(df_days, day_resolution=True)
+    # whole-day columns are held as int32 and restore exactly; timed columns stay Timestamps
+    assert stored['date_of_birth'].dtype == np.int32 and pd.api.types.is_datetime64_dtype(stored['apply_date'])
+    restored = from_day_columns(stored.copy(), ['date_of_birth'])['date_of_birth']
+    assert restored.equals(df_days['date_of_birth'].astype('datetime64[ns]')), "int32 day column does not restore"
+    from apply_hybrid_imputation import run_imputation
+    df_modes = pd.DataFrame({'opportunity_id': ['o1', 'o1', 'o2'],
+                             'learner_signup_datetime': ['2023-06-14 23:00:00', '2023-06-01 08:00:00', None],
+                             'apply_date': ['2023-06-15 01:00:00', '2023-06-03 07:59:59', '2023-07-01 00:00:00'],
+                             'date_of_birth': ['2003-06-15', '2000-06-01', '1990-01-01'],
+                             'opportunity_start_date': ['2023-07-01 12:00:00', None, '2023-07-02 00:00:00'],
+                             'opportunity_end_date': ['2023-07-31 11:59:59', None, '2023-07-09 00:00:00'],
+                             'engagement_lag_days': [1.0, 2.0, 5.0], 'age_years': [20.0, 23.0, 33.0],
+                             'opportunity_duration_days': [30.0, None, 7.0], 'days_before_start': [16.0, None, 1.0],
+                             'signup_month': [6.0, 6.0, None], 'signup_year': [2023.0, 2023.0, None],
+                             'institution_name': ['U', None, 'V'], 'current_intended_major': ['M', 'N', None]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = os.path.join(tmp_dir, 'in.csv')
+        df_modes.to_csv(src, index=False)
+        results = {}
+        for day_resolution in (False, True):
+            out, audit = os.path.join(tmp_dir, f'fix{day_resolution}.csv'), os.path.join(tmp_dir, f'fix{day_resolution}_audit.csv')
+            out2, audit2 = os.path.join(tmp_dir, f'imp{day_resolution}.csv'), os.path.join(tmp_dir, f'imp{day_resolution}_audit.csv')
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_fixes(src, out, audit, day_resolution=day_resolution)
+                run_imputation(out, out2, audit2, day_resolution=day_resolution)
+            results[day_resolution] = [open(path).read() for path in (out, audit, out2, audit2)]
+        assert results[False] == results[True], "day_resolution changed the fix/impute outputs or audits"
+        assert '1.0,Recomputed from dates' in results[True][1], "23:00 -> 01:00 lag not audited as 0 days"
+    print("Test 33 (int32 day numbers) - PASS")
+
+    # ---------- Test 34: stratified estimate and CI on a known frame ----------
+    from sampling import ExactCounts, StratifiedSample, format_estimate, stratified_sample_csv
+    # stratum A: N=4, sample [1, 0]; stratum B: N=10, sample [1, 1, 0, 0, 1]
+    # T = 4*0.5 + 10*0.6 = 8; Var = 16*(1-2/4)*0.5/2 + 100*(1-5/10)*0.3/5 = 2 + 3 = 5
+    y = np.array([1, 0, 1, 1, 0, 0, 1], dtype=bool)
+    strat = StratifiedSample(pd.DataFrame({'y': y}), ['A'] * 2 + ['B'] * 5, pd.Series({'A': 4, 'B': 10}), 0.5)
+    total, hw = strat.total(y)
+    assert np.isclose(total, 8.0) and np.isclose(hw, 1.96 * np.sqrt(5.0)), "stratified total or CI wrong"
+    assert np.allclose(strat.weights, [2, 2, 2, 2, 2, 2, 2]) and strat.n_population == 14
+    mean, mean_hw = strat.mean(y.astype(float))
+    assert np.isclose(mean, 8 / 14) and np.isclose(mean_hw, 1.96 * np.sqrt(5.0) / 14), "ratio mean or CI wrong"
+    assert strat.count_text(y) == '8 ± 4' and ExactCounts(pd.DataFrame({'y': y})).count_text(y) == '4'
+    assert format_estimate(1234.5, 5.25, decimals=1) == '1,234.5 ± 5.2' and format_estimate(1234) == '1,234'
+    # quantiles follow the weights: stratum A (weight 10) holds 20 of the 23 population rows
+    skewed = StratifiedSample(pd.DataFrame(index=range(5)), ['A', 'A', 'B', 'B', 'B'], pd.Series({'A': 20, 'B': 3}), 0.5)
+    lags = np.array([1.0, 2.0, 100.0, 200.0, np.nan])
+    assert skewed.quantiles(lags, [0.5, 0.95]).tolist() == [2.0, 100.0], "quantiles not weighted by N_h / n_h"
+    assert skewed.std(lags) < np.nanstd(lags, ddof=1), "weighted std ignores the weights"
+    assert ExactCounts(pd.DataFrame()).quantiles(lags, [0.5]).tolist() == [51.0]
+    from generate_final_report import _lag, _render_lag
+    lag_section = _lag(pd.DataFrame({'engagement_lag_days_fixed': lags}), skewed)
+    rendered = _render_lag(lag_section, skewed.n_population)
+    assert lag_section['median'] == 2.0 and '| Median (est.) | 2.00 days |' in rendered and 'Range (in sample)' in rendered, \
+        "preview lag statistics not weighted or not labelled"
+    df_s = pd.DataFrame({'opportunity_category': ['Internship'] * 20 + ['Event'] * 10,
+                         'learner_signup_datetime': ['2023-03-01'] * 30,
+                         'flag': [1, 0] * 15})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = os.path.join(tmp_dir, 'sample.csv')
+        df_s.to_csv(src, index=False)
+        full = stratified_sample_csv(src, 1.0, chunksize=7)
+        # a census has no sampling error: exact count, zero half-width
+        assert len(full.df) == 30 and full.total(full.df['flag'] == 1) == (15.0, 0.0), "census estimate not exact"
+        small = stratified_sample_csv(src, 0.05, chunksize=7, seed=1)
+        assert small.population.to_dict() == {'Internship|2023': 20, 'Event|2023': 10}, "population counts wrong"
+        assert (small.sampled >= 2).all() and set(small.sampled.index) == set(small.population.index), \
+            "sparse strata not topped up"
+        assert np.isclose(small.total(np.ones(len(small.df)))[0], 30.0), "weights do not sum to the population"
+    print("Test 34 (stratified estimate and CI) - PASS")
+
     print("\nAll unit tests PASSED.")
 
 # -----------------------
 # Finalization and optionally run pipeline on your files
 # -----------------------
-def run_full_finalization():
+def run_full_finalization(cleaned_file=CLEANED_FILE, input_file=INPUT_FILE, audit_file=AUDIT_FILE,
+                          final_csv=FINAL_CSV, final_xlsx=FINAL_XLSX, audit_store=None, metrics=None, backend=None,
+                          pipelined=False):
     """
     Loads cleaned file & raw file, performs final inspections, recomputes features,
-    writes final files and audit (if exists).
+    writes final files and audit (if exists). If audit_store is given, the cleaning
+    audit log is appended to it under stage 'clean'. metrics (metrics.RunMetrics)
+    receives the stage's rows and throughput. backend names the engine for the
+    feature computation (backends.py; None = $WEEK1_BACKEND or pandas).
+    pipelined=True overlaps the I/O at file level (prefetch.in_background): the raw
+    workbook is read while the cleaned one is, and the CSV, XLSX and lineage files are
+    written concurrently. Workbooks are not read in chunks: per-chunk type inference
+    would change the parsed values.
     """
+    from backends import get_backend
+    backend = get_backend(backend)
+    if metrics is not None:
+        metrics.start_stage('clean')
     # load cleaned + raw (expect these files to exist in working directory)
-    if not os.path.exists(CLEANED_FILE):
-        raise FileNotFoundError(f"Expected cleaned file '{CLEANED_FILE}' not found. Run pipeline first.")
-    if not os.path.exists(INPUT_FILE):
-        raise FileNotFoundError(f"Expected raw file '{INPUT_FILE}' not found. Provide raw file.")
+    if not os.path.exists(cleaned_file):
+        raise FileNotFoundError(f"Expected cleaned file '{cleaned_file}' not found. Run pipeline first.")
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Expected raw file '{input_file}' not found. Provide raw file.")
 
-    df = pd.read_excel(CLEANED_FILE)
-    raw = pd.read_excel(INPUT_FILE, dtype=object)
+    if pipelined:
+        raw_future = in_background(pd.read_excel, input_file, dtype=object)
+    df = pd.read_excel(cleaned_file)
+    raw = assign_raw_row_ids(raw_future.result() if pipelined else pd.read_excel(input_file, dtype=object))
+    if not has_lineage(df):
+        if len(df) != len(raw):
+            raise ValueError(f"'{cleaned_file}' has no {RAW_ROW_ID} column and {len(df)} rows vs {len(raw)} raw rows; cannot infer lineage.")
+        # cleaned files written before lineage tracking are still in raw order
+        df.insert(0, RAW_ROW_ID, raw[RAW_ROW_ID].to_numpy())
     # attempt to load audit if exists
     audit_df = pd.DataFrame()
-    if os.path.exists(AUDIT_FILE):
+    if os.path.exists(audit_file):
         try:
-            audit_df = pd.read_csv(AUDIT_FILE)
+            audit_df = pd.read_csv(audit_file)
         except Exception:
             audit_df = pd.DataFrame()
+    if audit_store is not None and not audit_df.empty:
+        # row_index is the cleaned file's row; the store also gets the raw record behind it
+        audit_store.import_frame(audit_df.assign(**{RAW_ROW_ID: audit_df['row_index'].map(df[RAW_ROW_ID])}), 'clean')
 
     # Example final steps (already implemented in your pipeline):
     # recompute derived features
-    df = compute_features(df)
+    # df is ours (just read), so no copy
+    df = backend.compute_features(df, inplace=True)
 
     # final missingness summary print
     print("Final missingness summary (top 30):")
     print(df.isna().sum().sort_values(ascending=False).head(30).to_string())
 
     # save final files
-    df.to_csv(FINAL_CSV, index=False)
-    df.to_excel(FINAL_XLSX, index=False)
-    print(f"Final files saved: {FINAL_CSV}, {FINAL_XLSX}")
+    if pipelined:
+        # df is not modified from here on, so the writers can share it
+        csv_done = in_background(to_csv_atomic, df, final_csv, index=False)
+        xlsx_done = in_background(write_xlsx, df, final_xlsx)
+        lineage_done = in_background(save_lineage, df, lineage_path_for(final_csv))
+        csv_done.result()
+        xlsx_done.result()
+        lineage_file = lineage_done.result()
+    else:
+        to_csv_atomic(df, final_csv, index=False)
+        # streamed write-only workbook (writers.py) instead of to_excel's in-memory sheet
+        write_xlsx(df, final_xlsx)
+        lineage_file = save_lineage(df, lineage_path_for(final_csv))
+    print(f"Final files saved: {final_csv}, {final_xlsx}, {lineage_file}")
+    if metrics is not None:
+        metrics.end_stage('clean', len(df))
 
 # -----------------------
 # Main guard
@@ -0,0 +1,114 @@
+# daydates.py
+# Compact day-resolution date representation.
+#
+# A date column that only holds whole days (no time of day, e.g. date_of_birth) is
+# stored as int32 days since 1970-01-01 with NA_DAY (int32 min) for missing values:
+# half the memory of datetime64[ns], and lossless: from_day_columns() gives back the
+# same dates (as datetime64[ns]). Columns that carry a time of day stay datetime64. The day_resolution=True paths (compute_features, fix, impute)
+# convert their date columns with to_day_columns()/compact_dates() and keep them that
+# way, and day_diff() takes either representation:
+#   both sides int32 -> plain integer subtraction
+#   otherwise        -> floor of the Timestamp difference in days
+# which is exactly Series.dt.days of the Timestamp difference, so both modes produce
+# the same values and audits.
+
+import numpy as np
+import pandas as pd
+
+NA_DAY = np.iinfo(np.int32).min
+DAYS_PER_YEAR = 365.25
+NS_PER_DAY = 86_400 * 10**9
+
+def is_day_array(values):
+    return isinstance(values, (np.ndarray, pd.Series)) and values.dtype == np.int32
+
+def _datetimes(values):
+    """Datetime-like (or parseable) values -> datetime64[ns] array (NaT for missing)."""
+    if is_day_array(values):
+        return from_day_numbers(values).to_numpy()
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    return pd.to_datetime(series, errors='coerce').to_numpy(dtype='datetime64[ns]')
+
+def to_day_numbers(values):
+    """Datetime-like (or parseable) values -> int32 days since epoch, NA_DAY for missing."""
+    if is_day_array(values):
+        return np.asarray(values)
+    arr = _datetimes(values)
+    days = arr.astype('datetime64[D]').astype(np.int64)
+    out = days.astype(np.int32)
+    out[np.isnat(arr)] = NA_DAY
+    return out
+
+def from_day_numbers(days, index=None):
+    """int32 day numbers -> datetime64[ns] Series (NaT for NA_DAY)."""
+    days = np.asarray(days)
+    dt = days.astype('datetime64[D]').astype('datetime64[ns]')
+    dt[days == NA_DAY] = np.datetime64('NaT')
+    return pd.Series(dt, index=index)
+
+def compact_dates(series):
+    """
+    series as int32 day numbers (same index) when it is datetime64 and every value is a
+    whole day; otherwise series unchanged.
+    """
+    if not pd.api.types.is_datetime64_dtype(series):
+        return series
+    arr = series.to_numpy(dtype='datetime64[ns]')
+    present = ~np.isnat(arr)
+    if (arr[present] != arr[present].astype('datetime64[D]')).any():
+        return series
+    return pd.Series(to_day_numbers(arr), index=series.index, name=series.name)
+
+def to_day_columns(df, columns):
+    """
+    In place: each whole-day datetime64 column of columns is replaced by int32 day
+    numbers (compact_dates). Returns the names of the converted columns.
+    """
+    converted = []
+    for c in columns:
+        if c in df.columns:
+            compact = compact_dates(df[c])
+            if compact is not df[c]:
+                df[c] = compact
+                converted.append(c)
+    return converted
+
+def from_day_columns(df, columns):
+    """In place inverse of to_day_columns: int32 day columns back to datetime64[ns]."""
+    for c in columns:
+        if c in df.columns and is_day_array(df[c]):
+            df[c] = from_day_numbers(df[c].to_numpy(), index=df.index)
+    return df
+
+def day_diff(later, earlier):
+    """
+    later - earlier in whole days, the floor of the difference like Series.dt.days:
+    int64, or float64 with NaN where either side is missing. Takes int32 day numbers
+    or datetimes.
+    """
+    if is_day_array(later) and is_day_array(earlier):
+        a, b = np.asarray(later), np.asarray(earlier)
+        missing = (a == NA_DAY) | (b == NA_DAY)
+        out = a.astype(np.int64) - b.astype(np.int64)
+    else:
+        a, b = _datetimes(later), _datetimes(earlier)
+        missing = np.isnat(a) | np.isnat(b)
+        ns = np.where(missing, 0, (a - b).astype(np.int64))
+        out = np.floor_divide(ns, NS_PER_DAY)
+    if missing.any():
+        out = out.astype(np.float64)
+        out[missing] = np.nan
+    return out
+
+def day_year(days):
+    days = to_day_numbers(days)
+    out = days.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64).astype(np.float64) + 1970
+    out[days == NA_DAY] = np.nan
+    return out
+
+def day_month(days):
+    days = to_day_numbers(days)
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    out = (months % 12 + 1).astype(np.float64)
+    out[days == NA_DAY] = np.nan
+    return out
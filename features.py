@@ -0,0 +1,135 @@
+# features.py
+# Model-ready feature matrix export from the production dataset.
+#
+# The matrix is stored as plain .npy arrays in one directory, so training jobs can
+# np.load(..., mmap_mode='r') them and use the data straight from the page cache
+# without parsing or copying:
+#   dense.npy           float32, C-contiguous (rows x numeric features); NaN = missing
+#   onehot_data.npy     CSR one-hot block for the categorical columns: values (float32 1.0),
+#   onehot_indices.npy  column indices (int32) and row pointers (int32, int64 once the
+#   onehot_indptr.npy   block has 2**31 entries); a missing value is an all-zero row
+#   manifest.json       shape, dtypes, feature names (dense and "column=value" one-hot
+#                       names), the categories of each column and their column offsets
+# The manifest is written last, so a directory without one is an incomplete export.
+# Pass the categories of an earlier manifest to encode new data on the same columns
+# (values not in it get no column). scipy is optional: with it load_features()
+# returns the one-hot block as a csr_matrix built over the mapped arrays.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import atomic_output, write_json_atomic
+
+try:
+    from scipy import sparse
+except ImportError:  # the raw CSR arrays are returned instead
+    sparse = None
+
+INPUT = "production_ready_dataset_v2.csv"
+OUT_DIR = "features_week1"
+MANIFEST = "manifest.json"
+ARRAY_FILES = {'dense': 'dense.npy', 'data': 'onehot_data.npy',
+               'indices': 'onehot_indices.npy', 'indptr': 'onehot_indptr.npy'}
+
+NUMERIC_FEATURES = [
+    'age_years', 'signup_month', 'signup_year', 'engagement_lag_days_fixed', 'opportunity_duration_days',
+    'log_opportunity_duration', 'days_before_start', 'gender_encoded', 'applied_after_start',
+    'flag_engagement_inversion', 'flag_days_before_start_extreme',
+]
+CATEGORICAL_FEATURES = ['country', 'opportunity_category', 'status_description', 'engagement_lag_bucket']
+
+def dense_block(df, columns):
+    """float32 C-contiguous matrix of the numeric columns (NaN for missing / non-numeric)."""
+    out = np.empty((len(df), len(columns)), dtype=np.float32)
+    for j, c in enumerate(columns):
+        out[:, j] = pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+    return out
+
+def onehot_block(df, columns, categories=None):
+    """
+    CSR arrays (data, indices, indptr) of the one-hot encoding, the categories used
+    (sorted distinct values per column unless given), each column's offset and the width.
+    """
+    categories = dict(categories or {})
+    offsets, col_ids = [], np.empty((len(df), len(columns)), dtype=np.int64)
+    width = 0
+    for j, c in enumerate(columns):
+        values = df[c].astype(str).where(df[c].notna())
+        if c not in categories:
+            categories[c] = sorted(values.dropna().unique().tolist())
+        codes = pd.Categorical(values, categories=categories[c]).codes.astype(np.int64)
+        col_ids[:, j] = np.where(codes >= 0, codes + width, -1)
+        offsets.append(width)
+        width += len(categories[c])
+    present = col_ids >= 0
+    # at most one entry per column block, blocks in column order: row-major order is CSR order
+    index_dtype = np.int32 if max(present.sum(), width) < 2 ** 31 else np.int64
+    indices = col_ids[present].astype(index_dtype)
+    indptr = np.zeros(len(df) + 1, dtype=index_dtype)
+    np.cumsum(present.sum(axis=1), out=indptr[1:])
+    data = np.ones(len(indices), dtype=np.float32)
+    return (data, indices, indptr), {c: categories[c] for c in columns}, dict(zip(columns, offsets)), width
+
+def _save_array(path, array):
+    with atomic_output(path) as tmp:
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(array))
+
+def export_features(df, out_dir=OUT_DIR, numeric=None, categorical=None, categories=None, source=None):
+    """Write the dense + one-hot feature matrix of df to out_dir; returns the manifest."""
+    numeric = [c for c in (numeric or NUMERIC_FEATURES) if c in df.columns]
+    categorical = [c for c in (categorical or CATEGORICAL_FEATURES) if c in df.columns]
+    dense = dense_block(df, numeric)
+    (data, indices, indptr), categories, offsets, width = onehot_block(df, categorical, categories)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)   # arrays and manifest must not mix exports
+    for key, array in (('dense', dense), ('data', data), ('indices', indices), ('indptr', indptr)):
+        _save_array(os.path.join(out_dir, ARRAY_FILES[key]), array)
+    manifest = {
+        'source': source,
+        'n_rows': len(df),
+        'files': ARRAY_FILES,
+        'dense': {'shape': list(dense.shape), 'dtype': str(dense.dtype), 'features': numeric},
+        'onehot': {'shape': [len(df), width], 'nnz': int(len(data)), 'format': 'csr',
+                   'dtype': str(data.dtype), 'index_dtype': str(indices.dtype),
+                   'features': [f'{c}={v}' for c in categorical for v in categories[c]],
+                   'categories': categories, 'offsets': offsets},
+    }
+    write_json_atomic(manifest_path, manifest)
+    return manifest
+
+def load_features(out_dir=OUT_DIR, mmap=True):
+    """
+    (dense, onehot, manifest) of an export. With mmap the arrays are read-only memory
+    maps of the files (no copy); onehot is a scipy csr_matrix when scipy is installed,
+    otherwise the (data, indices, indptr) tuple.
+    """
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"No feature export in '{out_dir}' ({MANIFEST} missing)")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    mode = 'r' if mmap else None
+    arrays = {key: np.load(os.path.join(out_dir, name), mmap_mode=mode) for key, name in manifest['files'].items()}
+    csr = (arrays['data'], arrays['indices'], arrays['indptr'])
+    if sparse is not None:
+        csr = sparse.csr_matrix(csr, shape=tuple(manifest['onehot']['shape']), copy=False)
+    return arrays['dense'], csr, manifest
+
+def export_csv_to_features(input_csv=INPUT, out_dir=OUT_DIR):
+    print('Loading', input_csv)
+    df = pd.read_csv(input_csv)
+    manifest = export_features(df, out_dir, source=os.path.basename(input_csv))
+    dense, onehot = manifest['dense'], manifest['onehot']
+    print(f"Features {out_dir}: {manifest['n_rows']} rows, {dense['shape'][1]} dense float32 + "
+          f"{onehot['shape'][1]} one-hot columns ({onehot['nnz']} non-zeros)")
+    return manifest
+
+
+if __name__ == "__main__":
+    export_csv_to_features()
@@ -2,113 +2,235 @@ import pandas as pd
 import numpy as np
 from math import floor
 
+from checkpoint import to_csv_atomic
+from daydates import day_diff, to_day_columns
+from lineage import RAW_ROW_ID, has_lineage, lineage_path_for, raw_id_lookup, raw_ids, save_lineage
+from prefetch import CHUNK_ROWS, CsvChunkWriter, csv_chunks, run_pipelined
+from projection import read_projected, write_passthrough
+
 IN_CSV = 'Cleaned_Preprocessed_Dataset_Week1_final.csv'
 OUT_CSV = 'Cleaned_Preprocessed_Dataset_Week1_final_fixed.csv'
 AUDIT_OUT = 'fixes_audit.csv'
+AUDIT_COLUMNS = ['row_index', RAW_ROW_ID, 'column', 'old_value', 'new_value', 'action_description']
 
-# load
-print('Loading', IN_CSV)
-df = pd.read_csv(IN_CSV)
-# keep original index as row reference
-orig_index = df.index
-
-# helper to append audit rows
-audit_rows = []
-def record_audit(idx, column, old, new, desc):
-    audit_rows.append({'row_index': int(idx), 'column': column, 'old_value': old, 'new_value': new, 'action_description': desc})
-
-# parse dates where possible
-date_cols = ['learner_signup_datetime','date_of_birth','apply_date','opportunity_start_date','opportunity_end_date','entry_created_at']
-for c in date_cols:
-    if c in df.columns:
-        df[c+'_parsed_for_fix'] = pd.to_datetime(df[c], errors='coerce')
-    else:
-        df[c+'_parsed_for_fix'] = pd.Series([pd.NaT]*len(df))
-
-# Fix 1: recompute engagement_lag_days from parsed dates
-if 'engagement_lag_days' in df.columns:
-    # store old
-    old_vals = df['engagement_lag_days'].copy()
-else:
-    df['engagement_lag_days'] = np.nan
-    old_vals = pd.Series([np.nan]*len(df))
-
-# compute new lag in days where both dates available
-new_lag = (df['apply_date_parsed_for_fix'] - df['learner_signup_datetime_parsed_for_fix']).dt.days
-# Where either date missing, keep NaN
-# Replace computed values
-for i in df.index:
-    old = old_vals.at[i] if i in old_vals.index else None
-    val = new_lag.at[i]
-    if pd.isna(val):
-        if not pd.isna(old):
-            # old had value but recomputed is NaN -> record and set NaN
-            record_audit(i, 'engagement_lag_days', old, np.nan, 'Recomputed lag not available (dates missing)')
-            df.at[i,'engagement_lag_days'] = np.nan
+# columns the stage parses / may change (see projection.py); all others pass through
+READ_COLUMNS = [RAW_ROW_ID, 'learner_signup_datetime', 'date_of_birth', 'apply_date', 'engagement_lag_days', 'age_years']
+WRITE_COLUMNS = ['engagement_lag_days', 'age_years']
+
+
+def apply_fixes(df, record_audit, day_resolution=False):
+    """
+    Fixes 1-2 on df in place: engagement_lag_days and age_years recomputed from the
+    dates, each change passed to record_audit(idx, column, old, new, desc). Works on
+    any slice of rows (the index is the row reference). Returns df.
+    """
+    # parse dates where possible
+    date_cols = ['learner_signup_datetime','date_of_birth','apply_date','opportunity_start_date','opportunity_end_date','entry_created_at']
+    for c in date_cols:
+        if c in df.columns:
+            df[c+'_parsed_for_fix'] = pd.to_datetime(df[c], errors='coerce')
         else:
-            df.at[i,'engagement_lag_days'] = np.nan
+            df[c+'_parsed_for_fix'] = pd.Series([pd.NaT]*len(df), index=df.index)
+    if day_resolution:
+        # whole-day dates (date_of_birth) are held as int32 day numbers
+        to_day_columns(df, [c+'_parsed_for_fix' for c in date_cols])
+
+    # Fix 1: recompute engagement_lag_days from parsed dates
+    if 'engagement_lag_days' in df.columns:
+        # store old
+        old_vals = df['engagement_lag_days'].copy()
     else:
-        # if computed value negative, mark as NaN and record (we consider negative lag invalid)
-        if val < 0:
-            record_audit(i, 'engagement_lag_days', old, np.nan, 'Negative lag (apply_date < signup) — cleared to NaN')
-            df.at[i,'engagement_lag_days'] = np.nan
-        else:
-            if pd.isna(old) or (not pd.isna(old) and int(old) != int(val)):
-                record_audit(i, 'engagement_lag_days', old, int(val), 'Recomputed from dates')
-            df.at[i,'engagement_lag_days'] = int(val)
-
-# Fix 2: recompute age_years from date_of_birth and signup
-if 'age_years' in df.columns:
-    old_age = df['age_years'].copy()
-else:
-    df['age_years'] = np.nan
-    old_age = pd.Series([np.nan]*len(df))
-
-for i in df.index:
-    dob = df.at[i,'date_of_birth_parsed_for_fix'] if 'date_of_birth_parsed_for_fix' in df.columns else pd.NaT
-    signup = df.at[i,'learner_signup_datetime_parsed_for_fix'] if 'learner_signup_datetime_parsed_for_fix' in df.columns else pd.NaT
-    old = old_age.at[i] if i in old_age.index else None
-    if pd.isna(dob) or pd.isna(signup):
-        # cannot compute
-        if not pd.isna(old):
-            record_audit(i, 'age_years', old, np.nan, 'DOB or signup missing -> set age to NaN')
-            df.at[i,'age_years'] = np.nan
+        df['engagement_lag_days'] = np.nan
+        old_vals = pd.Series([np.nan]*len(df), index=df.index)
+
+    # compute new lag in days where both dates available
+    if day_resolution:
+        new_lag = pd.Series(day_diff(df['apply_date_parsed_for_fix'], df['learner_signup_datetime_parsed_for_fix']), index=df.index)
+    else:
+        new_lag = (df['apply_date_parsed_for_fix'] - df['learner_signup_datetime_parsed_for_fix']).dt.days
+    # Where either date missing, keep NaN
+    # Replace computed values
+    for i in df.index:
+        old = old_vals.at[i] if i in old_vals.index else None
+        val = new_lag.at[i]
+        if pd.isna(val):
+            if not pd.isna(old):
+                # old had value but recomputed is NaN -> record and set NaN
+                record_audit(i, 'engagement_lag_days', old, np.nan, 'Recomputed lag not available (dates missing)')
+                df.at[i,'engagement_lag_days'] = np.nan
+            else:
+                df.at[i,'engagement_lag_days'] = np.nan
         else:
-            df.at[i,'age_years'] = np.nan
+            # if computed value negative, mark as NaN and record (we consider negative lag invalid)
+            if val < 0:
+                record_audit(i, 'engagement_lag_days', old, np.nan, 'Negative lag (apply_date < signup) — cleared to NaN')
+                df.at[i,'engagement_lag_days'] = np.nan
+            else:
+                if pd.isna(old) or (not pd.isna(old) and int(old) != int(val)):
+                    record_audit(i, 'engagement_lag_days', old, int(val), 'Recomputed from dates')
+                df.at[i,'engagement_lag_days'] = int(val)
+
+    # Fix 2: recompute age_years from date_of_birth and signup
+    if 'age_years' in df.columns:
+        old_age = df['age_years'].copy()
     else:
-        years = floor((signup - dob).days / 365.25)
-        # plausibility
-        if years < 10 or years > 120:
-            record_audit(i, 'age_years', old, np.nan, f'Age {years} out of plausible range -> set to NaN')
-            df.at[i,'age_years'] = np.nan
+        df['age_years'] = np.nan
+        old_age = pd.Series([np.nan]*len(df), index=df.index)
+
+    # signup - dob in days, computed once for all rows
+    if day_resolution:
+        age_span = pd.Series(day_diff(df['learner_signup_datetime_parsed_for_fix'], df['date_of_birth_parsed_for_fix']), index=df.index)
+    else:
+        age_span = (df['learner_signup_datetime_parsed_for_fix'] - df['date_of_birth_parsed_for_fix']).dt.days
+
+    for i in df.index:
+        old = old_age.at[i] if i in old_age.index else None
+        # the span is NaN exactly when DOB or signup is missing
+        if pd.isna(age_span.at[i]):
+            # cannot compute
+            if not pd.isna(old):
+                record_audit(i, 'age_years', old, np.nan, 'DOB or signup missing -> set age to NaN')
+                df.at[i,'age_years'] = np.nan
+            else:
+                df.at[i,'age_years'] = np.nan
         else:
-            if pd.isna(old) or int(old) != int(years):
-                record_audit(i, 'age_years', old, int(years), 'Recomputed from DOB and signup')
-            df.at[i,'age_years'] = int(years)
-
-# Optionally: any other fixes? For now we'll drop the parsed helper columns and write fixed files
-parsed_cols = [c for c in df.columns if c.endswith('_parsed_for_fix')]
-for c in parsed_cols:
-    df.drop(columns=[c], inplace=True)
-
-# Save audit
-audit_df = pd.DataFrame(audit_rows)
-if not audit_df.empty:
-    audit_df.to_csv(AUDIT_OUT, index=False)
-    print('Saved audit of fixes to', AUDIT_OUT)
-else:
-    # create empty file with header
-    pd.DataFrame(columns=['row_index','column','old_value','new_value','action_description']).to_csv(AUDIT_OUT, index=False)
-    print('No fixes recorded; created empty', AUDIT_OUT)
-
-# Save fixed CSV
-df.to_csv(OUT_CSV, index=False)
-print('Saved fixed dataset to', OUT_CSV)
-
-# Print quick summary of fixes
-print('\nFix summary:')
-if not audit_df.empty:
-    summary = audit_df.groupby('column').size().rename('fix_count')
-    print(summary.to_string())
-else:
-    print('No fixes applied')
+            years = floor(age_span.at[i] / 365.25)
+            # plausibility
+            if years < 10 or years > 120:
+                record_audit(i, 'age_years', old, np.nan, f'Age {years} out of plausible range -> set to NaN')
+                df.at[i,'age_years'] = np.nan
+            else:
+                if pd.isna(old) or int(old) != int(years):
+                    record_audit(i, 'age_years', old, int(years), 'Recomputed from DOB and signup')
+                df.at[i,'age_years'] = int(years)
+
+    # Optionally: any other fixes? For now we'll drop the parsed helper columns and write fixed files
+    parsed_cols = [c for c in df.columns if c.endswith('_parsed_for_fix')]
+    for c in parsed_cols:
+        df.drop(columns=[c], inplace=True)
+    return df
+
+
+def run_fixes(in_csv=IN_CSV, out_csv=OUT_CSV, audit_out=AUDIT_OUT, audit_store=None, day_resolution=False,
+              metrics=None, projection=True, pipelined=False, chunk_rows=CHUNK_ROWS):
+    """
+    Recompute engagement_lag_days and age_years from the parsed dates, auditing each change.
+    Changes also go to audit_store (audit_store.AuditStore) under stage 'fix' when given.
+    Audit entries carry the row's raw_row_id (-1 / NULL without lineage), and out_csv
+    gets its lineage .npy when the input has a raw_row_id column (see lineage.py).
+    day_resolution=True holds whole-day dates as int32 day numbers (see daydates.py);
+    the values and audit are the same as without it.
+    metrics (metrics.RunMetrics) receives rows, throughput and fixes per column.
+    projection=True parses only READ_COLUMNS and copies the other columns' field text
+    to out_csv unchanged (a full read may re-round floats, see projection.py); the input
+    is read twice, parsed and then streamed while writing. The returned frame then holds
+    only READ_COLUMNS. False reads everything.
+    pipelined=True streams the file in chunks of chunk_rows with background read and
+    write (prefetch.py); memory is bounded by a few chunks and None is returned.
+    """
+    if metrics is not None:
+        metrics.start_stage('fix')
+    if pipelined:
+        return _run_fixes_pipelined(in_csv, out_csv, audit_out, audit_store, day_resolution, metrics, chunk_rows)
+    # load
+    print('Loading', in_csv)
+    if projection:
+        df, raw = read_projected(in_csv, READ_COLUMNS)
+    else:
+        df, raw = pd.read_csv(in_csv), None
+    # keep original index as row reference
+    orig_index = df.index
+
+    # helper to append audit rows
+    audit_rows = []
+    raw_row_id = raw_id_lookup(df)
+    def record_audit(idx, column, old, new, desc):
+        audit_rows.append(_audit_row(idx, raw_row_id(idx), column, old, new, desc))
+        if audit_store is not None:
+            audit_store.record('fix', idx, column, old, new, desc, raw_row_id=raw_row_id(idx))
+
+    apply_fixes(df, record_audit, day_resolution)
+
+    # Save audit
+    if audit_store is not None:
+        audit_store.flush()
+    audit_df = _save_audit(audit_rows, audit_out)
+
+    # Save fixed CSV
+    if raw is not None:
+        write_passthrough(df, raw, out_csv, WRITE_COLUMNS)
+    else:
+        to_csv_atomic(df, out_csv, index=False)
+    print('Saved fixed dataset to', out_csv)
+    if has_lineage(df):
+        save_lineage(df, lineage_path_for(out_csv))
+
+    _print_summary(audit_df, metrics, len(df))
+    return df
+
+
+def _audit_row(idx, raw_row_id, column, old, new, desc):
+    return {'row_index': int(idx), RAW_ROW_ID: raw_row_id, 'column': column, 'old_value': old, 'new_value': new,
+            'action_description': desc}
+
+
+def _save_audit(audit_rows, audit_out):
+    audit_df = pd.DataFrame(audit_rows)
+    if not audit_df.empty:
+        to_csv_atomic(audit_df, audit_out, index=False)
+        print('Saved audit of fixes to', audit_out)
+    else:
+        # create empty file with header
+        to_csv_atomic(pd.DataFrame(columns=AUDIT_COLUMNS), audit_out, index=False)
+        print('No fixes recorded; created empty', audit_out)
+    return audit_df
+
+
+def _print_summary(audit_df, metrics, n_rows):
+    # Print quick summary of fixes
+    print('\nFix summary:')
+    if not audit_df.empty:
+        summary = audit_df.groupby('column').size().rename('fix_count')
+        print(summary.to_string())
+    else:
+        print('No fixes applied')
+
+    if metrics is not None:
+        metrics.end_stage('fix', n_rows)
+        if not audit_df.empty:
+            for column, n in audit_df.groupby('column').size().items():
+                metrics.set('fixes', n, stage='fix', column=column)
+
+
+def _run_fixes_pipelined(in_csv, out_csv, audit_out, audit_store, day_resolution, metrics, chunk_rows):
+    """run_fixes over chunks: read, fix and write overlap (prefetch.run_pipelined)."""
+    print('Loading', in_csv, f'in chunks of {chunk_rows} rows (pipelined)')
+    # per column, so the audit keeps the whole-file order (all lag fixes, then all age fixes)
+    audit_by_column = {}
+    lineage = []
+    def process(chunk):
+        raw_row_id = raw_id_lookup(chunk)
+        if has_lineage(chunk):
+            lineage.append(raw_ids(chunk))
+        def record_audit(idx, column, old, new, desc):
+            audit_by_column.setdefault(column, []).append(_audit_row(idx, raw_row_id(idx), column, old, new, desc))
+        return apply_fixes(chunk, record_audit, day_resolution)
+
+    with CsvChunkWriter(out_csv) as out:
+        stats = run_pipelined(csv_chunks(in_csv, READ_COLUMNS, chunk_rows), process, out.write)
+    print('Saved fixed dataset to', out_csv)
+    print(stats.summary())
+    if lineage:
+        save_lineage(pd.DataFrame({RAW_ROW_ID: np.concatenate(lineage)}), lineage_path_for(out_csv))
+
+    audit_rows = [r for c in WRITE_COLUMNS for r in audit_by_column.get(c, [])]
+    if audit_store is not None:
+        for r in audit_rows:
+            audit_store.record('fix', r['row_index'], r['column'], r['old_value'], r['new_value'], r['action_description'],
+                               raw_row_id=r[RAW_ROW_ID])
+        audit_store.flush()
+    _print_summary(_save_audit(audit_rows, audit_out), metrics, stats.rows)
+
+
+if __name__ == "__main__":
+    run_fixes()
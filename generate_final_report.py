@@ -1,301 +1,485 @@
-import pandas as pd
-import numpy as np
+# generate_final_report.py
+# Final production-readiness report, rendered as Markdown (REPORT_MD) from REPORT_TEMPLATE.
+#
+# Each data section in SECTIONS is an independent unit: (columns it reads, compute
+# function). Its result is a plain dict, cached in REPORT_CACHE under a hash of exactly
+# those columns' contents (pandas hash_pandas_object), the row count and the sampling
+# mode, so a re-run after a change to one column recomputes only the sections that read
+# it. Sections that are not cached are computed in parallel worker processes that
+# attach to one shared-memory copy of the dataset (shared_dataset.py); sample previews
+# and single-CPU runs compute them in-process. The checks and the certification are
+# derived from the section results and the file size is read from disk at render time.
+# Bump REPORT_VERSION when a compute function changes so stale cache entries are dropped.
+
+import hashlib
+import json
+import os
+import time
 from datetime import datetime
+from string import Template
 
-# Load the final production-ready dataset
-df = pd.read_csv('engagement_lag_days_production_ready_v2.csv')
-
-print('Analyzing final production-ready dataset...')
-print()
-
-# ============================================================================
-# SECTION 1: DATASET OVERVIEW
-# ============================================================================
-print('='*80)
-print('SECTION 1: DATASET OVERVIEW')
-print('='*80)
-
-shape = df.shape
-total_cells = shape[0] * shape[1]
-null_cells = df.isna().sum().sum()
-completeness = ((total_cells - null_cells) / total_cells) * 100
-
-print(f'Total Records: {shape[0]:,}')
-print(f'Total Columns: {shape[1]}')
-print(f'Total Cells: {total_cells:,}')
-print(f'Null Cells: {null_cells:,}')
-print(f'Data Completeness: {completeness:.2f}%')
-print(f'File Size: {2.5:.1f} MB')
-print()
-
-# ============================================================================
-# SECTION 2: COLUMN-BY-COLUMN ANALYSIS
-# ============================================================================
-print('='*80)
-print('SECTION 2: COLUMN-BY-COLUMN ANALYSIS')
-print('='*80)
-print()
-
-for col in df.columns:
-    dtype = df[col].dtype
-    non_null = df[col].notna().sum()
-    null_count = df[col].isna().sum()
-    null_pct = (null_count / len(df)) * 100
-    
-    # Get value statistics
-    if dtype in ['float64', 'int64']:
-        min_val = df[col].min()
-        max_val = df[col].max()
-        mean_val = df[col].mean()
-        print(f'{col:35} | Type: {str(dtype):8} | Null: {null_pct:5.1f}% | Range: {min_val:.0f}-{max_val:.0f} | Mean: {mean_val:.2f}')
-    else:
-        unique = df[col].nunique()
-        print(f'{col:35} | Type: {str(dtype):8} | Null: {null_pct:5.1f}% | Unique: {unique:5}')
-
-print()
-
-# ============================================================================
-# SECTION 3: ENGAGEMENT LAG ANALYSIS
-# ============================================================================
-print('='*80)
-print('SECTION 3: ENGAGEMENT LAG METRICS (PRIMARY FOCUS)')
-print('='*80)
-print()
-
-eng_lag = df['engagement_lag_days_fixed']
-print(f'Valid Values: {eng_lag.notna().sum():,} ({(eng_lag.notna().sum()/len(df)*100):.1f}%)')
-print(f'Missing Values: {eng_lag.isna().sum():,} ({(eng_lag.isna().sum()/len(df)*100):.1f}%)')
-print(f'Negative Values: {(eng_lag < 0).sum()} (✓ Fixed)')
-print(f'Range: {eng_lag.min():.0f} to {eng_lag.max():.0f} days')
-print(f'Mean: {eng_lag.mean():.2f} days')
-print(f'Median: {eng_lag.median():.2f} days')
-print(f'Std Dev: {eng_lag.std():.2f} days')
-print()
-
-# ============================================================================
-# SECTION 4: ENGAGEMENT LAG BUCKET DISTRIBUTION
-# ============================================================================
-print('='*80)
-print('SECTION 4: ENGAGEMENT LAG BUCKET DISTRIBUTION')
-print('='*80)
-print()
-
-bucket_dist = df['engagement_lag_bucket'].value_counts(dropna=False).sort_index()
-for bucket, count in bucket_dist.items():
-    pct = (count / len(df)) * 100
-    bucket_name = str(bucket) if pd.notna(bucket) else 'NaN (Missing)'
-    bar = '█' * int(pct/2)
-    print(f'  {bucket_name:15} | {count:5,} ({pct:5.1f}%) {bar}')
-
-print()
-
-# ============================================================================
-# SECTION 5: DATA QUALITY METRICS
-# ============================================================================
-print('='*80)
-print('SECTION 5: DATA QUALITY METRICS')
-print('='*80)
-print()
-
-duplicates = df.duplicated().sum()
-print(f'Duplicate Rows: {duplicates} (✓ Zero duplicates)')
-print(f'Data Types Validated: ✓ All correct')
-print()
-
-# Check for common placeholder strings
-obj_cols = df.select_dtypes(include=['object']).columns.tolist()
-placeholder_check = 0
-for col in obj_cols:
-    if df[col].astype(str).str.contains('nan|NaN|N/A', regex=True, na=False).any():
-        placeholder_check += 1
-
-if placeholder_check == 0:
-    print('Placeholder Strings ("nan", "NaN", "N/A"): ✓ None found')
-else:
-    print(f'Placeholder Strings Found: {placeholder_check} columns')
-
-print()
-
-# ============================================================================
-# SECTION 6: INVERSION FLAG STATUS
-# ============================================================================
-print('='*80)
-print('SECTION 6: CHRONOLOGY INVERSION FLAGS')
-print('='*80)
-print()
-
-if 'flag_engagement_inversion' in df.columns:
-    inversions = df['flag_engagement_inversion'].sum()
-    print(f'Records Flagged (apply_date < signup_date): {inversions:,} ({(inversions/len(df)*100):.2f}%)')
-    print(f'Unflagged Records: {(df["flag_engagement_inversion"]==0).sum():,}')
-    print(f'Action Taken: Converted to NaN with flag indicator')
-    print()
-
-# ============================================================================
-# SECTION 7: FEATURE ENGINEERING
-# ============================================================================
-print('='*80)
-print('SECTION 7: ENGINEERED FEATURES')
-print('='*80)
-print()
-
-engineered_features = [
+import pandas as pd
+
+from checkpoint import atomic_output, write_json_atomic
+from missingness import MissingnessSnapshot
+from sampling import ExactCounts, format_estimate, stratified_sample_csv
+
+INPUT = 'engagement_lag_days_production_ready_v2.csv'
+REPORT_MD = 'FINAL_DATASET_REPORT.md'
+REPORT_CACHE = '.report_cache.json'
+REPORT_VERSION = 3
+EXPECTED_RECORDS = 8558
+
+ENGINEERED_FEATURES = [
     'engagement_lag_days_fixed',
     'engagement_lag_bucket',
     'applied_after_start',
     'flag_engagement_inversion',
-    'log_opportunity_duration'
+    'log_opportunity_duration',
 ]
 
-for feat in engineered_features:
-    if feat in df.columns:
-        print(f'  ✓ {feat}')
-
-print()
-
-# ============================================================================
-# SECTION 8: VALIDATION CHECKS
-# ============================================================================
-print('='*80)
-print('SECTION 8: VALIDATION CHECKS (ALL PASS)')
-print('='*80)
-print()
-
-checks = [
-    ('No duplicate rows', duplicates == 0, duplicates),
-    ('No negative lags', (eng_lag < 0).sum() == 0, (eng_lag < 0).sum()),
-    ('Completeness ≥90%', completeness >= 90, f'{completeness:.1f}%'),
-    ('All data types correct', len(df.columns) > 25, len(df.columns)),
-    ('Records intact', len(df) == 8558, len(df))
-]
+# -----------------------
+# Section computations (df, est) -> JSON-serialisable dict
+# -----------------------
+def _py(value):
+    """numpy scalar -> Python scalar, so section results serialise to JSON."""
+    return value.item() if hasattr(value, 'item') else value
+
+def _plain(series):
+    """A dictionary-encoded (shared-memory) column as its original values."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(series.cat.categories.dtype)
+    return series
+
+def _dtype_name(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return str(series.cat.categories.dtype)
+    return str(series.dtype)
+
+def _counts(est, series, dropna=True, sort_index=False):
+    counts = est.value_counts(_plain(series), dropna=dropna)
+    if sort_index:
+        counts = counts.sort_index()
+    return [[None if pd.isna(v) else _py(v), _py(count), _py(hw)] for v, (count, hw) in counts.iterrows()]
+
+def _overview(df, est):
+    # one null-bitmap pass; the missing-values section reads its counts from here
+    nulls = MissingnessSnapshot('report', df)
+    null_counts = {c: int(n) for c, n in nulls.counts().items()}
+    null_cells, null_cells_hw = nulls.total_nulls, None
+    null_hw = {}
+    if est.is_sample:
+        estimates = {c: est.total(df[c].isna()) for c in df.columns}
+        null_counts = {c: int(round(v)) for c, (v, _) in estimates.items()}
+        null_hw = {c: _py(hw) for c, (_, hw) in estimates.items()}
+        null_cells, null_cells_hw = est.total(df.isna().sum(axis=1))
+    total_cells = est.n_population * df.shape[1]
+    return {'n_rows': est.n_population, 'n_columns': df.shape[1], 'total_cells': total_cells,
+            'null_cells': _py(null_cells), 'null_cells_hw': _py(null_cells_hw),
+            'completeness': _py((total_cells - null_cells) / total_cells * 100),
+            'null_counts': null_counts, 'null_hw': null_hw}
+
+def _columns(df, est):
+    rows = []
+    for col in df.columns:
+        null_count = int(round(est.total(df[col].isna())[0])) if est.is_sample else int(df[col].isna().sum())
+        row = {'column': col, 'dtype': _dtype_name(df[col]), 'null_pct': null_count / est.n_population * 100}
+        if str(df[col].dtype) in ['float64', 'int64']:
+            row.update(min=_py(df[col].min()), max=_py(df[col].max()), mean=_py(est.mean(df[col])[0]))
+        else:
+            row['unique'] = int(df[col].nunique())
+        rows.append(row)
+    return {'rows': rows}
+
+def _lag(df, est):
+    eng_lag = df['engagement_lag_days_fixed']
+    # weighted population estimates in a preview; min/max are the sample's
+    p25, median, p75, p90 = est.quantiles(eng_lag, [0.25, 0.5, 0.75, 0.9])
+    valid, valid_hw = est.total(eng_lag.notna())
+    missing, missing_hw = est.total(eng_lag.isna())
+    negative, negative_hw = est.total(eng_lag < 0)
+    mean, mean_hw = est.mean(eng_lag)
+    return {key: _py(value) for key, value in dict(
+        valid=valid, valid_hw=valid_hw, missing=missing, missing_hw=missing_hw,
+        negative=negative, negative_hw=negative_hw, negative_rows=int((eng_lag < 0).sum()),
+        min=eng_lag.min(), max=eng_lag.max(), mean=mean, mean_hw=mean_hw, median=median,
+        std=est.std(eng_lag), p25=p25, p75=p75, p90=p90, estimated=est.is_sample).items()}
+
+def _buckets(df, est):
+    return {'rows': _counts(est, df['engagement_lag_bucket'], dropna=False, sort_index=True)}
+
+def _quality(df, est):
+    placeholder_columns = 0
+    for col in [c for c in df.columns if _dtype_name(df[c]) == 'object']:
+        if df[col].astype(str).str.contains('nan|NaN|N/A', regex=True, na=False).any():
+            placeholder_columns += 1
+    return {'duplicates': int(df.duplicated().sum()), 'placeholder_columns': placeholder_columns}
+
+def _inversions(df, est):
+    flags = df['flag_engagement_inversion']
+    flagged, flagged_hw = est.total(flags)
+    unflagged, unflagged_hw = est.total(flags == 0)
+    return {'flagged': _py(flagged), 'flagged_hw': _py(flagged_hw),
+            'unflagged': _py(unflagged), 'unflagged_hw': _py(unflagged_hw)}
+
+def _countries(df, est):
+    return {'unique': int(df['country'].nunique()), 'top': _counts(est, df['country'])[:10]}
+
+def _date_range(column):
+    def compute(df, est):
+        dates = pd.to_datetime(_plain(df[column]), errors='coerce')
+        count, hw = est.total(dates.notna())
+        return {'first': str(dates.min().date()), 'last': str(dates.max().date()),
+                'count': _py(count), 'count_hw': _py(hw)}
+    return compute
+
+def _categories(df, est):
+    return {'opportunities': int(df['opportunity_id'].nunique()),
+            'rows': _counts(est, df['opportunity_category'])}
+
+def _statuses(df, est):
+    return {'rows': _counts(est, df['status_description'])}
+
+# key -> (columns read (None = every column), compute function); report order
+SECTIONS = {
+    'overview': (None, _overview),
+    'columns': (None, _columns),
+    'lag': (['engagement_lag_days_fixed'], _lag),
+    'buckets': (['engagement_lag_bucket'], _buckets),
+    'quality': (None, _quality),
+    'inversions': (['flag_engagement_inversion'], _inversions),
+    'countries': (['country'], _countries),
+    'signups': (['learner_signup_datetime'], _date_range('learner_signup_datetime')),
+    'applies': (['apply_date'], _date_range('apply_date')),
+    'categories': (['opportunity_id', 'opportunity_category'], _categories),
+    'statuses': (['status_description'], _statuses),
+}
+
+# -----------------------
+# Cache keys and parallel computation
+# -----------------------
+class ColumnHashes:
+    """Content hash per column, computed once per run and shared by all sections."""
+    def __init__(self, df):
+        self.df = df
+        self.hashes = {}
+
+    def __getitem__(self, column):
+        if column not in self.hashes:
+            values = pd.util.hash_pandas_object(self.df[column], index=False).to_numpy()
+            self.hashes[column] = hashlib.sha1(values.tobytes()).hexdigest()
+        return self.hashes[column]
+
+def section_hash(key, columns, hashes, est, mode):
+    parts = [f'v{REPORT_VERSION}', key, mode, str(est.n_population), str(len(hashes.df))]
+    parts += [f'{c}={hashes[c]}' for c in columns]
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
+
+def _compute_section(df, key):
+    """Worker entry point: one section over the (shared-memory) full dataset."""
+    return key, SECTIONS[key][1](df, ExactCounts(df))
+
+def compute_sections(keys, df, est, max_workers=None):
+    """{key: result} for the given sections, in parallel processes when worthwhile."""
+    workers = min(len(keys), max_workers or os.cpu_count() or 1)
+    if est.is_sample or workers <= 1:
+        return {key: SECTIONS[key][1](df, est) for key in keys}
+    from shared_dataset import SharedDataset, parallel_map
+    with SharedDataset.create(df) as ds:
+        return dict(parallel_map(_compute_section, keys, ds, max_workers=workers))
+
+def _load_cache(cache_file):
+    if not cache_file or not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# -----------------------
+# Markdown rendering
+# -----------------------
+REPORT_TEMPLATE = Template("""\
+# Week 1 Final Dataset Report
 
-for check_name, result, detail in checks:
-    status = '✓ PASS' if result else '✗ FAIL'
-    print(f'{check_name:40} : {status:8} ({detail})')
-
-print()
-
-# ============================================================================
-# SECTION 9: MISSING VALUES ANALYSIS
-# ============================================================================
-print('='*80)
-print('SECTION 9: MISSING VALUES BY COLUMN')
-print('='*80)
-print()
-
-null_by_col = df.isna().sum().sort_values(ascending=False)
-null_by_col_filtered = null_by_col[null_by_col > 0]
-
-print('Columns with Missing Values (sorted by count):')
-for col, count in null_by_col_filtered.items():
-    pct = (count / len(df)) * 100
-    print(f'  {col:35} : {count:5,} ({pct:5.1f}%)')
-
-print()
-
-# ============================================================================
-# SECTION 10: GEOGRAPHIC COVERAGE
-# ============================================================================
-print('='*80)
-print('SECTION 10: GEOGRAPHIC COVERAGE')
-print('='*80)
-print()
-
-countries = df['country'].nunique()
-top_countries = df['country'].value_counts().head(10)
-
-print(f'Total Countries: {countries}')
-print()
-print('Top 10 Countries by Record Count:')
-for country, count in top_countries.items():
-    pct = (count / len(df)) * 100
-    print(f'  {country:20} : {count:5,} ({pct:5.1f}%)')
-
-print()
-
-# ============================================================================
-# SECTION 11: TEMPORAL COVERAGE
-# ============================================================================
-print('='*80)
-print('SECTION 11: TEMPORAL COVERAGE')
-print('='*80)
-print()
-
-if 'learner_signup_datetime' in df.columns:
-    signup_dates = pd.to_datetime(df['learner_signup_datetime'], errors='coerce')
-    print(f'Signup Date Range: {signup_dates.min().date()} to {signup_dates.max().date()}')
-    print(f'Signup Records: {signup_dates.notna().sum():,}')
-    print()
-
-if 'apply_date' in df.columns:
-    apply_dates = pd.to_datetime(df['apply_date'], errors='coerce')
-    print(f'Apply Date Range: {apply_dates.min().date()} to {apply_dates.max().date()}')
-    print(f'Apply Records: {apply_dates.notna().sum():,}')
-    print()
-
-# ============================================================================
-# SECTION 12: OPPORTUNITY ANALYSIS
-# ============================================================================
-print('='*80)
-print('SECTION 12: OPPORTUNITY ANALYSIS')
-print('='*80)
-print()
-
-opportunities = df['opportunity_id'].nunique()
-print(f'Unique Opportunities: {opportunities}')
-print()
-
-categories = df['opportunity_category'].value_counts()
-print('Opportunities by Category:')
-for cat, count in categories.items():
-    pct = (count / len(df)) * 100
-    print(f'  {cat:15} : {count:5,} ({pct:5.1f}%)')
-
-print()
-
-# ============================================================================
-# SECTION 13: STATUS ANALYSIS
-# ============================================================================
-print('='*80)
-print('SECTION 13: APPLICATION STATUS DISTRIBUTION')
-print('='*80)
-print()
-
-statuses = df['status_description'].value_counts()
-for status, count in statuses.items():
-    pct = (count / len(df)) * 100
-    print(f'  {status:20} : {count:5,} ({pct:5.1f}%)')
-
-print()
-
-# ============================================================================
-# SECTION 14: PRODUCTION READINESS CERTIFICATION
-# ============================================================================
-print('='*80)
-print('SECTION 14: PRODUCTION READINESS CERTIFICATION')
-print('='*80)
-print()
-
-print('Dataset Status: ✓ PRODUCTION-READY')
-print()
-print('Certification Details:')
-print('  ✓ All data types validated and standardized')
-print('  ✓ All negative engagement lags fixed (43 chronology inversions corrected)')
-print('  ✓ All placeholder strings removed or converted to NA')
-print('  ✓ Zero duplicate records (100% unique)')
-print('  ✓ Data completeness: {:.2f}% (exceeds 90% target)'.format(completeness))
-print('  ✓ No data loss (all 8,558 records preserved)')
-print('  ✓ All anomalies flagged with binary indicators')
-print('  ✓ Full audit trail maintained')
-print()
-
-print('Approved for:')
-print('  ✓ Week 2 Exploratory Data Analysis (EDA)')
-print('  ✓ Statistical Analysis & Visualization')
-print('  ✓ Feature Engineering & Predictive Modeling')
-print('  ✓ Stakeholder Reporting')
-print()
-
-print('='*80)
-print('Report Generation Complete')
-print('='*80)
+- **Dataset**: `$source`
+- **File Size**: $file_size
+- **Generated**: $generated
+$preview
+---
+
+## 1. Dataset Overview
+
+$overview
+
+## 2. Column-by-Column Analysis
+
+$columns
+
+## 3. Engagement Lag Metrics (Primary Focus)
+
+$lag
+
+## 4. Engagement Lag Bucket Distribution
+
+$buckets
+
+## 5. Data Quality Metrics
+
+$quality
+
+## 6. Chronology Inversion Flags
+
+$inversions
+
+## 7. Engineered Features
+
+$features
+
+## 8. Validation Checks
+
+$validation
+
+## 9. Missing Values by Column
+
+$missing
+
+## 10. Geographic Coverage
+
+$countries
+
+## 11. Temporal Coverage
+
+$temporal
+
+## 12. Opportunity Analysis
+
+$categories
+
+## 13. Application Status Distribution
+
+$statuses
+
+## 14. Production Readiness Certification
+
+$certification
+""")
+
+def _table(header, rows):
+    lines = ['| ' + ' | '.join(header) + ' |', '|' + '|'.join('---' for _ in header) + '|']
+    lines += ['| ' + ' | '.join(str(v) for v in row) + ' |' for row in rows]
+    return '\n'.join(lines)
+
+def _est(value, hw, **kwargs):
+    return format_estimate(value, hw, **kwargs)
+
+def _share_rows(rows, n_rows, missing_label=None, bars=False):
+    out = []
+    for value, count, hw in rows:
+        pct = count / n_rows * 100
+        label = missing_label if value is None and missing_label else value
+        row = [label, _est(count, hw), f'{pct:.1f}%']
+        if bars:
+            row.append('█' * int(pct / 2))
+        out.append(row)
+    return out
+
+def _render_overview(s, file_size):
+    return _table(['Metric', 'Value'], [
+        ['Total Records', f"{s['n_rows']:,}"], ['Total Columns', s['n_columns']],
+        ['Total Cells', f"{s['total_cells']:,}"], ['Null Cells', _est(s['null_cells'], s['null_cells_hw'])],
+        ['Data Completeness', f"{s['completeness']:.2f}%"], ['File Size', file_size]])
+
+def _render_columns(s):
+    rows = []
+    for r in s['rows']:
+        if 'unique' in r:
+            stats = f"Unique: {r['unique']}"
+        else:
+            stats = f"Range: {r['min']:.0f}-{r['max']:.0f} · Mean: {r['mean']:.2f}"
+        rows.append([f"`{r['column']}`", r['dtype'], f"{r['null_pct']:.1f}%", stats])
+    return _table(['Column', 'Type', 'Null', 'Values'], rows)
+
+def _render_lag(s, n_rows):
+    # preview: quantiles and std are weighted estimates without an interval, min/max the sample's
+    est, in_sample = (' (est.)', ' (in sample)') if s.get('estimated') else ('', '')
+    return _table(['Metric', 'Value'], [
+        ['Valid Values', f"{_est(s['valid'], s['valid_hw'])} ({s['valid'] / n_rows * 100:.1f}%)"],
+        ['Missing Values', f"{_est(s['missing'], s['missing_hw'])} ({s['missing'] / n_rows * 100:.1f}%)"],
+        ['Negative Values', f"{_est(s['negative'], s['negative_hw'], grouping=False)} "
+                            + ('(✓ Fixed)' if s['negative_rows'] == 0 else '(✗ Remaining)')],
+        [f'Range{in_sample}', f"{s['min']:.0f} to {s['max']:.0f} days"],
+        ['Mean', f"{_est(s['mean'], s['mean_hw'], decimals=2, grouping=False)} days"],
+        [f'Median{est}', f"{s['median']:.2f} days"],
+        [f'Std Dev{est}', f"{s['std']:.2f} days"],
+        [f'Percentiles{est}', f"P25 {s['p25']:.0f} · P75 {s['p75']:.0f} · P90 {s['p90']:.0f} days"]])
+
+def _render_quality(s):
+    placeholders = ('✓ None found' if s['placeholder_columns'] == 0
+                    else f"{s['placeholder_columns']} columns")
+    return _table(['Check', 'Result'], [
+        ['Duplicate Rows', '0 (✓ Zero duplicates)' if s['duplicates'] == 0 else f"{s['duplicates']} (✗ duplicates present)"],
+        ['Data Types Validated', '✓ All correct'],
+        ['Placeholder Strings ("nan", "NaN", "N/A")', placeholders]])
+
+def _render_inversions(s, n_rows):
+    return _table(['Metric', 'Value'], [
+        ['Records Flagged (apply_date < signup_date)',
+         f"{_est(s['flagged'], s['flagged_hw'])} ({s['flagged'] / n_rows * 100:.2f}%)"],
+        ['Unflagged Records', _est(s['unflagged'], s['unflagged_hw'])],
+        ['Action Taken', 'Converted to NaN with flag indicator']])
+
+def _validation_checks(sections, n_rows):
+    overview, quality, lag = sections['overview'], sections['quality'], sections['lag']
+    checks = [('All data types correct', overview['n_columns'] > 25, overview['n_columns']),
+              ('Completeness ≥90%', overview['completeness'] >= 90, f"{overview['completeness']:.1f}%"),
+              ('Records intact', n_rows == EXPECTED_RECORDS, n_rows)]
+    if quality is not None:
+        checks.insert(0, ('No duplicate rows', quality['duplicates'] == 0, quality['duplicates']))
+    if lag is not None:
+        checks.insert(1, ('No negative lags', lag['negative_rows'] == 0, lag['negative_rows']))
+    return checks
+
+def _render_missing(overview, n_rows):
+    counts = pd.Series(overview['null_counts'], dtype='int64').sort_values(ascending=False)
+    rows = [[f'`{c}`', _est(n, overview['null_hw'].get(c)), f'{n / n_rows * 100:.1f}%']
+            for c, n in counts[counts > 0].items()]
+    return _table(['Column', 'Missing', 'Share'], rows) if rows else '✓ No missing values'
+
+def _render_temporal(sections):
+    rows = []
+    for key, label in (('signups', 'Signup'), ('applies', 'Apply')):
+        t = sections[key]
+        if t is not None:
+            rows.append([label, f"{t['first']} to {t['last']}", _est(t['count'], t['count_hw'])])
+    return _table(['Date', 'Range', 'Records'], rows) if rows else '_Not available: no signup or apply dates._'
+
+def _certification_line(name, ok, detail, overview, n_rows):
+    """Certification wording for one validation check."""
+    text = {
+        'No duplicate rows': ('Zero duplicate records (100% unique)', f'Duplicate records: {detail}'),
+        'No negative lags': ('No negative engagement lags remain', f'Negative engagement lags remaining: {detail}'),
+        'All data types correct': ('All data types validated and standardized',
+                                   f'Only {detail} columns; the production schema has more than 25'),
+        'Completeness ≥90%': (f"Data completeness: {overview['completeness']:.2f}% (meets 90% target)",
+                              f"Data completeness: {overview['completeness']:.2f}% (below 90% target)"),
+        'Records intact': (f'No data loss (all {n_rows:,} records preserved)',
+                           f'{n_rows:,} records, expected {EXPECTED_RECORDS:,}'),
+    }[name]
+    return f"- ✓ {text[0]}" if ok else f"- ✗ {text[1]}"
+
+def _render_certification(sections, n_rows, checks):
+    """Status and details follow the validation checks of section 8."""
+    overview, quality = sections['overview'], sections['quality']
+    failed = [name for name, ok, _ in checks if not ok]
+    status = ('✓ PRODUCTION-READY' if not failed
+              else f"✗ NOT CERTIFIED ({len(failed)} of {len(checks)} validation checks failed: {', '.join(failed)})")
+    lines = [f'**Dataset Status**: {status}', '', '**Certification Details:**']
+    lines += [_certification_line(name, ok, detail, overview, n_rows) for name, ok, detail in checks]
+    if quality is not None:
+        lines.append('- ✓ All placeholder strings removed or converted to NA' if quality['placeholder_columns'] == 0
+                     else f"- ✗ Placeholder strings remain in {quality['placeholder_columns']} columns")
+    if sections['inversions'] is not None:
+        lines.append('- ✓ All anomalies flagged with binary indicators')
+    if failed:
+        lines += ['', '**Not approved** for downstream use until the failed checks are resolved.']
+    else:
+        lines += ['', '**Approved for:**',
+                  '- ✓ Week 2 Exploratory Data Analysis (EDA)', '- ✓ Statistical Analysis & Visualization',
+                  '- ✓ Feature Engineering & Predictive Modeling', '- ✓ Stakeholder Reporting']
+    return '\n'.join(lines)
+
+def render_report(sections, columns, source, file_size, preview=''):
+    """Fill REPORT_TEMPLATE from the section results (None = section's columns absent)."""
+    n_rows = sections['overview']['n_rows']
+    def part(key, render, *args):
+        s = sections[key]
+        if s is None:
+            return f"_Not available: the dataset lacks {', '.join(f'`{c}`' for c in SECTIONS[key][0])}._"
+        return render(s, *args)
+    checks = _validation_checks(sections, n_rows)
+    features = [f'- ✓ `{f}`' for f in ENGINEERED_FEATURES if f in columns]
+    return REPORT_TEMPLATE.substitute(
+        source=source, file_size=file_size, generated=datetime.now().strftime('%Y-%m-%d %H:%M'),
+        preview=f'\n> {preview}\n' if preview else '',
+        overview=_render_overview(sections['overview'], file_size),
+        columns=part('columns', _render_columns),
+        lag=part('lag', _render_lag, n_rows),
+        buckets=part('buckets', lambda s: _table(['Bucket', 'Records', 'Share', ''], _share_rows(
+            s['rows'], n_rows, missing_label='NaN (Missing)', bars=True))),
+        quality=part('quality', _render_quality),
+        inversions=part('inversions', _render_inversions, n_rows),
+        features='\n'.join(features) or '_None of the engineered features are present._',
+        validation=_table(['Check', 'Status', 'Detail'],
+                          [[name, '✓ PASS' if ok else '✗ FAIL', detail] for name, ok, detail in checks]),
+        missing=_render_missing(sections['overview'], n_rows),
+        countries=part('countries', lambda s: f"Total Countries: {s['unique']}\n\n**Top 10 Countries by Record Count:**\n\n"
+                       + _table(['Country', 'Records', 'Share'], _share_rows(s['top'], n_rows))),
+        temporal=_render_temporal(sections),
+        categories=part('categories', lambda s: f"Unique Opportunities: {s['opportunities']}\n\n"
+                        + _table(['Category', 'Records', 'Share'], _share_rows(s['rows'], n_rows))),
+        statuses=part('statuses', lambda s: _table(['Status', 'Records', 'Share'], _share_rows(s['rows'], n_rows))),
+        certification=_render_certification(sections, n_rows, checks),
+    )
+
+def _file_size(path):
+    size = os.path.getsize(path)
+    return f'{size / 2**20:.1f} MB' if size >= 2**20 else f'{size / 2**10:.1f} KB'
+
+# -----------------------
+# Entry point
+# -----------------------
+def generate_report(input_csv=INPUT, sample_fraction=None, seed=0, out_md=REPORT_MD,
+                    cache_file=REPORT_CACHE, max_workers=None):
+    """
+    Render the final production-readiness report for the dataset at input_csv to out_md
+    (and print it). Sections whose input columns are unchanged since the last run come
+    from cache_file (None disables the cache).
+    sample_fraction: preview on a stratified sample (see sampling.py); counts become
+    population estimates printed with their 95% interval half-width.
+    """
+    t0 = time.perf_counter()
+    # Load the final production-ready dataset (or a stratified sample of it)
+    if sample_fraction:
+        est = stratified_sample_csv(input_csv, sample_fraction, seed=seed)
+        df = est.df
+        mode = f'sample:{sample_fraction}:{seed}'
+    else:
+        df = pd.read_csv(input_csv)
+        est = ExactCounts(df)
+        mode = 'full'
+
+    hashes = ColumnHashes(df)
+    cache = _load_cache(cache_file)
+    sections, keys, todo = {}, {}, []
+    for key, (columns, _) in SECTIONS.items():
+        columns = list(df.columns) if columns is None else columns
+        if any(c not in df.columns for c in columns):
+            sections[key] = None
+            continue
+        keys[key] = section_hash(key, columns, hashes, est, mode)
+        entry = cache.get(key)
+        if entry is not None and entry.get('hash') == keys[key]:
+            sections[key] = entry['data']
+        else:
+            todo.append(key)
+    computed = compute_sections(todo, df, est, max_workers) if todo else {}
+    sections.update(computed)
+
+    report = render_report(sections, list(df.columns), os.path.basename(input_csv), _file_size(input_csv),
+                           preview=est.describe() if est.is_sample else '')
+    with atomic_output(out_md) as tmp:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(report)
+    if cache_file and computed:
+        cache.update({key: {'hash': keys[key], 'data': computed[key]} for key in computed})
+        write_json_atomic(cache_file, cache)
+    print(report)
+    print(f'Report written to {out_md}: {len(computed)} sections computed, '
+          f'{len(keys) - len(computed)} from cache ({time.perf_counter() - t0:.2f}s)')
+    return report
+
+
+if __name__ == "__main__":
+    generate_report()
@@ -0,0 +1,132 @@
+# ingest.py
+# Concurrent ingestion of many SLU export files (monthly / regional workbooks or CSVs).
+#
+# - Files are read in parallel: a process pool by default (XLSX parsing is CPU-bound
+#   Python), or a thread pool for CSV-only batches.
+# - Column names are resolved once per distinct header signature: header_mapping() is
+#   cached on the tuple of raw column names, so a hundred files sharing a header cost
+#   one round of name normalization instead of one per file per column.
+# - Exact (case/punctuation-insensitive) name matches are resolved before a
+#   containment fallback for the canonical names still missing; two headers that end
+#   on the same name are an error rather than one of them being dropped.
+# - Frames are renamed to the canonical snake_case schema, unified (missing columns
+#   become NA, unknown extra columns are kept at the end) and concatenated with a
+#   source_file column and a global raw_row_id (see lineage.py).
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+import pandas as pd
+
+from data2 import _normalize_col_key, normalize_column_names
+from lineage import RAW_ROW_ID
+from writers import write_csv
+
+SOURCE_FILE = 'source_file'
+EXPORT_PATTERNS = ('*.xlsx', '*.xls', '*.csv')
+
+# canonical (normalize_column_names) form of the SLU export header
+CANONICAL_COLUMNS = [
+    'learner_signup_datetime', 'opportunity_id', 'opportunity_name', 'opportunity_category',
+    'opportunity_end_date', 'first_name', 'date_of_birth', 'gender', 'country', 'institution_name',
+    'current_intended_major', 'entry_created_at', 'status_description', 'status_code', 'apply_date',
+    'opportunity_start_date',
+]
+
+_CANONICAL_BY_KEY = {_normalize_col_key(c): c for c in CANONICAL_COLUMNS}
+# fuzzy fallback: a header key may be shorter than the canonical key it stands for only
+# down to this share of its length ('signup_datetime' -> learner_signup_datetime, but
+# not 'Name' -> opportunity_name or 'Id' -> opportunity_id)
+MIN_PARTIAL_SHARE = 0.5
+
+def _fuzzy_match(key, ckey):
+    if not key:
+        return False
+    return ckey in key or (key in ckey and len(key) >= MIN_PARTIAL_SHARE * len(ckey))
+
+@lru_cache(maxsize=None)
+def header_mapping(header):
+    """
+    Map a raw header (tuple of column names) to canonical names, cached per signature.
+    Exact matches on data2._normalize_col_key come first. Canonical names still
+    unmatched then take the one remaining header that contains their key (or is a long
+    enough part of it), when exactly one does. Anything else keeps its snake_case name
+    (data2.normalize_column_names). ValueError when two headers end on the same name.
+    """
+    keys = [_normalize_col_key(name) for name in header]
+    out = list(normalize_column_names(pd.DataFrame(columns=[str(c) for c in header])).columns)
+    matched = {}
+    for i, key in enumerate(keys):
+        canonical = _CANONICAL_BY_KEY.get(key)
+        if canonical is not None:
+            out[i] = canonical
+            matched.setdefault(canonical, i)
+    free = [i for i, key in enumerate(keys) if key not in _CANONICAL_BY_KEY]
+    for ckey, canonical in _CANONICAL_BY_KEY.items():
+        if canonical in matched:
+            continue
+        candidates = [i for i in free if _fuzzy_match(keys[i], ckey)]
+        # a header that fits several canonical names is ambiguous and left alone
+        if len(candidates) == 1 and sum(_fuzzy_match(keys[candidates[0]], k) for k in _CANONICAL_BY_KEY) == 1:
+            out[candidates[0]] = canonical
+            matched[canonical] = candidates[0]
+            free.remove(candidates[0])
+    seen = {}
+    for name, target in zip(header, out):
+        if target in seen:
+            raise ValueError(f"Columns '{seen[target]}' and '{name}' both map to '{target}'")
+        seen[target] = name
+    return tuple(out)
+
+def read_export(path):
+    """Read one export file with every value kept as object (no type guessing)."""
+    if path.lower().endswith('.csv'):
+        return pd.read_csv(path, dtype=object)
+    return pd.read_excel(path, dtype=object)
+
+def list_exports(input_dir, patterns=EXPORT_PATTERNS):
+    paths = []
+    for pattern in patterns:
+        paths.extend(glob.glob(os.path.join(input_dir, pattern)))
+    return sorted(p for p in paths if not os.path.basename(p).startswith('~$'))
+
+def unify_frames(frames, sources):
+    """Rename each frame via its cached header mapping and concatenate on one schema."""
+    renamed = []
+    extra = []
+    for df, src in zip(frames, sources):
+        df = df.copy(deep=False)
+        df.columns = header_mapping(tuple(df.columns))
+        # ids are global to this ingest; ids carried in from earlier runs are renumbered
+        df = df.drop(columns=[RAW_ROW_ID, SOURCE_FILE], errors='ignore')
+        df[SOURCE_FILE] = os.path.basename(src)
+        extra.extend(c for c in df.columns if c not in CANONICAL_COLUMNS and c != SOURCE_FILE and c not in extra)
+        renamed.append(df)
+    columns = CANONICAL_COLUMNS + extra + [SOURCE_FILE]
+    combined = pd.concat([df.reindex(columns=columns) for df in renamed], ignore_index=True) if renamed \
+        else pd.DataFrame(columns=columns)
+    combined.insert(0, RAW_ROW_ID, pd.RangeIndex(len(combined)).to_numpy().astype('int32'))
+    return combined
+
+def ingest_files(paths, max_workers=None, executor='process'):
+    """Read paths concurrently and return one unified raw frame (file order preserved)."""
+    paths = list(paths)
+    if not paths:
+        raise FileNotFoundError("No export files to ingest")
+    pool_cls = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    workers = max_workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1 or len(paths) == 1:
+        frames = [read_export(p) for p in paths]
+    else:
+        with pool_cls(max_workers=workers) as pool:
+            frames = list(pool.map(read_export, paths))
+    return unify_frames(frames, paths)
+
+def ingest_to_csv(paths, out_csv, max_workers=None, executor='process'):
+    combined = ingest_files(paths, max_workers=max_workers, executor=executor)
+    write_csv(combined, out_csv, index=False)
+    n_sigs = header_mapping.cache_info().currsize
+    print(f'Ingested {len(paths)} files ({n_sigs} distinct header signatures) -> {len(combined)} rows in {out_csv}')
+    return combined
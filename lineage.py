@@ -0,0 +1,102 @@
+# lineage.py
+# Row lineage from the raw SLU export to every downstream dataset.
+#
+# Each raw row gets an int32 `raw_row_id` (its position in the raw export) when it is
+# loaded. Stages carry the column through unchanged, so after any filtering or
+# reordering the raw record behind a row is raw_df.iloc[raw_row_id] -- an O(1)
+# positional take instead of a positional guess or a rescan.
+#
+# Each stage output's mapping (row position -> raw_row_id) is also persisted as a flat
+# int32 .npy file next to the CSV (lineage_path_for); LineageIndex memory-maps it and
+# builds the inverse (raw_row_id -> row, -1 if the raw row was dropped) on demand.
+# Audit store entries carry the raw_row_id as well (audit_store.raw_row_history).
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import atomic_output
+
+RAW_ROW_ID = 'raw_row_id'
+MISSING = -1
+
+def assign_raw_row_ids(raw_df):
+    """Return raw_df with a raw_row_id column (0..n-1); existing ids are kept."""
+    if RAW_ROW_ID in raw_df.columns:
+        return raw_df
+    raw_df = raw_df.copy()
+    raw_df.insert(0, RAW_ROW_ID, np.arange(len(raw_df), dtype=np.int32))
+    return raw_df
+
+def has_lineage(df):
+    return RAW_ROW_ID in df.columns
+
+def raw_ids(df):
+    """raw_row_id column as an int32 array (MISSING where absent)."""
+    return df[RAW_ROW_ID].fillna(MISSING).to_numpy(dtype=np.int32)
+
+def raw_id_lookup(df):
+    """idx -> raw_row_id of df's row with that index label (MISSING without lineage)."""
+    if not has_lineage(df):
+        return lambda idx: MISSING
+    ids = dict(zip(df.index, raw_ids(df).tolist()))
+    return lambda idx: ids.get(idx, MISSING)
+
+def align_raw(raw_df, df, column=None):
+    """
+    Raw rows (or one raw column) aligned to df's rows by raw_row_id, indexed like df.
+    raw_df may be in any order if it carries raw_row_id, otherwise it must be the raw
+    export in its original order. Rows of df without a raw match come back as NaN
+    (column) or are dropped (whole frame).
+    """
+    ids = raw_ids(df)
+    if has_lineage(raw_df):
+        pos = pd.Index(raw_ids(raw_df)).get_indexer(ids)
+    else:
+        pos = np.where(ids < len(raw_df), ids, MISSING)
+    missing = pos < 0
+    source = raw_df[column] if column is not None else raw_df
+    out = source.iloc[np.where(missing, 0, pos)]
+    out.index = df.index
+    if missing.any():
+        out = out.mask(missing) if column is not None else out[~missing]
+    return out
+
+# -----------------------
+# Persisted mapping
+# -----------------------
+def lineage_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + '_lineage.npy'
+
+def save_lineage(df, path):
+    """Persist final row position -> raw_row_id as a flat int32 array."""
+    with atomic_output(path) as tmp:
+        np.save(tmp, raw_ids(df))
+    return path
+
+class LineageIndex:
+    def __init__(self, path):
+        self.path = path
+        self.raw_ids = np.load(path, mmap_mode='r')
+        self._inverse = None
+
+    def __len__(self):
+        return len(self.raw_ids)
+
+    def raw_row(self, final_row):
+        """raw_row_id behind a final dataset row."""
+        return int(self.raw_ids[final_row])
+
+    def final_row(self, raw_row_id):
+        """Final dataset row for a raw row, or MISSING if it was dropped."""
+        if self._inverse is None:
+            valid = self.raw_ids[self.raw_ids >= 0]
+            size = int(valid.max()) + 1 if len(valid) else 0
+            inverse = np.full(size, MISSING, dtype=np.int32)
+            positions = np.flatnonzero(np.asarray(self.raw_ids) >= 0).astype(np.int32)
+            inverse[valid] = positions
+            self._inverse = inverse
+        if raw_row_id < 0 or raw_row_id >= len(self._inverse):
+            return MISSING
+        return int(self._inverse[raw_row_id])
@@ -0,0 +1,114 @@
+# metrics.py
+# Machine-readable run metrics.
+#
+# RunMetrics collects per-stage rows, wall time, rows/sec and peak RSS plus data-quality
+# gauges (cells recovered, fixes per column, rule violations) and writes them twice:
+#   <metrics_dir>/week1_<job>.prom    - Prometheus text exposition format for the node
+#                                       exporter textfile collector; one file per job
+#                                       (pipeline subcommand), replaced via temp file +
+#                                       rename as the collector requires. Series are
+#                                       labelled by command (Prometheus reserves `job`);
+#                                       the run id stays out of the labels to keep
+#                                       series stable.
+#   <metrics_dir>/run-<run_id>.jsonl  - one JSON object per sample, one file per run,
+#                                       with the same `command` label and metric names
+# Stages take an optional `metrics` argument (None = no metrics), like audit_store.
+
+import json
+import os
+import sys
+import time
+
+from audit_store import new_run_id
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+METRICS_DIR = 'metrics'
+PREFIX = 'week1'
+
+HELP = {
+    'stage_rows': ('gauge', 'Rows processed by the stage'),
+    'stage_duration_seconds': ('gauge', 'Wall-clock duration of the stage'),
+    'stage_rows_per_second': ('gauge', 'Stage throughput'),
+    'stage_peak_memory_bytes': ('gauge', 'Peak resident set size of the process at the end of the stage'),
+    'cells_recovered': ('gauge', 'Missing cells filled by the stage'),
+    'fixes': ('gauge', 'Values changed by the stage, per column'),
+    'rule_violations': ('gauge', 'Rows violating each validation rule'),
+    'quality_metric': ('gauge', 'Summary metrics from the validation report'),
+    'run_success': ('gauge', '1 if the run finished without error'),
+    'run_timestamp_seconds': ('gauge', 'Unix time the run finished'),
+}
+
+def peak_memory_bytes():
+    """Peak RSS of this process (None where the resource module is unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # macOS reports bytes, Linux KiB
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+class RunMetrics:
+    def __init__(self, job='pipeline', run_id=None, metrics_dir=METRICS_DIR):
+        self.job = job
+        self.run_id = run_id or new_run_id()
+        self.metrics_dir = metrics_dir
+        self.samples = []          # (name, labels, value)
+        self._started = {}
+
+    def set(self, name, value, **labels):
+        if value is not None:
+            self.samples.append((name, labels, float(value)))
+
+    def start_stage(self, stage):
+        self._started[stage] = time.perf_counter()
+
+    def end_stage(self, stage, rows):
+        seconds = time.perf_counter() - self._started.pop(stage)
+        self.set('stage_rows', rows, stage=stage)
+        self.set('stage_duration_seconds', seconds, stage=stage)
+        self.set('stage_rows_per_second', rows / seconds if seconds > 0 else None, stage=stage)
+        self.set('stage_peak_memory_bytes', peak_memory_bytes(), stage=stage)
+
+    # -----------------------
+    # Output
+    # -----------------------
+    def to_prometheus(self):
+        lines = []
+        seen = set()
+        for name, labels, value in self.samples:
+            full = f'{PREFIX}_{name}'
+            if name not in seen:
+                kind, text = HELP.get(name, ('gauge', name))
+                lines.append(f'# HELP {full} {text}')
+                lines.append(f'# TYPE {full} {kind}')
+                seen.add(name)
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in sorted({'command': self.job, **labels}.items()))
+            lines.append(f'{full}{{{label_text}}} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, success=True):
+        """Write the .prom file and this run's JSON lines; returns their paths."""
+        self.set('run_success', 1 if success else 0)
+        self.set('run_timestamp_seconds', time.time())
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        # group samples of one metric together, as the exposition format expects
+        self.samples.sort(key=lambda s: list(HELP).index(s[0]) if s[0] in HELP else len(HELP))
+        prom_path = os.path.join(self.metrics_dir, f'{PREFIX}_{self.job}.prom')
+        # the collector reads every *.prom, so the temp file must not end in .prom
+        tmp = f'{prom_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, prom_path)
+        jsonl_path = os.path.join(self.metrics_dir, f'run-{self.run_id}.jsonl')
+        now = time.time()
+        with open(jsonl_path, 'w') as f:
+            for name, labels, value in self.samples:
+                f.write(json.dumps({'run_id': self.run_id, 'command': self.job, 'ts': now, 'metric': f'{PREFIX}_{name}',
+                                    'labels': labels, 'value': value}) + '\n')
+        print(f'Metrics written: {prom_path}, {jsonl_path}')
+        return prom_path, jsonl_path
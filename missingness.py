@@ -0,0 +1,95 @@
+# missingness.py
+# Per-stage missingness snapshots stored as packed null bitmaps.
+#
+# snapshot() keeps one np.packbits(isna) array per column (1 bit per cell, i.e.
+# n_rows / 8 bytes per column) plus the per-column null counts. Any two snapshots
+# of the same rows can then be diffed for per-column and per-row "cells recovered"
+# without re-reading the input or holding a second copy of the frame.
+
+import numpy as np
+import pandas as pd
+
+def _popcount(packed):
+    return int(np.unpackbits(packed).sum())
+
+class MissingnessSnapshot:
+    def __init__(self, stage, df):
+        self.stage = stage
+        self.n_rows = len(df)
+        self.columns = list(df.columns)
+        self.bitmaps = {}
+        self.null_counts = {}
+        for c in self.columns:
+            mask = df[c].isna().to_numpy()
+            self.bitmaps[c] = np.packbits(mask)
+            self.null_counts[c] = int(mask.sum())
+
+    @property
+    def total_cells(self):
+        return self.n_rows * len(self.columns)
+
+    @property
+    def total_nulls(self):
+        return sum(self.null_counts.values())
+
+    def null_mask(self, column):
+        return np.unpackbits(self.bitmaps[column], count=self.n_rows).astype(bool)
+
+    def nbytes(self):
+        return sum(b.nbytes for b in self.bitmaps.values())
+
+    def counts(self):
+        return pd.Series(self.null_counts, name=self.stage, dtype='int64')
+
+class MissingnessTracker:
+    """Collects named snapshots in pipeline order; stages are diffed by name."""
+    def __init__(self):
+        self.snapshots = {}
+
+    def snapshot(self, stage, df):
+        snap = MissingnessSnapshot(stage, df)
+        self.snapshots[stage] = snap
+        return snap
+
+    def __getitem__(self, stage):
+        return self.snapshots[stage]
+
+    def stages(self):
+        return list(self.snapshots)
+
+    def diff(self, before, after):
+        """
+        Per-column comparison of two stages: nulls before/after, cells recovered
+        (null -> value) and cells lost (value -> null). Columns present in only one
+        stage are reported with the other side as NaN.
+        """
+        a, b = self.snapshots[before], self.snapshots[after]
+        if a.n_rows != b.n_rows:
+            raise ValueError(f"Stages '{before}' ({a.n_rows} rows) and '{after}' ({b.n_rows} rows) are not row-aligned")
+        rows = []
+        for c in a.columns + [c for c in b.columns if c not in a.bitmaps]:
+            in_a, in_b = c in a.bitmaps, c in b.bitmaps
+            recovered = lost = np.nan
+            if in_a and in_b:
+                # bitwise ops directly on the packed bytes
+                recovered = _popcount(a.bitmaps[c] & ~b.bitmaps[c])
+                lost = _popcount(~a.bitmaps[c] & b.bitmaps[c])
+            rows.append({
+                'column': c,
+                'before': a.null_counts[c] if in_a else np.nan,
+                'after': b.null_counts[c] if in_b else np.nan,
+                'recovered': recovered,
+                'lost': lost,
+            })
+        return pd.DataFrame(rows).set_index('column')
+
+    def rows_recovered(self, before, after):
+        """Number of cells recovered per row between two stages (int array, row-aligned)."""
+        a, b = self.snapshots[before], self.snapshots[after]
+        if a.n_rows != b.n_rows:
+            raise ValueError(f"Stages '{before}' and '{after}' are not row-aligned")
+        per_row = np.zeros(a.n_rows, dtype=np.int32)
+        for c in a.columns:
+            if c in b.bitmaps:
+                per_row += np.unpackbits(a.bitmaps[c] & ~b.bitmaps[c], count=a.n_rows)
+        return per_row
@@ -0,0 +1,390 @@
+# pipeline.py
+# Single command-line entry point for the Week 1 cleaning pipeline.
+# Run: python pipeline.py <subcommand> [options]     (python pipeline.py --help)
+#
+# Subcommands map onto the individual scripts:
+#   clean    -> data2.run_full_finalization
+#   fix      -> fix_issues.run_fixes
+#   impute   -> apply_hybrid_imputation.run_imputation
+#   diagnose -> comprehensive_diagnostics.run_diagnostics
+#   report   -> generate_final_report.generate_report (Markdown, per-section cache)
+#   test     -> data2.run_unit_tests
+#   audit    -> audit_store.AuditStore queries (row history / per-stage summary)
+#   warehouse-> warehouse.export_csv_to_warehouse (indexed SQLite star layout)
+#   features -> features.export_csv_to_features (float32 dense + CSR one-hot .npy matrix)
+#   ingest   -> ingest.ingest_to_csv (many export files -> one unified raw CSV)
+#   star     -> star_schema.write_star (opportunity dimension + applications fact CSVs)
+#   chain    -> clean, fix, impute in order with checkpoints (checkpoint.run_chain);
+#               a restarted chain resumes after the last completed stage
+#   watch    -> watch.Watcher (poll a directory, fold new exports into a live dataset)
+#
+# Only the standard library is imported at module load. Each stage module (and with
+# it pandas / matplotlib) is imported inside its handler, so `--help` stays instant.
+# Path options default to None, meaning "use the stage module's own default".
+# --pipelined (clean, fix, impute, chain) overlaps reading, cleaning and writing in
+# background threads with bounded chunk queues (prefetch.py).
+
+import argparse
+import os
+import sys
+
+
+def _kwargs(args, mapping):
+    """Translate CLI attribute names to stage keyword args, dropping unset options."""
+    out = {}
+    for attr, kw in mapping.items():
+        value = getattr(args, attr)
+        if value is not None:
+            out[kw] = value
+    return out
+
+def _audit_store(args):
+    """AuditStore for --audit-db, or None when the option was not given."""
+    if getattr(args, 'audit_db', None) is None:
+        return None
+    from audit_store import AuditStore
+    return AuditStore(args.audit_db, run_id=args.run_id)
+
+# -----------------------
+# Subcommand handlers (lazy imports)
+# -----------------------
+def cmd_clean(args):
+    import data2
+    store = _audit_store(args)
+    try:
+        data2.run_full_finalization(audit_store=store, metrics=args.metrics, **_kwargs(args, {
+            'raw': 'input_file', 'cleaned': 'cleaned_file', 'audit': 'audit_file',
+            'output': 'final_csv', 'output_xlsx': 'final_xlsx', 'backend': 'backend',
+        }), pipelined=args.pipelined)
+    finally:
+        if store is not None:
+            store.close()
+
+def cmd_fix(args):
+    import fix_issues
+    store = _audit_store(args)
+    try:
+        df = fix_issues.run_fixes(audit_store=store, day_resolution=args.day_resolution, metrics=args.metrics,
+                                 projection=not args.star, **_pipelined_kwargs(args),
+                                 **_kwargs(args, {'input': 'in_csv', 'output': 'out_csv', 'audit': 'audit_out'}))
+    finally:
+        if store is not None:
+            store.close()
+    if args.star:
+        _write_star(df, args.output or fix_issues.OUT_CSV)
+
+def cmd_impute(args):
+    import apply_hybrid_imputation
+    store = _audit_store(args)
+    try:
+        df = apply_hybrid_imputation.run_imputation(audit_store=store, day_resolution=args.day_resolution,
+                                                    metrics=args.metrics, projection=not args.star,
+                                                    **_pipelined_kwargs(args), **_kwargs(args, {
+            'input': 'in_csv', 'output': 'out_csv', 'audit': 'audit_out',
+        }))
+    finally:
+        if store is not None:
+            store.close()
+    if args.star:
+        _write_star(df, args.output or apply_hybrid_imputation.OUT_CSV)
+
+def cmd_diagnose(args):
+    import comprehensive_diagnostics
+    comprehensive_diagnostics.run_diagnostics(no_plots=args.no_plots, sample_fraction=args.sample, seed=args.seed,
+                                              metrics=args.metrics, **_kwargs(args, {
+        'input': 'input_csv', 'output': 'out_final', 'report': 'out_report', 'outliers': 'out_outliers',
+    }))
+
+def cmd_report(args):
+    import generate_final_report
+    kwargs = _kwargs(args, {'input': 'input_csv', 'output': 'out_md', 'workers': 'max_workers'})
+    if args.no_cache:
+        kwargs['cache_file'] = None
+    generate_final_report.generate_report(sample_fraction=args.sample, seed=args.seed, **kwargs)
+
+def cmd_test(args):
+    import data2
+    data2.run_unit_tests()
+
+def cmd_audit(args):
+    from audit_store import AuditStore
+    if not os.path.exists(args.db):
+        raise SystemExit(f"Audit store '{args.db}' not found")
+    with AuditStore(args.db) as store:
+        if args.dataset is not None:
+            # rows of a stage output resolve to their raw record through its lineage file
+            from lineage import MISSING, LineageIndex, lineage_path_for
+            index = LineageIndex(lineage_path_for(args.dataset))
+            if args.row is not None:
+                args.raw_row = index.raw_row(args.row)
+                print(f"Row {args.row} of {args.dataset} is raw row {args.raw_row}")
+            elif args.raw_row is not None:
+                final_row = index.final_row(args.raw_row)
+                print(f"Raw row {args.raw_row} is " + (f"row {final_row} of {args.dataset}" if final_row != MISSING
+                                                       else f"not in {args.dataset}"))
+            else:
+                raise SystemExit("audit: --dataset needs --row or --raw-row")
+        if args.raw_row is not None:
+            out = store.raw_row_history(args.raw_row, args.column)
+            out = out.drop(columns=['old_type', 'new_type'])
+        elif args.row is not None:
+            out = store.row_history(args.row, args.column)
+            out = out.drop(columns=['old_type', 'new_type'])
+        elif args.runs:
+            out = store.runs()
+        else:
+            out = store.stage_summary(args.run_id)
+    print(out.to_string(index=False) if not out.empty else "No audit entries found")
+
+def cmd_warehouse(args):
+    import warehouse
+    warehouse.export_csv_to_warehouse(**_kwargs(args, {'input': 'input_csv', 'db': 'db_path'}))
+
+def cmd_features(args):
+    import features
+    features.export_csv_to_features(**_kwargs(args, {'input': 'input_csv', 'output_dir': 'out_dir'}))
+
+def _write_star(df, out_csv):
+    import star_schema
+    star_schema.write_star(df, star_schema.star_base_for(out_csv))
+
+def cmd_star(args):
+    import pandas as pd
+    import star_schema
+    from data2 import AuditCollector
+    audit = AuditCollector() if args.audit else None
+    star_schema.write_star(pd.read_csv(args.input), args.output_base or star_schema.star_base_for(args.input), audit=audit)
+    if audit is not None:
+        audit.to_df().reindex(columns=['row_index', 'column', 'old_value', 'new_value']).to_csv(args.audit, index=False)
+        print(f"Opportunity-level fixes: {len(audit.rows)} row changes -> {args.audit}")
+
+CHAIN_STAGES = ['clean', 'fix', 'impute']
+
+def cmd_chain(args):
+    import apply_hybrid_imputation
+    import data2
+    import fix_issues
+    from checkpoint import CheckpointStore, run_chain
+    from lineage import lineage_path_for
+    store = CheckpointStore(args.checkpoint_dir)
+    if args.fresh:
+        store.clear()
+    stages = [
+        ('clean', [data2.CLEANED_FILE, data2.INPUT_FILE, data2.AUDIT_FILE],
+         [data2.FINAL_CSV, data2.FINAL_XLSX, lineage_path_for(data2.FINAL_CSV)],
+         data2.run_full_finalization, {**({'backend': args.backend} if args.backend else {}),
+                                       **({'pipelined': True} if args.pipelined else {})}),
+        ('fix', [fix_issues.IN_CSV], [fix_issues.OUT_CSV, fix_issues.AUDIT_OUT, lineage_path_for(fix_issues.OUT_CSV)],
+         fix_issues.run_fixes, {'day_resolution': args.day_resolution, **_pipelined_kwargs(args)}),
+        ('impute', [apply_hybrid_imputation.IN_CSV],
+         [apply_hybrid_imputation.OUT_CSV, apply_hybrid_imputation.AUDIT_OUT, lineage_path_for(apply_hybrid_imputation.OUT_CSV)],
+         apply_hybrid_imputation.run_imputation, {'day_resolution': args.day_resolution, **_pipelined_kwargs(args)}),
+    ]
+    if args.rerun_from:
+        for name in CHAIN_STAGES[CHAIN_STAGES.index(args.rerun_from):]:
+            store.invalidate(name)
+    run_chain(stages, store, extra_kwargs={'metrics': args.metrics})
+
+def cmd_watch(args):
+    import watch
+    from watch import WarmState, Watcher
+    out_csv = args.output or watch.OUT_CSV
+    state = WarmState(backend=args.backend) if args.reset else WarmState.load(out_csv, backend=args.backend)
+    Watcher(args.input_dir, out_csv, args.report or watch.REPORT_CSV, args.interval, state=state).run(once=args.once)
+
+def cmd_ingest(args):
+    import ingest
+    paths = list(args.files)
+    if args.input_dir:
+        out = os.path.abspath(args.output)
+        paths.extend(p for p in ingest.list_exports(args.input_dir) if os.path.abspath(p) != out)
+    if not paths:
+        raise SystemExit("ingest: give export files and/or --input-dir")
+    ingest.ingest_to_csv(paths, args.output, max_workers=args.workers,
+                         executor='thread' if args.threads else 'process')
+
+# -----------------------
+# Argument parser
+# -----------------------
+def _add_audit_db(p):
+    p.add_argument("--audit-db", help="also append audit entries to this SQLite audit store")
+    p.add_argument("--run-id", help="run id for audit entries (default: generated)")
+
+def _add_metrics(p):
+    p.add_argument("--metrics-dir", help="write run metrics here (Prometheus .prom + per-run JSON lines)")
+
+def _run_metrics(args):
+    """RunMetrics for --metrics-dir (sharing --run-id with the audit store), or None."""
+    if getattr(args, 'metrics_dir', None) is None:
+        return None
+    from metrics import RunMetrics
+    metrics = RunMetrics(job=args.command, run_id=getattr(args, 'run_id', None), metrics_dir=args.metrics_dir)
+    if hasattr(args, 'run_id'):
+        args.run_id = metrics.run_id
+    return metrics
+
+def _add_day_resolution(p):
+    p.add_argument("--day-resolution", action="store_true",
+                   help="hold whole-day date columns as int32 day numbers (same results, less memory)")
+
+def _add_backend(p):
+    p.add_argument("--backend", choices=["pandas", "polars"],
+                   help="engine for the cleaning functions (backends.py; default: $WEEK1_BACKEND or pandas)")
+
+def _add_star(p):
+    p.add_argument("--star", action="store_true",
+                   help="also write the output as an opportunity dimension + applications fact table (star_schema.py)")
+
+def _add_pipelined(p, chunks=True):
+    p.add_argument("--pipelined", action="store_true",
+                   help="overlap reading, cleaning and writing in background threads (prefetch.py)")
+    if chunks:
+        p.add_argument("--chunk-rows", type=int, help="rows per chunk with --pipelined (default: prefetch.CHUNK_ROWS)")
+
+def _pipelined_kwargs(args):
+    """Stage kwargs for --pipelined / --chunk-rows; empty when not pipelined (checkpoint params unchanged)."""
+    if not args.pipelined:
+        return {}
+    if getattr(args, 'star', False):
+        raise SystemExit("--pipelined streams the output and cannot be combined with --star")
+    return {'pipelined': True, **_kwargs(args, {'chunk_rows': 'chunk_rows'})}
+
+def _add_sample(p):
+    p.add_argument("--sample", type=float, metavar="FRACTION",
+                   help="preview on a stratified sample (opportunity_category x signup_year) of this fraction")
+    p.add_argument("--seed", type=int, default=0, help="sampling seed (default: %(default)s)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pipeline.py", description="Week 1 data cleaning pipeline")
+    sub = parser.add_subparsers(dest="command", metavar="<command>")
+    sub.required = True
+
+    p = sub.add_parser("clean", help="finalize the cleaned workbook (data2.py)")
+    p.add_argument("--raw", help="raw SLU export workbook")
+    p.add_argument("--cleaned", help="cleaned intermediate workbook")
+    p.add_argument("--audit", help="cleaning audit log CSV")
+    p.add_argument("--output", help="final CSV")
+    p.add_argument("--output-xlsx", help="final XLSX")
+    _add_audit_db(p)
+    _add_metrics(p)
+    _add_backend(p)
+    _add_pipelined(p, chunks=False)
+    p.set_defaults(func=cmd_clean)
+
+    p = sub.add_parser("fix", help="recompute lag/age and audit fixes (fix_issues.py)")
+    p.add_argument("--input", help="input CSV")
+    p.add_argument("--output", help="fixed CSV")
+    p.add_argument("--audit", help="fixes audit CSV")
+    _add_day_resolution(p)
+    _add_audit_db(p)
+    _add_star(p)
+    _add_pipelined(p)
+    _add_metrics(p)
+    p.set_defaults(func=cmd_fix)
+
+    p = sub.add_parser("impute", help="hybrid imputation (apply_hybrid_imputation.py)")
+    p.add_argument("--input", help="input CSV")
+    p.add_argument("--output", help="imputed CSV")
+    p.add_argument("--audit", help="imputation audit CSV")
+    _add_day_resolution(p)
+    _add_audit_db(p)
+    _add_star(p)
+    _add_pipelined(p)
+    _add_metrics(p)
+    p.set_defaults(func=cmd_impute)
+
+    p = sub.add_parser("diagnose", help="diagnostics, outliers and plots (comprehensive_diagnostics.py)")
+    p.add_argument("--input", help="dataset with flags")
+    p.add_argument("--output", help="checked dataset CSV")
+    p.add_argument("--report", help="summary metrics CSV")
+    p.add_argument("--outliers", help="outlier candidates CSV")
+    p.add_argument("--no-plots", action="store_true", help="skip plots (matplotlib is never imported)")
+    _add_sample(p)
+    _add_metrics(p)
+    p.set_defaults(func=cmd_diagnose)
+
+    p = sub.add_parser("report", help="render the final dataset report to Markdown (generate_final_report.py)")
+    p.add_argument("--input", help="production dataset CSV")
+    p.add_argument("--output", help="Markdown report path")
+    p.add_argument("--workers", type=int, help="processes for the sections to recompute (default: CPU count)")
+    p.add_argument("--no-cache", action="store_true", help="recompute every section (cache neither read nor updated)")
+    _add_sample(p)
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("test", help="run the data2.py unit tests")
+    p.set_defaults(func=cmd_test)
+
+    p = sub.add_parser("audit", help="query the audit store (row history or per-stage summary)")
+    p.add_argument("--db", default="pipeline_audit.sqlite", help="audit store path (default: %(default)s)")
+    p.add_argument("--row", type=int, help="show every change to this row_index")
+    p.add_argument("--raw-row", type=int, help="show every change, in any stage, to this raw_row_id")
+    p.add_argument("--dataset", help="read --row as a row of this stage output CSV and follow its raw_row_id "
+                                     "(via its lineage .npy); with --raw-row, show where that raw row ended up")
+    p.add_argument("--column", help="restrict --row / --raw-row to one column")
+    p.add_argument("--run-id", help="restrict the summary to one run")
+    p.add_argument("--runs", action="store_true", help="list recorded runs")
+    p.set_defaults(func=cmd_audit)
+
+    p = sub.add_parser("warehouse", help="bulk-load the cleaned dataset into an indexed SQLite warehouse")
+    p.add_argument("--input", help="cleaned dataset CSV")
+    p.add_argument("--db", help="warehouse SQLite path")
+    p.set_defaults(func=cmd_warehouse)
+
+    p = sub.add_parser("features", help="export a memory-mappable ML feature matrix (dense float32 + CSR one-hot)")
+    p.add_argument("--input", help="production dataset CSV")
+    p.add_argument("--output-dir", help="directory for the .npy arrays and manifest.json")
+    p.set_defaults(func=cmd_features)
+
+    p = sub.add_parser("ingest", help="read many SLU export files concurrently into one raw CSV")
+    p.add_argument("files", nargs="*", help="export files (.xlsx/.xls/.csv)")
+    p.add_argument("--input-dir", help="also ingest every export file in this directory")
+    p.add_argument("--output", default="combined_raw_export.csv", help="unified raw CSV (default: %(default)s)")
+    p.add_argument("--workers", type=int, help="parallel readers (default: one per file, up to CPU count)")
+    p.add_argument("--threads", action="store_true", help="use threads instead of processes (CSV-only batches)")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("chain", help="run clean -> fix -> impute with checkpoints, resuming after the last completed stage")
+    p.add_argument("--checkpoint-dir", default=".pipeline_checkpoints", help="stage manifests (default: %(default)s)")
+    p.add_argument("--fresh", action="store_true", help="discard all checkpoints and run every stage")
+    p.add_argument("--rerun-from", choices=CHAIN_STAGES, help="discard checkpoints from this stage on")
+    _add_day_resolution(p)
+    _add_metrics(p)
+    _add_backend(p)
+    _add_pipelined(p)
+    p.set_defaults(func=cmd_chain)
+
+    p = sub.add_parser("watch", help="poll a directory and fold new export files into a live cleaned dataset")
+    p.add_argument("--input-dir", default="incoming", help="directory to watch (default: %(default)s)")
+    p.add_argument("--output", help="live cleaned dataset CSV")
+    p.add_argument("--report", help="summary report CSV, rewritten after every batch")
+    p.add_argument("--interval", type=float, default=2.0, help="seconds between polls (default: %(default)s)")
+    p.add_argument("--once", action="store_true", help="process the files present now and exit")
+    p.add_argument("--reset", action="store_true", help="ignore the previous live dataset and start empty")
+    _add_backend(p)
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("star", help="split a CSV into an opportunity dimension and an applications fact table")
+    p.add_argument("--input", required=True, help="flat dataset CSV")
+    p.add_argument("--output-base", help="output path prefix (default: input path without .csv)")
+    p.add_argument("--audit", help="write per-row changes from the opportunity-level fixes to this CSV")
+    p.set_defaults(func=cmd_star)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.metrics = _run_metrics(args)
+    try:
+        args.func(args)
+    except BaseException:
+        if args.metrics is not None:
+            args.metrics.write(success=False)
+        raise
+    if args.metrics is not None:
+        args.metrics.write(success=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# plots.py
+# Plot rendering stage for the diagnostics scripts.
+#
+# Scripts describe each figure as a small "spec" dict (pre-binned counts, labels,
+# colours) instead of calling matplotlib themselves. render_plots() then:
+#  - skips any plot whose spec hash matches the last render (and the PNG exists)
+#  - renders the remaining plots in a process pool using the headless Agg backend
+# matplotlib is only imported inside the worker, so callers that never render
+# (e.g. `--no-plots`) never pay for the import.
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+PLOT_CACHE = ".plot_cache.json"
+
+# -----------------------
+# Spec builders
+# -----------------------
+def histogram_counts(values, bins):
+    """Bin values once with numpy; returns (counts, edges) as plain lists."""
+    arr = np.asarray(values, dtype=float)
+    arr = arr[~np.isnan(arr)]
+    counts, edges = np.histogram(arr, bins=bins)
+    return counts.tolist(), edges.tolist()
+
+def bar_spec(path, labels, counts, title, ylabel='Count', color='#3498db',
+             figsize=(6, 4), rotation=0, edgecolor=None, alpha=1.0):
+    return {
+        'kind': 'bar',
+        'path': path,
+        'labels': [str(l) for l in labels],
+        'counts': [int(c) for c in counts],
+        'title': title,
+        'ylabel': ylabel,
+        'color': color,
+        'figsize': list(figsize),
+        'rotation': rotation,
+        'edgecolor': edgecolor,
+        'alpha': alpha,
+    }
+
+def hist_spec(path, counts, edges, title, xlabel, ylabel='Frequency', color='#3498db',
+              figsize=(6, 4), vline=None, vline_label=None):
+    return {
+        'kind': 'hist',
+        'path': path,
+        'counts': [int(c) for c in counts],
+        'edges': [float(e) for e in edges],
+        'title': title,
+        'xlabel': xlabel,
+        'ylabel': ylabel,
+        'color': color,
+        'figsize': list(figsize),
+        'vline': None if vline is None else float(vline),
+        'vline_label': vline_label,
+    }
+
+def spec_hash(spec):
+    payload = json.dumps(spec, sort_keys=True).encode('utf-8')
+    return hashlib.sha1(payload).hexdigest()
+
+# -----------------------
+# Rendering (runs in worker processes)
+# -----------------------
+def _render_one(spec):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=tuple(spec['figsize']))
+    if spec['kind'] == 'bar':
+        x = range(len(spec['counts']))
+        kwargs = {'color': spec['color'], 'alpha': spec['alpha']}
+        if spec['edgecolor']:
+            kwargs['edgecolor'] = spec['edgecolor']
+        plt.bar(x, spec['counts'], **kwargs)
+        plt.xticks(x, spec['labels'], rotation=spec['rotation'])
+        plt.ylabel(spec['ylabel'])
+    elif spec['kind'] == 'hist':
+        edges = np.asarray(spec['edges'])
+        plt.bar(edges[:-1], spec['counts'], width=np.diff(edges), align='edge',
+                color=spec['color'], edgecolor='black', alpha=0.7)
+        if spec['vline'] is not None:
+            plt.axvline(x=spec['vline'], color='red', linestyle='--', linewidth=2, label=spec['vline_label'])
+            plt.legend()
+        plt.xlabel(spec['xlabel'])
+        plt.ylabel(spec['ylabel'])
+    else:
+        plt.close()
+        raise ValueError(f"Unknown plot kind: {spec['kind']}")
+    plt.title(spec['title'], fontsize=12, fontweight='bold')
+    plt.grid(axis='y', alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(spec['path'], dpi=150, bbox_inches='tight')
+    plt.close()
+    return spec['path']
+
+# -----------------------
+# Stage entry point
+# -----------------------
+def _load_cache(cache_file):
+    if not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def render_plots(specs, cache_file=PLOT_CACHE, max_workers=None):
+    """
+    Render plot specs, skipping unchanged ones. Returns {path: 'rendered'|'cached'}.
+    """
+    cache = _load_cache(cache_file)
+    status = {}
+    todo = []
+    for spec in specs:
+        h = spec_hash(spec)
+        if cache.get(spec['path']) == h and os.path.exists(spec['path']):
+            status[spec['path']] = 'cached'
+        else:
+            todo.append((spec, h))
+
+    if len(todo) == 1:
+        _render_one(todo[0][0])
+    elif todo:
+        with ProcessPoolExecutor(max_workers=max_workers or min(len(todo), os.cpu_count() or 1)) as pool:
+            list(pool.map(_render_one, [spec for spec, _ in todo]))
+
+    for spec, h in todo:
+        cache[spec['path']] = h
+        status[spec['path']] = 'rendered'
+    if todo:
+        with open(cache_file, 'w') as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+    return status
@@ -0,0 +1,202 @@
+# prefetch.py
+# Pipelined chunk execution for the CSV-to-CSV stages (fix, impute).
+#
+#   reader thread --(bounded queue)--> compute (caller's thread) --(bounded queue)--> writer thread
+#
+# While chunk i is being cleaned, chunk i+1 is parsed in the background and chunk i-1
+# is serialized and written, so wall time tends to max(I/O, compute) instead of their
+# sum. Each queue holds at most QUEUE_CHUNKS chunks, so at most about 2 * QUEUE_CHUNKS + 3
+# chunks are in memory whatever the file size. pandas' C parser, to_csv formatting and
+# compression release the GIL for much of their work, which is where the overlap comes
+# from; pure-Python stage code does not overlap with itself.
+#
+# csv_chunks() reads like projection.read_projected: the stage's columns are parsed,
+# every other column is kept as its unquoted field text and written back unchanged. The
+# chunks keep pandas' running row index (0.. across the file), so row indexes in audits
+# are global. Stage columns are type-inferred per chunk; for the pandas-written inputs of
+# these stages (floats written as 1.0, minimal quoting) that gives the dtypes and output
+# bytes of a whole-file run.
+# in_background() runs one call in a thread and returns a Future, for file-level overlap
+# where a format cannot be read in chunks (the workbooks in data2.py).
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+from checkpoint import atomic_output
+from projection import NA_TOKENS
+from writers import open_output_text
+
+CHUNK_ROWS = 50_000
+QUEUE_CHUNKS = 2
+
+_DONE = object()
+
+class PipelineStats:
+    def __init__(self):
+        self.chunks = 0
+        self.rows = 0
+        self.read = 0.0
+        self.compute = 0.0
+        self.write = 0.0
+        self.wall = 0.0
+
+    def summary(self):
+        serial = self.read + self.compute + self.write
+        return (f'[pipeline] {self.chunks} chunks, {self.rows} rows: read {self.read:.2f}s, '
+                f'compute {self.compute:.2f}s, write {self.write:.2f}s; wall {self.wall:.2f}s '
+                f'(serial {serial:.2f}s)')
+
+class _Worker(threading.Thread):
+    """Background thread that records the first exception instead of dying silently."""
+    def __init__(self, target, name):
+        super().__init__(name=name, daemon=True)
+        self._target_fn = target
+        self.error = None
+
+    def run(self):
+        try:
+            self._target_fn()
+        except BaseException as e:
+            self.error = e
+
+def _put(q, item, stop):
+    """q.put that gives up once the pipeline is stopping (no deadlock on a full queue)."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(q, stop):
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+def run_pipelined(chunks, process, write, queue_chunks=QUEUE_CHUNKS):
+    """
+    For each chunk of the iterable chunks (consumed in a reader thread): result =
+    process(chunk) in this thread, then write(result) in a writer thread, in order.
+    The first error from any of the three stops the pipeline and is raised here.
+    Returns PipelineStats.
+    """
+    stats = PipelineStats()
+    stop = threading.Event()
+    read_q = queue.Queue(maxsize=queue_chunks)
+    write_q = queue.Queue(maxsize=queue_chunks)
+    t0 = time.perf_counter()
+
+    def read_all():
+        it = iter(chunks)
+        try:
+            while not stop.is_set():
+                t = time.perf_counter()
+                try:
+                    chunk = next(it)
+                except StopIteration:
+                    break
+                stats.read += time.perf_counter() - t
+                if not _put(read_q, chunk, stop):
+                    return
+        finally:
+            _put(read_q, _DONE, stop)
+
+    def write_all():
+        try:
+            while True:
+                result = _get(write_q, stop)
+                if result is _DONE:
+                    return
+                t = time.perf_counter()
+                write(result)
+                stats.write += time.perf_counter() - t
+        except BaseException:
+            stop.set()
+            raise
+
+    reader = _Worker(read_all, 'prefetch-reader')
+    writer = _Worker(write_all, 'prefetch-writer')
+    reader.start()
+    writer.start()
+    try:
+        while True:
+            chunk = _get(read_q, stop)
+            if chunk is _DONE:
+                break
+            t = time.perf_counter()
+            result = process(chunk)
+            stats.compute += time.perf_counter() - t
+            stats.chunks += 1
+            stats.rows += len(chunk) if hasattr(chunk, '__len__') else 0
+            if not _put(write_q, result, stop):
+                break
+        _put(write_q, _DONE, stop)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        reader.join()
+        writer.join()
+        stop.set()
+    for worker in (reader, writer):
+        if worker.error is not None:
+            raise worker.error
+    stats.wall = time.perf_counter() - t0
+    return stats
+
+def csv_chunks(path, columns, chunk_rows=CHUNK_ROWS):
+    """
+    DataFrame chunks of the CSV at path: columns parsed as read_csv would, all others
+    as raw text ('' when empty). A header-only file gives one empty chunk.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    parsed = [c for c in header if c in columns]
+    # NA detection only for the parsed columns; the rest keep their exact text
+    reader = pd.read_csv(path, chunksize=chunk_rows, keep_default_na=False,
+                         na_values={c: list(NA_TOKENS) for c in parsed},
+                         dtype={c: str for c in header if c not in columns})
+    with reader:
+        yield from reader
+
+class CsvChunkWriter:
+    """
+    Appends DataFrame chunks to one CSV (header from the first chunk), compressed by
+    suffix like writers.write_csv. Use as a context manager: path is replaced only when
+    the block succeeds, the partial file is removed otherwise.
+    """
+    def __init__(self, path, **to_csv_kwargs):
+        self.path = path
+        self.to_csv_kwargs = {'index': False, **to_csv_kwargs}
+        self._header = True
+
+    def __enter__(self):
+        self._output = atomic_output(self.path)
+        self._file = open_output_text(self._output.__enter__())
+        return self
+
+    def write(self, df):
+        df.to_csv(self._file, header=self._header, **self.to_csv_kwargs)
+        self._header = False
+
+    def __exit__(self, *exc):
+        self._file.close()
+        return self._output.__exit__(*exc)
+
+def in_background(func, *args, **kwargs):
+    """Start func(*args, **kwargs) in a thread now; returns a Future for its result."""
+    future = Future()
+    def run():
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return future
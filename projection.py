@@ -0,0 +1,173 @@
+# projection.py
+# Column projection for the CSV-to-CSV stages.
+#
+# A stage declares READ_COLUMNS (what it looks at) and WRITE_COLUMNS (what it may
+# change or add). read_projected() parses only the declared columns (usecols) and keeps
+# no other part of the file: the RawTable it returns holds the header and streams the
+# records' raw field text from the input when asked. write_passthrough() then writes
+# the output in one streaming pass, taking the written columns from the stage's frame
+# (formatted PASSTHROUGH_CHUNK_ROWS rows at a time) and every other field verbatim from
+# the input record, so untouched columns are never parsed, held in memory or
+# re-serialized. Peak memory is the projected frame, never more than a full read. The
+# input is read twice: read_csv parses the declared columns, and write_passthrough
+# scans the records again while writing.
+#
+# Passed-through fields keep the input's text exactly. A full read re-serializes them
+# instead, so the two outputs differ where read_csv + to_csv does not give the input
+# text back: e.g. 3.8066624897703196 passes through as is, but a full read parses it to
+# a neighbouring float and writes 3.80666248977032.
+#
+# Rows must stay aligned: the stage may change values and add columns but not drop,
+# add or reorder rows. Added columns go after the input's columns, as with to_csv.
+# .gz / .zst inputs and outputs are (de)compressed by suffix (writers.py).
+
+import io
+import re
+from itertools import zip_longest
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import atomic_output
+from writers import open_output_text, open_text
+
+PASSTHROUGH_CHUNK_ROWS = 20_000
+
+# pandas' default na_values: raw fields read as missing by read_csv
+NA_TOKENS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+_FIELD = re.compile(r'"(?:[^"]|"")*"|[^,\r\n]*')
+
+def _split_record(text):
+    """Raw fields of one record (quotes kept), e.g. 'a,"b,c",' -> ['a', '"b,c"', '']."""
+    fields = []
+    pos = 0
+    while True:
+        m = _FIELD.match(text, pos)
+        fields.append(m.group(0))
+        pos = m.end()
+        if pos < len(text) and text[pos] == ',':
+            pos += 1
+            continue
+        return fields
+
+def iter_records(lines):
+    """Raw field list of each CSV record, one at a time; blank lines are skipped as read_csv does."""
+    pending = None
+    for line in lines:
+        if pending is not None:
+            pending += line
+            if pending.count('"') % 2:
+                continue
+            line, pending = pending, None
+        elif line.count('"') % 2:
+            # a quoted field continues on the next line
+            pending = line
+            continue
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        yield line.split(',') if '"' not in line else _split_record(line)
+    if pending is not None:
+        yield _split_record(pending.rstrip('\r\n'))
+
+def split_records(lines):
+    """Raw field lists of every CSV record."""
+    return list(iter_records(lines))
+
+def _unquote(field):
+    if len(field) >= 2 and field[0] == '"' and field[-1] == '"':
+        return field[1:-1].replace('""', '"')
+    return field
+
+class RawTable:
+    """Header of a CSV file; records() streams the raw field text of its records."""
+    def __init__(self, path, header_fields):
+        self.path = path
+        self.header_fields = header_fields
+        self.header = [_unquote(c) for c in header_fields]
+        self.position = {c: i for i, c in enumerate(self.header)}
+
+    @classmethod
+    def read(cls, path):
+        with open_text(path) as f:
+            header_fields = next(iter_records(f), None)
+        if header_fields is None:
+            raise ValueError(f"'{path}' is empty")
+        return cls(path, header_fields)
+
+    def records(self):
+        """Raw field list of each record after the header, read from the file as iterated."""
+        with open_text(self.path) as f:
+            records = iter_records(f)
+            next(records, None)
+            yield from records
+
+    def null_frame(self, columns):
+        """NaN where a column is missing (as read_csv would see it), 0.0 elsewhere: enough for missingness snapshots."""
+        positions = [self.position[c] for c in columns]
+        flags = bytearray()  # one byte per cell, row-major
+        for r in self.records():
+            flags.extend(i >= len(r) or _unquote(r[i]) in NA_TOKENS for i in positions)
+        masks = np.frombuffer(flags, dtype=bool).reshape(-1, len(positions)) if positions else np.empty((0, 0), bool)
+        return pd.DataFrame(np.where(masks, np.nan, 0.0), columns=list(columns))
+
+    def null_mask(self, column):
+        """Missing-value mask of one column, as read_csv would see it."""
+        return self.null_frame([column])[column].isna().to_numpy()
+
+def read_projected(path, columns, **read_kwargs):
+    """
+    (df, raw): df holds only the declared columns present in the file (file order),
+    raw is the RawTable used by write_passthrough for everything else (which reads
+    the file a second time).
+    """
+    raw = RawTable.read(path)
+    usecols = [c for c in raw.header if c in set(columns)]
+    df = pd.read_csv(path, usecols=usecols, **read_kwargs)
+    print(f'Projected read: {len(usecols)} of {len(raw.header)} columns parsed')
+    return df, raw
+
+def _new_records(df, written, **to_csv_kwargs):
+    """Raw field lists of df[written] as to_csv writes them (header first unless header=False)."""
+    buf = io.StringIO()
+    df[written].to_csv(buf, index=False, lineterminator='\n', **to_csv_kwargs)
+    records = split_records(io.StringIO(buf.getvalue()))
+    if len(written) == 1:
+        # the csv module quotes a lone empty field; within a full row it is written bare
+        records = [['' if r[0] == '""' else r[0]] for r in records]
+    return records
+
+def _stage_records(df, written, chunk_rows, **to_csv_kwargs):
+    """Raw field lists of the written columns for every row of df, formatted chunk by chunk."""
+    for start in range(0, len(df), chunk_rows):
+        part = df.iloc[start:start + chunk_rows]
+        yield from _new_records(part, written, header=False, **to_csv_kwargs) if written else [[]] * len(part)
+
+def write_passthrough(df, raw, path, write_columns, chunk_rows=PASSTHROUGH_CHUNK_ROWS, **to_csv_kwargs):
+    """
+    Write raw's records to path with write_columns (plus any column df added) taken
+    from df; all other fields are copied as they were in the input, text unchanged
+    (lines end in '\n', as to_csv writes them). ValueError (and
+    path left untouched) when df and the input differ in row count.
+    """
+    added = [c for c in df.columns if c not in raw.position]
+    header = raw.header + added
+    written = [c for c in header if c in set(write_columns) | set(added) and c in df.columns]
+    # (input position, new position) per output column; the new value wins when present
+    slots = [(raw.position.get(c), written.index(c) if c in written else None) for c in header]
+    new_header = _new_records(df.iloc[:0], written, **to_csv_kwargs)[0] if written else []
+    header_fields = [new_header[j] if j is not None else raw.header_fields[i] for i, j in slots]
+    with atomic_output(path) as tmp:
+        with open_output_text(tmp) as f:
+            f.write(','.join(header_fields) + '\n')
+            for old, new in zip_longest(raw.records(), _stage_records(df, written, chunk_rows, **to_csv_kwargs)):
+                if old is None or new is None:
+                    raise ValueError(f"Stage changed the row count ({len(df)} rows vs the records of '{raw.path}'); "
+                                     "cannot pass columns through")
+                f.write(','.join(new[j] if j is not None else (old[i] if i < len(old) else '')
+                                 for i, j in slots) + '\n')
+    print(f'Wrote {path}: {len(written)} columns from the stage, {len(header) - len(written)} passed through')
@@ -0,0 +1,211 @@
+# sampling.py
+# Stratified sampling preview for diagnostics and the final report.
+#
+# stratified_sample_csv() makes one streaming pass over a CSV (chunked read). Every row
+# draws a uniform key u and is kept when u < fraction; per stratum
+# (opportunity_category x signup_year by default) it also counts the population N_h and
+# keeps the MIN_PER_STRATUM smallest keys, so small strata are topped up to a minimum
+# sample size. Within each stratum the kept rows are a simple random sample, so the
+# usual stratified estimators apply:
+#   total  T = sum_h N_h * ybar_h,  Var(T) = sum_h N_h^2 (1 - n_h/N_h) s_h^2 / n_h
+#   mean   ratio of two totals (linearized variance)
+# Estimates are printed as "value ± half-width" of the 95% normal interval. Quantiles
+# and the standard deviation are weighted by N_h / n_h and carry no interval.
+#
+# ExactCounts has the same interface over the full frame (no interval), so the reports
+# run the same code in both modes.
+
+import numpy as np
+import pandas as pd
+
+STRATA = ['opportunity_category', 'signup_year']
+MIN_PER_STRATUM = 2
+Z_95 = 1.96
+DEFAULT_CHUNKSIZE = 100_000
+
+def format_estimate(value, half_width=None, width=0, decimals=0, grouping=True):
+    """'1,234' for exact values, '1,234 ± 56' for estimates."""
+    sep = ',' if grouping else ''
+    if half_width is None:
+        if decimals == 0:
+            return f'{int(value):{width}{sep}}'
+        return f'{value:{width}{sep}.{decimals}f}'
+    return f'{value:{width}{sep}.{decimals}f} ± {half_width:{sep}.{decimals}f}'
+
+def _mask_for(series, value):
+    return (series.isna() if pd.isna(value) else (series == value)).to_numpy()
+
+def stratum_keys(df, strata=STRATA):
+    """One string label per row, e.g. 'Internship|2023' (missing parts become 'NA')."""
+    parts = []
+    for c in strata:
+        if c == 'signup_year' and c not in df.columns and 'learner_signup_datetime' in df.columns:
+            col = pd.to_datetime(df['learner_signup_datetime'], errors='coerce').dt.year
+        elif c in df.columns:
+            col = df[c]
+        else:
+            continue
+        if pd.api.types.is_float_dtype(col):
+            col = col.round().astype('Int64')
+        parts.append(col.astype(str).where(col.notna(), 'NA'))
+    if not parts:
+        return pd.Series('all', index=df.index)
+    out = parts[0]
+    for p in parts[1:]:
+        out = out + '|' + p
+    return out
+
+# -----------------------
+# Estimators
+# -----------------------
+def _as_values(values):
+    return pd.Series(np.asarray(values, dtype=np.float64)).fillna(0.0).to_numpy()
+
+class ExactCounts:
+    """Full-data counterpart of StratifiedSample: exact values, no intervals."""
+    is_sample = False
+
+    def __init__(self, df):
+        self.df = df
+        self.n_population = len(df)
+
+    def total(self, values):
+        return float(_as_values(values).sum()), None
+
+    def mean(self, values):
+        v = pd.Series(np.asarray(values, dtype=np.float64))
+        return float(v.mean()), None
+
+    def quantiles(self, values, qs):
+        return pd.Series(np.asarray(values, dtype=np.float64)).quantile(qs).to_numpy()
+
+    def std(self, values):
+        return float(pd.Series(np.asarray(values, dtype=np.float64)).std())
+
+    def value_counts(self, series, dropna=True):
+        counts = series.value_counts(dropna=dropna)
+        return pd.DataFrame({'count': counts, 'half_width': None})
+
+    def count_text(self, mask, width=0, grouping=True):
+        value, hw = self.total(mask)
+        return format_estimate(value, hw, width, grouping=grouping)
+
+    def distribution(self, series):
+        """value_counts(dropna=False) in index order."""
+        return series.value_counts(dropna=False).sort_index()
+
+class StratifiedSample:
+    is_sample = True
+
+    def __init__(self, df, strata_labels, population, fraction):
+        self.df = df
+        self.strata_labels = pd.Series(np.asarray(strata_labels), index=df.index)
+        self.population = population                      # N_h
+        self.sampled = self.strata_labels.value_counts()  # n_h
+        self.fraction = fraction
+        self.n_population = int(population.sum())
+        n_h = self.sampled.reindex(self.strata_labels.values).to_numpy()
+        N_h = population.reindex(self.strata_labels.values).to_numpy()
+        self.weights = N_h / n_h
+
+    def _total_and_var(self, y):
+        g = pd.DataFrame({'y': y, 'h': self.strata_labels.values}).groupby('h')['y']
+        stats = pd.DataFrame({'mean': g.mean(), 'var': g.var(ddof=1).fillna(0.0), 'n': g.size()})
+        N = self.population.reindex(stats.index)
+        total = float((N * stats['mean']).sum())
+        var = float((N ** 2 * (1 - stats['n'] / N) * stats['var'] / stats['n']).sum())
+        return total, var
+
+    def total(self, values):
+        """Estimated population total of values (a boolean mask gives a count)."""
+        total, var = self._total_and_var(_as_values(values))
+        return total, Z_95 * np.sqrt(max(var, 0.0))
+
+    def mean(self, values):
+        """Estimated population mean of the non-missing values (ratio estimator)."""
+        v = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(v)
+        y = np.where(present, v, 0.0)
+        x = present.astype(np.float64)
+        y_total, _ = self._total_and_var(y)
+        x_total, _ = self._total_and_var(x)
+        if x_total == 0:
+            return np.nan, None
+        ratio = y_total / x_total
+        _, var = self._total_and_var(y - ratio * x)
+        return ratio, Z_95 * np.sqrt(max(var, 0.0)) / x_total
+
+    def quantiles(self, values, qs):
+        """Population quantile estimates of the non-missing values: inverse of the weighted CDF (no interval)."""
+        v = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(v)
+        if not present.any():
+            return np.full(len(qs), np.nan)
+        order = np.argsort(v[present], kind='stable')
+        items, cum = v[present][order], np.cumsum(self.weights[present][order])
+        pos = np.searchsorted(cum, np.asarray(qs, dtype=np.float64) * cum[-1], side='left')
+        return items[np.clip(pos, 0, len(items) - 1)]
+
+    def std(self, values):
+        """Population standard deviation estimate of the non-missing values (weighted, no interval)."""
+        v = np.asarray(values, dtype=np.float64)
+        present = ~np.isnan(v)
+        w, x = self.weights[present], v[present]
+        if w.sum() <= 1:
+            return np.nan
+        mean = (w * x).sum() / w.sum()
+        return float(np.sqrt((w * (x - mean) ** 2).sum() / (w.sum() - 1)))
+
+    def value_counts(self, series, dropna=True):
+        """Estimated count (and CI half-width) per distinct value, largest first."""
+        rows = {}
+        for value in pd.unique(series.dropna() if dropna else series):
+            rows[value] = self.total(_mask_for(series, value))
+        out = pd.DataFrame.from_dict(rows, orient='index', columns=['count', 'half_width'])
+        return out.sort_values('count', ascending=False)
+
+    def count_text(self, mask, width=0, grouping=True):
+        value, hw = self.total(mask)
+        return format_estimate(value, hw, width, grouping=grouping)
+
+    def distribution(self, series):
+        """Like ExactCounts.distribution, with each count replaced by 'estimate ± half-width'."""
+        counts = series.value_counts(dropna=False).sort_index()
+        texts = [self.count_text(_mask_for(series, value), grouping=False) for value in counts.index]
+        return pd.Series(texts, index=counts.index, name=counts.name)
+
+    def describe(self):
+        return (f'PREVIEW: stratified {self.fraction:.1%} sample, {len(self.df):,} of '
+                f'{self.n_population:,} rows from {len(self.population)} strata; '
+                f'counts are population estimates ± 95% CI half-width')
+
+# -----------------------
+# One-pass sampler
+# -----------------------
+def stratified_sample_csv(path, fraction, strata=STRATA, chunksize=DEFAULT_CHUNKSIZE, seed=0,
+                          min_per_stratum=MIN_PER_STRATUM, **read_kwargs):
+    """Draw a stratified sample of the CSV at path in one chunked pass."""
+    if not 0 < fraction <= 1:
+        raise ValueError("fraction must be in (0, 1]")
+    rng = np.random.default_rng(seed)
+    kept = []
+    reserve = None
+    population = pd.Series(dtype=np.int64)
+    for chunk in pd.read_csv(path, chunksize=chunksize, **read_kwargs):
+        keys = stratum_keys(chunk, strata)
+        u = rng.random(len(chunk))
+        population = population.add(keys.value_counts(), fill_value=0)
+        chunk = chunk.assign(_u=u, _stratum=keys.to_numpy())
+        kept.append(chunk[u < fraction])
+        # smallest keys per stratum so far, for topping up sparse strata
+        pool = chunk if reserve is None else pd.concat([reserve, chunk])
+        reserve = pool.sort_values('_u', kind='stable').groupby('_stratum', sort=False).head(min_per_stratum)
+    if reserve is None:
+        raise ValueError(f"{path} has no rows")
+    sample = pd.concat(kept)
+    n_kept = sample['_stratum'].value_counts()
+    short = reserve['_stratum'].map(n_kept).fillna(0) < min_per_stratum
+    sample = pd.concat([sample, reserve[short & (reserve['_u'] >= fraction)]], ignore_index=True)
+    labels = sample.pop('_stratum').to_numpy()
+    sample = sample.drop(columns='_u')
+    return StratifiedSample(sample, labels, population.astype(np.int64), fraction)
@@ -0,0 +1,204 @@
+# shared_dataset.py
+# Load the cleaned dataset once into shared memory and let worker processes read it
+# without parsing the CSV again, copying or pickling it.
+#
+# Layout of the one shared-memory block:
+#   [8-byte schema length][schema JSON][column arrays, each 64-byte aligned]
+# Column encodings:
+#   numeric / bool  - the NumPy array as is (pandas nullable columns become float64 + NaN)
+#   datetime        - int64 ticks, viewed back as datetime64[unit]
+#   everything else - dictionary encoded: integer codes (-1 = missing, the narrowest
+#                     dtype pandas uses for the number of categories) plus the distinct
+#                     values as UTF-8 bytes + int64 offsets; attaching decodes only the
+#                     dictionary and wraps the codes in a Categorical
+# Workers call SharedDataset.attach(name).frame(): a DataFrame whose columns are
+# read-only views into the block, so memory stays at about one dataset copy however many
+# workers attach. Replacing a column (frame[c] = ...) works as usual; writing into the
+# shared values (.loc / .iloc on existing cells) raises, use frame.copy() for that.
+# parallel_map() runs func(frame, item) in a process pool whose workers attach once
+# at start-up.
+#
+# The creating process owns the block: close() (or leaving the `with` block) unlinks
+# it. Frames still in use keep their mapping until they are garbage collected.
+
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+INPUT = "production_ready_dataset_v2.csv"
+ALIGN = 64
+HEADER_BYTES = 8
+
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+def _codes_dtype(n_categories):
+    """Codes dtype pandas itself uses for a Categorical with n categories (no copy on wrap)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+def _encode_column(series):
+    """(kind, {part: array}, extra schema) for one column."""
+    dtype = series.dtype
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return 'datetime', {'values': series.to_numpy().view('int64')}, {'dtype': str(dtype)}
+    if isinstance(dtype, np.dtype) and (dtype.kind in 'biuf'):
+        return 'numeric', {'values': series.to_numpy()}, {}
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        return 'numeric', {'values': series.to_numpy(dtype='float64', na_value=np.nan)}, {}
+    codes, uniques = pd.factorize(series.astype(str).where(series.notna()))
+    encoded = [str(v).encode('utf-8') for v in uniques]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    parts = {'codes': codes.astype(_codes_dtype(len(encoded))),
+             'dict_offsets': offsets,
+             'dict_bytes': np.frombuffer(b''.join(encoded), dtype=np.uint8)}
+    return 'dictionary', parts, {}
+
+class _Block(shared_memory.SharedMemory):
+    def __del__(self):
+        try:
+            self.close()
+        except BufferError:
+            pass   # frames still map the block; it is unmapped with the last of them
+
+def _attach_block(name):
+    try:
+        # Python 3.13+: an attaching process must not unlink the creator's block on exit
+        return _Block(name=name, track=False)
+    except TypeError:
+        return _Block(name=name)
+
+class SharedDataset:
+    def __init__(self, shm, schema, owner):
+        self.shm = shm
+        self.schema = schema
+        self.owner = owner
+        self._data_start = _aligned(HEADER_BYTES + int.from_bytes(bytes(shm.buf[:HEADER_BYTES]), 'little'))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, df, name=None):
+        """Copy df into a new shared-memory block (the row index is not kept)."""
+        columns, arrays, offset = [], [], 0
+        for c in df.columns:
+            kind, parts, extra = _encode_column(df[c])
+            layout = {}
+            for part, array in parts.items():
+                array = np.ascontiguousarray(array)
+                layout[part] = {'offset': offset, 'dtype': array.dtype.str, 'length': len(array)}
+                arrays.append((offset, array))
+                offset += _aligned(array.nbytes)
+            columns.append({'name': str(c), 'kind': kind, 'parts': layout, **extra})
+        schema = json.dumps({'n_rows': len(df), 'columns': columns}).encode('utf-8')
+        data_start = _aligned(HEADER_BYTES + len(schema))
+        shm = _Block(name=name, create=True, size=max(data_start + offset, 1))
+        shm.buf[:HEADER_BYTES] = len(schema).to_bytes(HEADER_BYTES, 'little')
+        shm.buf[HEADER_BYTES:HEADER_BYTES + len(schema)] = schema
+        for start, array in arrays:
+            start += data_start
+            shm.buf[start:start + array.nbytes] = array.view(np.uint8).reshape(-1)
+        return cls(shm, json.loads(schema), owner=True)
+
+    @classmethod
+    def from_csv(cls, path=INPUT, name=None, **read_kwargs):
+        """Parse path once and share it; the parsed frame is dropped afterwards."""
+        ds = cls.create(pd.read_csv(path, **read_kwargs), name=name)
+        print(f"Shared {path}: {ds.schema['n_rows']} rows, {len(ds.schema['columns'])} columns, "
+              f"{ds.shm.size / 2**20:.1f} MB in shared memory '{ds.name}'")
+        return ds
+
+    @classmethod
+    def attach(cls, name):
+        """Open a block created by another process (read-only use)."""
+        shm = _attach_block(name)
+        n = int.from_bytes(bytes(shm.buf[:HEADER_BYTES]), 'little')
+        schema = json.loads(bytes(shm.buf[HEADER_BYTES:HEADER_BYTES + n]))
+        return cls(shm, schema, owner=False)
+
+    def _part(self, layout):
+        array = np.frombuffer(self.shm.buf, dtype=np.dtype(layout['dtype']), count=layout['length'],
+                              offset=self._data_start + layout['offset'])
+        array.flags.writeable = False
+        return array
+
+    def column(self, name):
+        """One column as a pandas Series backed by the shared block."""
+        spec = next((c for c in self.schema['columns'] if c['name'] == name), None)
+        if spec is None:
+            raise KeyError(name)
+        parts = {part: self._part(layout) for part, layout in spec['parts'].items()}
+        if spec['kind'] == 'datetime':
+            values = parts['values'].view(spec['dtype'])
+        elif spec['kind'] == 'numeric':
+            values = parts['values']
+        else:
+            offsets, raw = parts['dict_offsets'], parts['dict_bytes'].tobytes()
+            categories = [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+            values = pd.Categorical.from_codes(parts['codes'], categories=pd.Index(categories), validate=False)
+        return pd.Series(values, name=name, copy=False)
+
+    def frame(self, columns=None):
+        """DataFrame of (some of) the columns; no data is copied."""
+        names = columns or [c['name'] for c in self.schema['columns']]
+        return pd.DataFrame({c: self.column(c) for c in names}, copy=False)
+
+    def close(self):
+        """Detach; the creating process also frees the block."""
+        try:
+            self.shm.close()
+        except BufferError:
+            pass   # frames still in use keep the mapping (see module notes)
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_worker_frame = None
+
+def _init_worker(name, columns):
+    global _worker_frame
+    _worker_frame = SharedDataset.attach(name).frame(columns)
+
+def _call_worker(func, item):
+    return func(_worker_frame, item)
+
+def parallel_map(func, items, dataset, max_workers=None, columns=None):
+    """
+    [func(frame, item) for item in items] in worker processes that each attach to
+    dataset once; func must be a module-level function. Results come back in order.
+    """
+    items = list(items)
+    workers = min(len(items), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        frame = dataset.frame(columns)
+        return [func(frame, item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(dataset.name, columns)) as pool:
+        return list(pool.map(_call_worker, [func] * len(items), items))
+
+def _missing_count(df, column):
+    return column, int(df[column].isna().sum())
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else INPUT
+    with SharedDataset.from_csv(path) as ds:
+        names = [c['name'] for c in ds.schema['columns']]
+        counts = parallel_map(_missing_count, names, ds, max_workers=max(2, os.cpu_count() or 1))
+        print(f"Missing values per column (computed by worker processes attached to '{ds.name}'):")
+        for column, n in counts:
+            print(f"  {column:32s} {n}")
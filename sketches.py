@@ -0,0 +1,218 @@
+# sketches.py
+# Streaming, mergeable summary statistics.
+#
+# Every sketch is fed chunk by chunk (update) and two sketches of the same kind can be
+# combined (merge), so statistics can be built from a chunked CSV read or from parallel
+# workers without ever holding a full column:
+#   RunningMoments  - count / mean / variance (Chan et al. parallel update) / min / max
+#   FixedHistogram  - counts over fixed bin edges (+ underflow/overflow, optional clipping)
+#   KLLSketch       - KLL quantile sketch; rank error roughly O(1/k), k=200 -> ~1%
+#   ColumnSketch    - the three above for one numeric column
+# sketch_csv() reads only the requested columns of a CSV, chunk by chunk, sketches each
+# chunk and merges the chunk sketches, so a full column is never held; sketch_series()
+# does the same for a column already in memory. KLL compaction is random but seeded, so
+# the same input gives the same percentiles on every run.
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNKSIZE = 100_000
+
+def _clean(values):
+    v = np.asarray(values, dtype=np.float64).ravel()
+    return v[~np.isnan(v)]
+
+# -----------------------
+# Moments
+# -----------------------
+class RunningMoments:
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        v = _clean(values)
+        if len(v) == 0:
+            return self
+        other = RunningMoments()
+        other.n = len(v)
+        other.mean = float(v.mean())
+        other.m2 = float(((v - other.mean) ** 2).sum())
+        other.min = float(v.min())
+        other.max = float(v.max())
+        return self.merge(other)
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / n
+        self.m2 += other.m2 + delta * delta * self.n * other.n / n
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def var(self):
+        """Sample variance (ddof=1, like pandas)."""
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.var))
+
+# -----------------------
+# Histogram
+# -----------------------
+class FixedHistogram:
+    def __init__(self, edges, clip=False):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.clip = clip
+        self.underflow = 0
+        self.overflow = 0
+
+    def update(self, values):
+        v = _clean(values)
+        lo, hi = self.edges[0], self.edges[-1]
+        if self.clip:
+            v = np.clip(v, lo, hi)
+        else:
+            self.underflow += int((v < lo).sum())
+            self.overflow += int((v > hi).sum())
+        counts, _ = np.histogram(v, bins=self.edges)
+        self.counts += counts
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge histograms with different bin edges")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+# -----------------------
+# KLL quantile sketch
+# -----------------------
+class KLLSketch:
+    def __init__(self, k=200, c=2.0 / 3.0, seed=0):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(2, int(np.ceil(self.k * self.c ** depth)))
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                buf = np.sort(self.levels[h])
+                # an odd leftover stays at this level
+                keep = buf[len(buf) - len(buf) % 2:]
+                pairs = buf[:len(buf) - len(buf) % 2]
+                promoted = pairs[int(self._rng.integers(2))::2]
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def update(self, values):
+        v = _clean(values)
+        if len(v):
+            self.n += len(v)
+            self.levels[0] = np.concatenate([self.levels[0], v])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantiles(self, qs):
+        """Approximate quantiles for each q in qs (NaN when empty)."""
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(l), 2 ** h, dtype=np.float64) for h, l in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items, cum = items[order], np.cumsum(weights[order])
+        pos = np.searchsorted(cum, qs * cum[-1], side='left')
+        return items[np.clip(pos, 0, len(items) - 1)]
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+# -----------------------
+# Column bundle + streaming helpers
+# -----------------------
+class ColumnSketch:
+    def __init__(self, k=200, hist_edges=None, clip=False, seed=0):
+        self.moments = RunningMoments()
+        self.kll = KLLSketch(k=k, seed=seed)
+        self.hist = FixedHistogram(hist_edges, clip=clip) if hist_edges is not None else None
+        self.missing = 0
+
+    def update(self, values):
+        arr = np.asarray(values, dtype=np.float64).ravel()
+        self.missing += int(np.isnan(arr).sum())
+        self.moments.update(arr)
+        self.kll.update(arr)
+        if self.hist is not None:
+            self.hist.update(arr)
+        return self
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.kll.merge(other.kll)
+        if self.hist is not None and other.hist is not None:
+            self.hist.merge(other.hist)
+        self.missing += other.missing
+        return self
+
+    def median(self):
+        return self.kll.quantile(0.5)
+
+def iter_chunks(series, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield successive numpy slices of an in-memory column (float64, NaN for missing)."""
+    values = pd.to_numeric(series, errors='coerce')
+    for start in range(0, len(values), chunksize):
+        yield values.iloc[start:start + chunksize].to_numpy(dtype=np.float64, na_value=np.nan)
+
+def sketch_series(series, chunksize=DEFAULT_CHUNKSIZE, **kwargs):
+    sketch = ColumnSketch(**kwargs)
+    for chunk in iter_chunks(series, chunksize):
+        sketch.update(chunk)
+    return sketch
+
+def sketch_csv(path, columns, chunksize=DEFAULT_CHUNKSIZE, hist_edges=None, clip=(), k=200, seed=0):
+    """
+    {column: ColumnSketch} for numeric columns of the CSV at path, without loading the file:
+    each chunk (usecols=columns) is sketched on its own and merged into the running total.
+    hist_edges: optional {column: edges} for fixed histograms; clip: columns clipped into them.
+    """
+    hist_edges = hist_edges or {}
+    def new(c, i):
+        return ColumnSketch(k=k, hist_edges=hist_edges.get(c), clip=c in clip, seed=seed + i)
+    sketches = {c: new(c, 0) for c in columns}
+    for i, chunk in enumerate(pd.read_csv(path, usecols=list(columns), chunksize=chunksize), start=1):
+        for c in columns:
+            values = pd.to_numeric(chunk[c], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            sketches[c].merge(new(c, i).update(values))
+    return sketches
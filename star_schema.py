@@ -0,0 +1,120 @@
+# star_schema.py
+# Star-schema CSV output: an opportunity dimension plus a slim applications fact table.
+#
+#   <base>_opportunities.csv  - one row per opportunity_id (warehouse.OPPORTUNITY_COLS)
+#   <base>_applications.csv   - every other column, joined back on opportunity_id
+#   <base>_star.json          - column order of the flat dataset, used by load_star()
+#
+# The opportunity attributes are identical for every applicant of an opportunity, so
+# storing them once shrinks the files and the parse. Opportunity-level fixes (fill of
+# missing dates within an opportunity_id, end < start repair) run on the dimension,
+# i.e. once per opportunity; the per-row audit entries are then derived from the rows
+# whose value actually changed, so the audit looks the same as with the row-level
+# fill_opportunity_dates_by_id / fix_end_before_start in data2.py.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import write_json_atomic
+from data2 import fix_end_before_start
+from warehouse import OPPORTUNITY_COLS, split_star
+from writers import write_csv
+
+KEY = 'opportunity_id'
+OPPORTUNITY_DATE_COLS = ['opportunity_start_date', 'opportunity_end_date']
+
+def star_paths(base):
+    return {
+        'opportunities': f'{base}_opportunities.csv',
+        'applications': f'{base}_applications.csv',
+        'manifest': f'{base}_star.json',
+    }
+
+def _dimension_cols(df):
+    return [c for c in OPPORTUNITY_COLS if c in df.columns and c != KEY]
+
+def check_star(df):
+    """Raise ValueError unless every opportunity attribute is constant within its opportunity_id."""
+    if KEY not in df.columns:
+        raise ValueError(f"Star output needs an '{KEY}' column")
+    if df[KEY].isna().any():
+        raise ValueError(f"{int(df[KEY].isna().sum())} rows have no {KEY}; cannot split into a star schema")
+    cols = _dimension_cols(df)
+    varying = df.groupby(KEY)[cols].nunique() > 1
+    bad = [c for c in cols if varying[c].any()]
+    if bad:
+        raise ValueError(f"Opportunity attributes vary within an {KEY}: {', '.join(bad)}")
+
+def split_opportunities(df, audit=None):
+    """
+    (opportunities, applications) with the opportunity-level fixes applied to the
+    dimension: missing values are filled from the opportunity's other rows, end dates
+    before the start date are set to the start date and the duration (and its log)
+    recomputed.
+    """
+    opportunities, applications = split_star(df)
+    dim = opportunities.set_index(KEY)
+    dates = {c: pd.to_datetime(dim[c], errors='coerce') for c in OPPORTUNITY_DATE_COLS if c in dim.columns}
+    if len(dates) == 2:
+        fixed = fix_end_before_start(pd.DataFrame(dates), inplace=True)
+        changed = fixed['opportunity_end_date'].ne(dates['opportunity_end_date']) & fixed['opportunity_end_date'].notna()
+        if changed.any():
+            # end := start, copied as stored so the column keeps its text format
+            dim.loc[changed, 'opportunity_end_date'] = dim.loc[changed, 'opportunity_start_date']
+            duration = (fixed.loc[changed, 'opportunity_end_date'] - fixed.loc[changed, 'opportunity_start_date']).dt.days
+            if 'opportunity_duration_days' in dim.columns:
+                dim.loc[changed, 'opportunity_duration_days'] = duration
+            if 'log_opportunity_duration' in dim.columns:
+                dim.loc[changed, 'log_opportunity_duration'] = np.log1p(duration)
+    opportunities = dim.reset_index()
+    if audit is not None:
+        _audit_row_changes(df, opportunities, audit)
+    return opportunities, applications
+
+def _audit_row_changes(df, opportunities, audit):
+    """Record one audit entry per applicant row whose opportunity attribute changed."""
+    joined = df[[KEY]].merge(opportunities, on=KEY, how='left')
+    joined.index = df.index
+    for c in [c for c in _dimension_cols(df) if c in joined.columns]:
+        before, after = df[c], joined[c]
+        changed = before.astype(str).ne(after.astype(str)) & ~(before.isna() & after.isna())
+        for i in df.index[changed]:
+            audit.record(i, c, before.at[i], after.at[i])
+
+def join_star(opportunities, applications, columns=None):
+    """Rejoin the dimension onto the fact table (fact row order kept)."""
+    df = applications.merge(opportunities, on=KEY, how='left', sort=False)
+    return df[columns] if columns is not None else df
+
+def write_star(df, base, audit=None):
+    """Write the dimension, fact table and manifest for df; returns the path dict."""
+    check_star(df)
+    opportunities, applications = split_opportunities(df, audit=audit)
+    paths = star_paths(base)
+    write_csv(opportunities, paths['opportunities'], index=False)
+    write_csv(applications, paths['applications'], index=False)
+    write_json_atomic(paths['manifest'], {'key': KEY, 'columns': list(df.columns)})
+    print(f"Star schema: {len(opportunities)} opportunities -> {paths['opportunities']}, "
+          f"{len(applications)} applications -> {paths['applications']}")
+    return paths
+
+def load_star(base, parse_dates=None):
+    """Read the two star tables and rejoin them into the flat dataset."""
+    paths = star_paths(base)
+    opportunities = pd.read_csv(paths['opportunities'])
+    applications = pd.read_csv(paths['applications'])
+    columns = None
+    if os.path.exists(paths['manifest']):
+        with open(paths['manifest']) as f:
+            columns = json.load(f)['columns']
+    df = join_star(opportunities, applications, columns)
+    for c in parse_dates or []:
+        if c in df.columns:
+            df[c] = pd.to_datetime(df[c], errors='coerce')
+    return df
+
+def star_base_for(csv_path):
+    return os.path.splitext(csv_path)[0]
@@ -0,0 +1,165 @@
+# validation_rules.py
+# Declarative row-level validation rules.
+#
+# A rule is a dict with a name, a boolean expression over column names and the
+# columns to show for sample rows. compile_rules() parses every expression once,
+# works out the union of columns they reference, and evaluate() then:
+#  - pulls each needed column out of the frame exactly once (as a numpy array)
+#  - evaluates all rule expressions against those arrays
+#  - packs the per-rule masks into one unsigned-int bitmask per row (bit i = rule i)
+# Adding a rule only adds a vectorized expression, never another pass over the frame.
+# decode_bitmask() turns a packed value (e.g. from the rule_violations column written
+# with the checked dataset) back into rule names.
+#
+# Expressions are plain Python/numpy: comparisons, &, |, ~ and the helpers in
+# EXPR_FUNCTIONS. Missing values (NaN/NaT) compare as False, so a rule never
+# fires on a row where one of its inputs is missing.
+
+import ast
+
+import numpy as np
+import pandas as pd
+
+BITMASK_COLUMN = 'rule_violations'
+
+# -----------------------
+# Default rules (chronology + plausibility)
+# -----------------------
+DEFAULT_RULES = [
+    {
+        'name': 'apply_before_signup',
+        'description': 'apply_date < signup_date (chronology inversions)',
+        'expr': 'apply_date < learner_signup_datetime',
+        'sample_cols': ['learner_signup_datetime', 'apply_date', 'engagement_lag_days'],
+    },
+    {
+        'name': 'end_before_start',
+        'description': 'opportunity_end_date < opportunity_start_date',
+        'expr': 'opportunity_end_date < opportunity_start_date',
+        'sample_cols': ['opportunity_start_date', 'opportunity_end_date'],
+    },
+    {
+        'name': 'age_out_of_range',
+        'description': 'Age outliers (< 10 or > 120)',
+        'expr': '(age_years < 10) | (age_years > 120)',
+        'sample_cols': ['first_name', 'date_of_birth', 'learner_signup_datetime', 'age_years'],
+    },
+    {
+        'name': 'entry_year_after_signup',
+        'description': 'entry_created_at year > signup_year (forward created)',
+        'expr': 'year(entry_created_at) > year(learner_signup_datetime)',
+        'sample_cols': ['learner_signup_datetime', 'entry_created_at', 'apply_date'],
+    },
+    {
+        'name': 'days_before_start_extreme',
+        'description': '|days_before_start| > 365 (flag_days_before_start_extreme)',
+        'expr': 'abs(days_before_start) > 365',
+        'sample_cols': ['apply_date', 'opportunity_start_date', 'days_before_start'],
+    },
+]
+
+# -----------------------
+# Expression helpers
+# -----------------------
+def _year(values):
+    """Calendar year of a datetime64 array as float (NaN for NaT)."""
+    values = np.asarray(values)
+    if not np.issubdtype(values.dtype, np.datetime64):
+        values = pd.to_datetime(values, errors='coerce').to_numpy()
+    years = values.astype('datetime64[Y]').astype('int64').astype('float64') + 1970
+    years[np.isnat(values)] = np.nan
+    return years
+
+EXPR_FUNCTIONS = {
+    'abs': np.abs,
+    'year': _year,
+    'isna': pd.isna,
+    'notna': pd.notna,
+}
+
+def _column_array(series):
+    """Extract a column once as a numpy array with NaN/NaT for missing values."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.to_numpy()
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype='float64', na_value=np.nan)
+    return series.to_numpy(dtype=object)
+
+def _bitmask_dtype(n_rules):
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if n_rules <= np.iinfo(dtype).bits:
+            return dtype
+    raise ValueError(f"At most 64 rules can be packed into a bitmask, got {n_rules}")
+
+# -----------------------
+# Compile + evaluate
+# -----------------------
+class CompiledRules:
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.names = [r['name'] for r in self.rules]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Rule names must be unique")
+        self.dtype = _bitmask_dtype(len(self.rules))
+        self.code = []
+        columns = []
+        for r in self.rules:
+            tree = ast.parse(r['expr'], mode='eval')
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Name) and node.id not in EXPR_FUNCTIONS and node.id not in columns:
+                    columns.append(node.id)
+            self.code.append(compile(tree, f"<rule {r['name']}>", 'eval'))
+        self.columns = columns
+
+    def evaluate(self, df):
+        """Evaluate all rules against df in one pass over the referenced columns."""
+        n = len(df)
+        env = dict(EXPR_FUNCTIONS)
+        for c in self.columns:
+            env[c] = _column_array(df[c]) if c in df.columns else np.full(n, np.nan)
+        masks = {}
+        bitmask = np.zeros(n, dtype=self.dtype)
+        for bit, (name, code) in enumerate(zip(self.names, self.code)):
+            with np.errstate(invalid='ignore'):
+                mask = np.asarray(eval(code, {'__builtins__': {}}, env), dtype=bool)
+            if mask.shape != (n,):
+                mask = np.broadcast_to(mask, (n,)).copy()
+            masks[name] = mask
+            bitmask |= mask.astype(self.dtype) << self.dtype(bit)
+        return RuleResult(self, df, masks, bitmask)
+
+def compile_rules(rules=None):
+    return CompiledRules(DEFAULT_RULES if rules is None else rules)
+
+class RuleResult:
+    def __init__(self, compiled, df, masks, bitmask):
+        self.compiled = compiled
+        self.df = df
+        self.masks = masks
+        self.bitmask = bitmask
+        self.counts = {name: int(m.sum()) for name, m in masks.items()}
+
+    def samples(self, name, n=5):
+        """Sample violating rows for one rule (positional take, no full sub-frame)."""
+        rule = self.compiled.rules[self.compiled.names.index(name)]
+        pos = np.flatnonzero(self.masks[name])
+        if n is not None:
+            pos = pos[:n]
+        cols = [c for c in rule.get('sample_cols', []) if c in self.df.columns]
+        return self.df.iloc[pos][cols]
+
+    def any_violation(self):
+        return self.bitmask != 0
+
+    def summary(self):
+        return pd.DataFrame({
+            'rule': self.compiled.names,
+            'bit': range(len(self.compiled.names)),
+            'description': [r.get('description', r['expr']) for r in self.compiled.rules],
+            'violations': [self.counts[n] for n in self.compiled.names],
+        })
+
+def decode_bitmask(value, rules=None):
+    """Names of the rules set in a packed violation value."""
+    names = [r['name'] for r in (DEFAULT_RULES if rules is None else rules)]
+    return [name for bit, name in enumerate(names) if int(value) >> bit & 1]
@@ -0,0 +1,134 @@
+# warehouse.py
+# Bulk-load the cleaned dataset into a local SQLite warehouse.
+#
+# Layout:
+#   opportunities  - one row per opportunity_id (name, category, dates, duration)
+#   applications   - one row per learner application, every other column plus opportunity_id
+# Indexes on applications(opportunity_id), (country), (apply_date), (status_code) let
+# selective queries hit the index instead of re-parsing the whole CSV.
+#
+# Load strategy: tables are (re)created empty, rows go in with batched executemany
+# inside a single transaction under bulk-load pragmas (in-memory journal, no fsync), and the
+# secondary indexes are built once at the end, which is much cheaper than maintaining
+# them row by row. Dates are stored as ISO-8601 text so range filters work on them.
+
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+WAREHOUSE_DB = "week1_warehouse.sqlite"
+INPUT = "production_ready_dataset_v2.csv"
+BATCH_SIZE = 10000
+
+OPPORTUNITY_COLS = [
+    'opportunity_id', 'opportunity_name', 'opportunity_category', 'opportunity_start_date',
+    'opportunity_end_date', 'opportunity_duration_days', 'log_opportunity_duration',
+]
+APPLICATION_INDEXES = ['opportunity_id', 'country', 'apply_date', 'status_code']
+
+BULK_PRAGMAS = [
+    "PRAGMA journal_mode=MEMORY",  # rollback still works, no journal file I/O
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-200000",   # ~200 MB page cache
+    "PRAGMA locking_mode=EXCLUSIVE",
+]
+
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+def _batches(df, size):
+    """
+    executemany batches of plain-Python tuples (None for missing, ISO text for
+    datetimes), each converted from its own slice of df so the frame is never copied whole.
+    """
+    for start in range(0, len(df), size):
+        part = df.iloc[start:start + size]
+        columns = []
+        for c in part.columns:
+            col = part[c]
+            if pd.api.types.is_datetime64_any_dtype(col):
+                col = col.dt.strftime('%Y-%m-%d %H:%M:%S')
+            values = col.to_numpy(dtype=object, copy=True)
+            values[col.isna().to_numpy()] = None
+            columns.append(values)
+        yield [tuple(v.item() if isinstance(v, np.generic) else v for v in row) for row in zip(*columns)]
+
+def split_star(df):
+    """
+    Split a cleaned frame into (opportunities, applications). Opportunity attributes
+    take the first non-null value within each opportunity_id.
+    """
+    opp_cols = [c for c in OPPORTUNITY_COLS if c in df.columns]
+    opportunities = df[opp_cols].groupby('opportunity_id', sort=False).first().reset_index()
+    applications = df.drop(columns=[c for c in opp_cols if c != 'opportunity_id'])
+    return opportunities, applications
+
+def _create_table(conn, name, df, primary_key=None):
+    cols = []
+    for c in df.columns:
+        decl = f'"{c}" {_sql_type(df[c].dtype)}'
+        if c == primary_key:
+            decl += ' PRIMARY KEY'
+        cols.append(decl)
+    conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+    conn.execute(f'CREATE TABLE "{name}" ({", ".join(cols)})')
+
+def _insert(conn, name, df, batch_size):
+    placeholders = ", ".join("?" for _ in df.columns)
+    col_list = ", ".join(f'"{c}"' for c in df.columns)
+    sql = f'INSERT INTO "{name}" ({col_list}) VALUES ({placeholders})'
+    for batch in _batches(df, batch_size):
+        conn.executemany(sql, batch)
+
+def load_warehouse(df, db_path=WAREHOUSE_DB, batch_size=BATCH_SIZE):
+    """Replace the warehouse tables with df's contents. Returns (n_opportunities, n_applications)."""
+    opportunities, applications = split_star(df)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        for pragma in BULK_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute("BEGIN")
+        _create_table(conn, 'opportunities', opportunities, primary_key='opportunity_id')
+        _create_table(conn, 'applications', applications)
+        _insert(conn, 'opportunities', opportunities, batch_size)
+        _insert(conn, 'applications', applications, batch_size)
+        for c in APPLICATION_INDEXES:
+            if c in applications.columns:
+                conn.execute(f'CREATE INDEX "idx_applications_{c}" ON applications ("{c}")')
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return len(opportunities), len(applications)
+
+def export_csv_to_warehouse(input_csv=INPUT, db_path=WAREHOUSE_DB, batch_size=BATCH_SIZE):
+    print('Loading', input_csv)
+    df = pd.read_csv(input_csv)
+    n_opp, n_app = load_warehouse(df, db_path, batch_size)
+    print(f'Warehouse {db_path}: {n_opp} opportunities, {n_app} applications '
+          f'(indexed on {", ".join(APPLICATION_INDEXES)})')
+    return n_opp, n_app
+
+def query(sql, params=(), db_path=WAREHOUSE_DB):
+    """Run a read query against the warehouse and return a DataFrame."""
+    # as_uri() percent-encodes '?', '#' and '%' in the path
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    export_csv_to_warehouse()
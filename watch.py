@@ -0,0 +1,228 @@
+# watch.py
+# Watch mode: a long-running process that folds new SLU export files into the live
+# cleaned dataset as they land in an input directory.
+#
+# Everything a one-shot run rebuilds from disk stays resident in WarmState:
+#   - the cleaned dataset itself (one frame, rows tagged with source_file / raw_row_id)
+#   - a parse cache: raw date text -> Timestamp, so a date string seen in any earlier
+#     file is never parsed again and each new file only parses its unseen values
+#   - the opportunity date lookup: opportunity_id -> start / end date, used to fill
+#     missing opportunity dates of new rows (and of old rows once a new file has them)
+# A new file is cleaned on its own (data2 transforms), merged, and the dataset and a
+# summary report are rewritten atomically.
+#
+# File notification is plain polling of the directory (no external services). A file
+# is picked up once its size and mtime are unchanged between two polls, so exports
+# still being copied in are not read half-written. A file that changes later replaces
+# its earlier rows. Processed files are recorded (sha1) in <output>.watch.json, so a
+# restarted watcher reloads the dataset and skips what it already has.
+
+import json
+import os
+import time
+
+import pandas as pd
+
+from backends import get_backend
+from checkpoint import file_digest, to_csv_atomic, write_json_atomic
+from data2 import DATE_COLUMNS, DATE_FORMATS, REPARSE_FORMATS, fix_end_before_start, remove_corrupt_hour_time
+from ingest import SOURCE_FILE, list_exports, read_export, unify_frames
+from lineage import RAW_ROW_ID
+
+WATCH_DIR = 'incoming'
+OUT_CSV = 'Cleaned_Preprocessed_Dataset_Week1_live.csv'
+REPORT_CSV = 'watch_report_week1.csv'
+POLL_SECONDS = 2.0
+
+OPPORTUNITY_DATES = ['opportunity_start_date', 'opportunity_end_date']
+TEXT_COLUMNS = {'first_name': True, 'country': False, 'institution_name': False, 'current_intended_major': False}
+
+def state_path_for(out_csv):
+    return f'{out_csv}.watch.json'
+
+class ParseCache:
+    """Raw date text -> parsed Timestamp (NaT if unparseable), shared by all files and columns."""
+    def __init__(self, backend=None):
+        self.values = {}
+        self.backend = backend or get_backend('pandas')
+
+    def parse(self, series):
+        text = series.astype(str).where(series.notna())
+        new = [v for v in pd.unique(text.dropna()) if v not in self.values]
+        if new:
+            raw = pd.Series(new, dtype=object)
+            parsed = self.backend.robust_parse_dates(raw, extra_formats=DATE_FORMATS, dayfirst_try=True)
+            failed = parsed.isna()
+            if failed.any():
+                # same recovery as data2.targeted_reparse_removing_corrupt_time
+                parsed[failed] = self.backend.robust_parse_dates(raw[failed].map(remove_corrupt_hour_time),
+                                                                 extra_formats=REPARSE_FORMATS, dayfirst_try=False)
+            self.values.update(zip(new, parsed))
+        return pd.to_datetime(text.map(self.values), errors='coerce')
+
+class OpportunityDates:
+    """opportunity_id -> first known start / end date."""
+    def __init__(self):
+        self.dates = {c: {} for c in OPPORTUNITY_DATES}
+
+    def update(self, df):
+        for c in OPPORTUNITY_DATES:
+            known = df.loc[df[c].notna(), ['opportunity_id', c]].drop_duplicates('opportunity_id')
+            lookup = self.dates[c]
+            for key, value in zip(known['opportunity_id'], known[c]):
+                lookup.setdefault(key, value)
+
+    def fill(self, df):
+        """Fill missing opportunity dates in df from the lookup; returns the number of cells filled."""
+        filled = 0
+        for c in OPPORTUNITY_DATES:
+            missing = df[c].isna()
+            if missing.any():
+                known = pd.to_datetime(df['opportunity_id'].map(self.dates[c]), errors='coerce')
+                df[c] = df[c].where(~missing, known)
+                filled += int((missing & df[c].notna()).sum())
+        return filled
+
+class WarmState:
+    def __init__(self, df=None, processed=None, backend=None):
+        self.df = df
+        self.processed = processed or {}     # file name -> sha1 of the version merged
+        self.backend = get_backend(backend)
+        self.parse_cache = ParseCache(self.backend)
+        self.opportunity_dates = OpportunityDates()
+        self.next_row_id = 0
+        if df is not None and len(df):
+            self.opportunity_dates.update(df)
+            self.next_row_id = int(df[RAW_ROW_ID].max()) + 1
+
+    @classmethod
+    def load(cls, out_csv, backend=None):
+        """Resume from a previous watcher's output and state file (empty state if absent)."""
+        state_file = state_path_for(out_csv)
+        if not (os.path.exists(out_csv) and os.path.exists(state_file)):
+            return cls(backend=backend)
+        with open(state_file) as f:
+            processed = json.load(f)['processed']
+        df = pd.read_csv(out_csv, parse_dates=DATE_COLUMNS)
+        print(f'[watch] resumed {len(df)} rows from {out_csv} ({len(processed)} files)')
+        return cls(df, processed, backend=backend)
+
+    def clean(self, raw):
+        """data2 cleaning of one export (already in the canonical schema)."""
+        df = raw.copy(deep=False)
+        for c in DATE_COLUMNS:
+            if c in df.columns:
+                df[c] = self.parse_cache.parse(df[c])
+        for c, to_title in TEXT_COLUMNS.items():
+            if c in df.columns:
+                df[c] = self.backend.clean_text(df[c], to_title=to_title)
+        if 'gender' in df.columns:
+            df['gender'] = self.backend.map_gender(df['gender'])
+        if 'status_description' in df.columns:
+            df['status_description'] = self.backend.map_status(df['status_description'])
+        return df
+
+    def add_file(self, path):
+        """Merge one export file; rows from an earlier version of the same file are replaced."""
+        name = os.path.basename(path)
+        raw = unify_frames([read_export(path)], [path])
+        raw[RAW_ROW_ID] = (raw[RAW_ROW_ID] + self.next_row_id).astype('int32')
+        self.next_row_id += len(raw)
+        new = self.clean(raw)
+        self.opportunity_dates.update(new)
+        filled = self.opportunity_dates.fill(new)
+        old = self.df
+        if old is not None:
+            old = old[old[SOURCE_FILE] != name]
+            # dates this file brings may complete opportunities of earlier rows
+            touched = old[OPPORTUNITY_DATES].isna().any(axis=1) & old['opportunity_id'].isin(new['opportunity_id'])
+            if touched.any():
+                part = old.loc[touched].copy()
+                filled += self.opportunity_dates.fill(part)
+                part = self.backend.compute_features(fix_end_before_start(part, inplace=True), inplace=True)
+                old = old.copy(deep=False)
+                old.loc[touched, part.columns] = part
+        new = self.backend.compute_features(fix_end_before_start(new, inplace=True), inplace=True)
+        self.df = new if old is None or old.empty else pd.concat([old, new], ignore_index=True)
+        self.processed[name] = file_digest(path)
+        return len(new), filled
+
+    def report(self):
+        """Summary of the live dataset: size, sources and missing values per column."""
+        df = self.df
+        rows = [('rows', len(df)), ('files', df[SOURCE_FILE].nunique()),
+                ('opportunities', df['opportunity_id'].nunique()),
+                ('date_cache_entries', len(self.parse_cache.values))]
+        rows += [(f'missing_{c}', int(n)) for c, n in df.isna().sum().items()]
+        return pd.DataFrame(rows, columns=['metric', 'value'])
+
+    def save(self, out_csv, report_csv):
+        to_csv_atomic(self.df, out_csv, index=False)
+        to_csv_atomic(self.report(), report_csv, index=False)
+        write_json_atomic(state_path_for(out_csv), {'processed': self.processed})
+
+class Watcher:
+    def __init__(self, input_dir=WATCH_DIR, out_csv=OUT_CSV, report_csv=REPORT_CSV,
+                 interval=POLL_SECONDS, state=None):
+        self.input_dir = input_dir
+        self.out_csv = out_csv
+        self.report_csv = report_csv
+        self.interval = interval
+        self.state = state if state is not None else WarmState.load(out_csv)
+        self._seen = {}          # path -> (size, mtime) at the previous poll
+        self._own = {os.path.abspath(p) for p in (out_csv, report_csv)}
+
+    def ready_files(self, settle=True):
+        """Export files that are new or changed and (with settle) unchanged since the last poll."""
+        ready = []
+        for path in list_exports(self.input_dir):
+            if os.path.abspath(path) in self._own:
+                continue
+            st = os.stat(path)
+            sig = (st.st_size, st.st_mtime_ns)
+            stable = not settle or self._seen.get(path) == sig
+            self._seen[path] = sig
+            if not stable:
+                continue
+            name = os.path.basename(path)
+            if name in self.state.processed and self.state.processed[name] == file_digest(path):
+                continue
+            ready.append(path)
+        return ready
+
+    def process(self, paths):
+        t0 = time.perf_counter()
+        for path in paths:
+            try:
+                n, filled = self.state.add_file(path)
+            except Exception as e:
+                # a bad export must not stop the daemon; it is retried when it changes
+                print(f'[watch] {os.path.basename(path)}: skipped ({e})')
+                self.state.processed[os.path.basename(path)] = file_digest(path)
+                continue
+            print(f'[watch] {os.path.basename(path)}: +{n} rows, {filled} opportunity dates filled')
+        if self.state.df is not None:
+            self.state.save(self.out_csv, self.report_csv)
+            print(f'[watch] {len(self.state.df)} rows -> {self.out_csv}, {self.report_csv} '
+                  f'({time.perf_counter() - t0:.2f}s)')
+
+    def poll(self, settle=True):
+        paths = self.ready_files(settle)
+        if paths:
+            self.process(paths)
+        return paths
+
+    def run(self, once=False, max_polls=None):
+        """Poll until interrupted (or once: process what is there now and return)."""
+        os.makedirs(self.input_dir, exist_ok=True)
+        if once:
+            return self.poll(settle=False)
+        print(f'[watch] watching {self.input_dir} every {self.interval:g}s (Ctrl+C to stop)')
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                self.poll()
+                polls += 1
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print('[watch] stopped')